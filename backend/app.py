@@ -1,4 +1,5 @@
 import os
+import math
 import asyncio
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.staticfiles import StaticFiles
@@ -10,7 +11,17 @@ from fastapi.responses import FileResponse, RedirectResponse
 from starlette.requests import Request
 import redis.asyncio as aioredis
 from redis.exceptions import ConnectionError
+from backend.middleware.deadline import DeadlineMiddleware
 from backend.middleware.dev_access import DevAccessMiddleware
+from backend.dynamo import dynamo
+from backend.redis_client import set_redis
+from backend.sanity_client import close_http_client as close_sanity_http
+from backend.services.for_you import for_you
+from backend.services.user_cache import user_cache
+from backend.services.post_replica import post_replica
+from backend.services.registrant_export import registrant_exporter
+from backend.services.search_index import search_index
+from backend.services.trending import trending
 
 # Import routers
 from backend.routes.users import router as users_router
@@ -19,14 +30,17 @@ from backend.routes.auth_routes import router as auth_router
 from backend.routes.uploads import router as uploads_router
 from backend.routes.admin_routes import router as admin_router
 from backend.routes.steam_routes import router as steam_router
+from backend.utils.resilience import DependencyUnavailable
+from backend.utils.responses import FastJSONResponse
 from backend.utils.security import create_access_token, verify_access_token
 from backend.database import (
     get_user_from_db,
     get_post_from_db,
-    create_post_in_db
+    create_post_in_db,
+    iter_approved_posts,
 )
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Add development access middleware FIRST (before CORS)
 app.add_middleware(DevAccessMiddleware)
@@ -39,6 +53,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(DependencyUnavailable)
+async def dependency_unavailable(request: Request, exc: DependencyUnavailable):
+    # Fail fast instead of returning an empty result that looks like "no data"
+    headers = {"Retry-After": str(math.ceil(exc.retry_after or 1))}
+    return FastJSONResponse(
+        status_code=503,
+        content={"detail": f"{exc.dependency} is temporarily unavailable"},
+        headers=headers,
+    )
+
 @app.get("/api/health")
 def health():
     return {"status": "ok"}
@@ -70,6 +96,24 @@ async def startup():
             await asyncio.sleep(2 ** i)
 
     await FastAPILimiter.init(client)
+    # Share the connection with the caching layers
+    set_redis(client)
+    user_cache.start_listener()
+    post_replica.start()
+    trending.start()
+    search_index.start(iter_approved_posts)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await user_cache.stop_listener()
+    await post_replica.stop()
+    await trending.stop()
+    await for_you.stop()
+    await search_index.stop()
+    await registrant_exporter.stop()
+    # Release the pooled DynamoDB connections held by the shared aioboto3 resource
+    await dynamo.close()
+    await close_sanity_http()
 
 app.include_router(users_router, prefix="/users")
 app.include_router(posts_router, prefix="/posts")
@@ -87,7 +131,7 @@ async def get_user_profile(user_id: str, token: str = Depends(oauth2_scheme)):
     payload = verify_access_token(token)
     if not payload or payload["sub"] != user_id:
         raise HTTPException(status_code=401)
-    profile = get_user_from_db(user_id)
+    profile = await get_user_from_db(user_id)
     if not profile:
         raise HTTPException(status_code=404)
     return profile
@@ -21,10 +21,10 @@ async def change_password(data: dict, token: dict = Depends(lambda: _get_verifie
     from backend.utils.security import verify_password, hash_password
 
     user_id = token.get("sub")
-    user = get_user_from_db(user_id)
+    user = await get_user_from_db(user_id, with_secrets=True)
 
     if not user or not verify_password(data["old_password"], user["hashed_password"]):
         raise HTTPException(status_code=400, detail="Incorrect old password")
 
-    update_user_password(user_id, hash_password(data["new_password"]))
+    await update_user_password(user_id, hash_password(data["new_password"]))
     return {"message": "Password changed successfully"}
@@ -1,35 +1,58 @@
-import boto3
 from boto3.dynamodb.conditions import Key, Attr
 from botocore.exceptions import ClientError
+from collections import Counter
 from datetime import datetime
+import os
 import uuid
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator
 import logging
 from backend.utils.security import hash_password
 from fastapi.encoders import jsonable_encoder  
 from typing import Optional  
 import pyotp  
 from backend.sanity_client import SanityClient
+from backend.dynamo import AsyncTable, batch_get, dynamo
+from backend.groq import ADMIN_QUEUE, FEED_CARD, OWNER_VIEW, OWNERSHIP, POST_DETAIL, GroqQuery
+from backend.pagination import Page, InvalidCursor, encode_cursor, decode_cursor
+from backend.services.user_cache import user_cache, without_secrets
+from backend.utils.cache import MISSING, TTLCache
+from backend.utils.resilience import DependencyUnavailable
+from backend.services.etag_cache import etag_cache, post_dep
+from backend.services.feed_index import feed_index
+from backend.services.post_replica import post_replica
+from backend.services.search_index import search_index
+from backend.services.image_ingest import BannerImageError, ingest_images
+from backend.registrations import delete_registrations_for_post
 from fastapi import HTTPException
 
-# DynamoDB setup
-dynamodb = boto3.resource('dynamodb', region_name='us-east-2')
-users_table = dynamodb.Table('Users')
-posts_table = dynamodb.Table('Posts')
+# DynamoDB setup (shared aioboto3 resource, see backend/dynamo.py)
+users_table = AsyncTable('Users')
+posts_table = AsyncTable('Posts')
+
+# Global secondary indexes on Users (created/backfilled by scripts/user_indexes.py)
+USERNAME_INDEX = 'username-index'
+EMAIL_INDEX = 'email-index'
+STEAM_ID_INDEX = 'steam_id-index'
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# Facet counts without the feed index or replica: posts read per selection, and
+# how long the (possibly partial) result is reused
+FACETS_FALLBACK_LIMIT = int(os.getenv("FACETS_FALLBACK_LIMIT", "500"))
+FACETS_FALLBACK_TTL = float(os.getenv("FACETS_FALLBACK_TTL", "60"))
+_facet_fallback = TTLCache(1000, FACETS_FALLBACK_TTL)
+
 try:
     _sanity_client = SanityClient()
 except Exception as e:
     _sanity_client = None
     logger.warning(f"Sanity client not initialized: {e}")
 
-def save_to_dynamodb(item: dict, table_name: str):
-    table = dynamodb.Table(table_name)
+async def save_to_dynamodb(item: dict, table_name: str):
+    table = AsyncTable(table_name)
     try:
-        response = table.put_item(Item=item)
+        response = await table.put_item(Item=item)
         logger.debug(f"[save_to_dynamodb] Saved item to {table_name}: {item}")
         logger.debug(f"[save_to_dynamodb] Response: {response}")  
         return response
@@ -44,16 +67,23 @@ def get_user_collection():
     return users_table
 
 async def get_user_by_id(user_id: str) -> Optional[Dict]:
-    """Get user by ID for admin functionality"""
+    """Get user by ID for admin functionality (credentials omitted)"""
+    cached = await user_cache.get(user_id)
+    if cached is not None:
+        return cached
     try:
-        response = users_table.get_item(Key={'user_id': user_id})
+        response = await users_table.get_item(Key={'user_id': user_id})
         logger.debug(f"[get_user_by_id] Get user response: {response}")
-        return response.get('Item')
+        user_item = response.get('Item')
+        if user_item:
+            await user_cache.set(user_id, user_item)
+            user_item = without_secrets(user_item)
+        return user_item
     except ClientError as e:
         logger.error(f"[get_user_by_id] User retrieval failed: {e}")
         return None
 
-def create_user_in_sanity(user_id: str, user_data: dict) -> Optional[str]:
+async def create_user_in_sanity(user_id: str, user_data: dict) -> Optional[str]:
     """Persist a public (non-sensitive) user profile document in Sanity.
     This is best-effort; failures are logged but do not block user creation.
     """
@@ -76,14 +106,14 @@ def create_user_in_sanity(user_id: str, user_data: dict) -> Optional[str]:
         "created_at": str(datetime.utcnow()),
     }
     try:
-        doc_id = _sanity_client.create_document("user", doc_data)
+        doc_id = await _sanity_client.create_document("user", doc_data)
         logger.debug(f"[create_user_in_sanity] Created Sanity user: {doc_id}")
         return doc_id
     except Exception as e:
         logger.error(f"[create_user_in_sanity] Failed to create user in Sanity: {e}")
         return None
 
-def create_user_in_db(user_data: dict) -> Optional[str]:
+async def create_user_in_db(user_data: dict) -> Optional[str]:
     user_id = str(uuid.uuid4())
     item = {
         "user_id": user_id,
@@ -103,19 +133,28 @@ def create_user_in_db(user_data: dict) -> Optional[str]:
         "user_type": user_data.get("user_type", "Tester")
     }
     try:
-        response = users_table.put_item(Item=item)
+        response = await users_table.put_item(Item=item)
         logger.debug(f"[create_user_in_db] Created user: {item}")
         logger.debug(f"[create_user_in_db] Database response: {response}")
+        # Prime the cache: registration is immediately followed by 2FA setup reads
+        await user_cache.set(user_id, item)
         # Persist a non-sensitive backup of the user profile to Sanity (best-effort)
-        create_user_in_sanity(user_id, user_data)
+        await create_user_in_sanity(user_id, user_data)
         return user_id
     except ClientError as e:
         logger.error(f"[create_user_in_db] User creation failed: {e}")
         return None
 
-def get_user_from_db(user_id: str) -> Optional[Dict[str, str]]:
+async def get_user_from_db(user_id: str, with_secrets: bool = False) -> Optional[Dict[str, str]]:
+    """Users item without SECRET_FIELDS (password hash, 2FA secret, reset and
+    verification codes). Pass ``with_secrets=True`` to check credentials: that
+    reads DynamoDB directly and never goes through the cache."""
+    if not with_secrets:
+        cached = await user_cache.get(user_id)
+        if cached is not None:
+            return cached
     try:
-        response = users_table.get_item(Key={'user_id': user_id})
+        response = await users_table.get_item(Key={'user_id': user_id})
         
         logger.debug(f"[get_user_from_db] Get user response: {response}")
 
@@ -125,89 +164,109 @@ def get_user_from_db(user_id: str) -> Optional[Dict[str, str]]:
             logger.warning(f"[get_user_from_db] User with user_id {user_id} not found in database.")
             return None
         
-        return user_item
+        await user_cache.set(user_id, user_item)
+        return user_item if with_secrets else without_secrets(user_item)
 
     except ClientError as e:
         logger.error(f"[get_user_from_db] Get user failed for user_id {user_id}: {e}")
         return None
 
+    except DependencyUnavailable:
+        raise
+
     except Exception as e:
         logger.error(f"[get_user_from_db] Unexpected error occurred while fetching user {user_id}: {e}")
         return None
 
-def get_user_by_email(email: str) -> Optional[dict]:
+async def _query_user_index(index_name: str, attr: str, value: str) -> Optional[dict]:
+    """Return the first user whose `attr` equals `value` using a GSI (projection ALL)."""
+    response = await users_table.query(
+        IndexName=index_name,
+        KeyConditionExpression=Key(attr).eq(value),
+        Limit=1,
+    )
+    items = response.get('Items', [])
+    return items[0] if items else None
+
+async def get_user_by_email(email: str) -> Optional[dict]:
     try:
-        response = users_table.get_item(Key={'email': email})
-        logger.debug(f"[get_user_by_email] Get user by email response: {response}")  
-        return response.get('Item')
+        user = await _query_user_index(EMAIL_INDEX, 'email', email)
+        logger.debug(f"[get_user_by_email] Found user for email {email}: {bool(user)}")
+        return user
     except ClientError as e:
         logger.error(f"[get_user_by_email] Get user by email failed: {e}")
         return None
 
-def get_user_by_username(username: str) -> Optional[dict]:
+async def get_user_by_username(username: str) -> Optional[dict]:
     try:
-        response = users_table.scan(FilterExpression=Attr('username').eq(username))
-        logger.debug(f"[get_user_by_username] Get user by username response: {response}")  
-        items = response.get('Items', [])
-        return items[0] if items else None
+        user = await _query_user_index(USERNAME_INDEX, 'username', username)
+        logger.debug(f"[get_user_by_username] Found user for username {username}: {bool(user)}")
+        return user
     except ClientError as e:
         logger.error(f"[get_user_by_username] Get user by username failed: {e}")
         return None
 
-def update_user_verification(email: str, is_verified: bool) -> bool:
+async def _user_key_for_email(email: str) -> Optional[dict]:
+    """Resolve an email to the Users primary key (the table is keyed by user_id)."""
+    user = await get_user_by_email(email)
+    return {'user_id': user['user_id']} if user else None
+
+async def update_user_verification(email: str, is_verified: bool) -> bool:
     try:
-        response = users_table.update_item(
-            Key={'email': email},
+        key = await _user_key_for_email(email)
+        if not key:
+            logger.warning(f"[update_user_verification] No user with email {email}")
+            return False
+        response = await users_table.update_item(
+            Key=key,
             UpdateExpression="SET is_verified = :v",
             ExpressionAttributeValues={':v': is_verified}
         )
+        await user_cache.invalidate(key['user_id'])
         logger.debug(f"[update_user_verification] Update verification response: {response}")  
         return True
     except ClientError as e:
         logger.error(f"[update_user_verification] Verification update failed: {e}")
         return False
 
-def update_reset_token(email: str, reset_token: str) -> bool:
+async def update_reset_token(email: str, reset_token: str) -> bool:
     try:
-        response = users_table.update_item(
-            Key={'email': email},
+        key = await _user_key_for_email(email)
+        if not key:
+            logger.warning(f"[update_reset_token] No user with email {email}")
+            return False
+        response = await users_table.update_item(
+            Key=key,
             UpdateExpression="SET reset_token = :t",
             ExpressionAttributeValues={":t": reset_token}
         )
+        await user_cache.invalidate(key['user_id'])
         logger.debug(f"[update_reset_token] Update reset token response: {response}")  
         return True
     except ClientError as e:
         logger.error(f"[update_reset_token] Reset token update failed: {e}")
         return False
 
-def update_user_password_by_email(email: str, new_password: str) -> bool:
+async def update_user_password_by_email(email: str, new_password: str) -> bool:
     try:
+        key = await _user_key_for_email(email)
+        if not key:
+            logger.warning(f"[update_user_password_by_email] No user with email {email}")
+            return False
         hashed = hash_password(new_password)
-        response = users_table.update_item(
-            Key={'email': email},
+        response = await users_table.update_item(
+            Key=key,
             UpdateExpression="SET password = :p, reset_token = :empty",
             ExpressionAttributeValues={":p": hashed, ":empty": ""}
         )
+        await user_cache.invalidate(key['user_id'])
         logger.debug(f"[update_user_password_by_email] Password update response: {response}")  
         return True
     except ClientError as e:
         logger.error(f"[update_user_password_by_email] Password update failed: {e}")
         return False
 
-def verify_2fa_code(user_id: str, code: str) -> bool:
-    """Verify a 2FA code for a user."""
-    try:
-        user = get_user_from_db(user_id)
-        if not user or not user.get('two_factor_secret'):
-            return False
-        
-        totp = pyotp.TOTP(user['two_factor_secret'])
-        return totp.verify(code, valid_window=1)
-    except Exception as e:
-        logger.error(f"[verify_2fa_code] 2FA verification failed: {e}")
-        return False
-
-def update_user_profile(user_id: str, profile_data: dict) -> bool:
+async def update_user_profile(user_id: str, profile_data: dict) -> bool:
     """Update arbitrary profile fields for the given user_id.
 
     Handles DynamoDB restrictions where `None` values cannot be set; attributes
@@ -244,7 +303,8 @@ def update_user_profile(user_id: str, profile_data: dict) -> bool:
         if expr_values:
             update_kwargs["ExpressionAttributeValues"] = expr_values
 
-        response = users_table.update_item(**update_kwargs)
+        response = await users_table.update_item(**update_kwargs)
+        await user_cache.invalidate(user_id)
         logger.debug(f"[update_user_profile] Profile updated for user_id {user_id}: {profile_data}")
         logger.debug(f"[update_user_profile] DynamoDB response: {response}")
         return True
@@ -253,29 +313,33 @@ def update_user_profile(user_id: str, profile_data: dict) -> bool:
         logger.error(f"[update_user_profile] Profile update failed: {e}")
         return False
 
-def create_post_in_db(post_data: dict, user_id: str) -> Optional[str]:
+async def create_post_in_db(post_data: dict, user_id: str,
+                            image_errors: Optional[List[dict]] = None) -> Optional[str]:
+    """Create a pending post and return its ID, or None on failure.
+
+    On Sanity the banner and gallery images are ingested here (concurrently;
+    existing Sanity references pass straight through). A banner that cannot
+    be ingested raises ``BannerImageError``; gallery images that fail are
+    skipped and reported in ``image_errors`` when a list is passed.
+    """
     if _sanity_client:
+        banner_val = post_data.get("banner_image")
+        gallery = post_data.get("images", [])
+        results = await ingest_images(_sanity_client, ([banner_val] if banner_val else []) + gallery)
+        banner_ref = None
+        if banner_val:
+            banner_result, results = results[0], results[1:]
+            if banner_result.error:
+                raise BannerImageError(banner_result.error)
+            banner_ref = banner_result.ref
+
+        image_refs = [r.ref for r in results if r.ref]
+        for r in results:
+            if r.error:
+                logger.error(f"[create_post_in_db] Failed to upload image {r.source}: {r.error}")
+                if image_errors is not None:
+                    image_errors.append({"source": str(r.source), "error": r.error})
         try:
-            # Banner image
-            banner_val = post_data.get("banner_image")
-            banner_ref = None
-            if banner_val:
-                if isinstance(banner_val, dict) and banner_val.get("_type") == "image":
-                    banner_ref = banner_val  # already uploaded
-                else:
-                    banner_ref = _sanity_client.upload_image_from_url(banner_val)
-
-            # Gallery images
-            image_refs = []
-            for img in post_data.get("images", []):
-                try:
-                    if isinstance(img, dict) and img.get("_type") == "image":
-                        image_refs.append(img)
-                    else:
-                        image_refs.append(_sanity_client.upload_image_from_url(img))
-                except Exception as img_err:
-                    logger.error(f"[create_post_in_db] Failed to upload image {img}: {img_err}")
-
             sanity_payload = {
                 "title": post_data.get("title"),
                 "description": post_data.get("description"),
@@ -284,13 +348,14 @@ def create_post_in_db(post_data: dict, user_id: str) -> Optional[str]:
                 "studio": post_data.get("studio"),
                 "bannerImage": {
                     "image": banner_ref,
-                    "url": banner_val if isinstance(banner_val, str) else None,
+                    "url": None if isinstance(banner_val, dict) else str(banner_val),
                 } if banner_ref else None,
                 "images": image_refs,
                 "testerId": user_id,
                 "status": "draft",
                 "is_approved": False,  # mark as pending approval for admin
-                "registrants": [],
+                "registrant_count": 0,
+                "capacity": post_data.get("capacity"),
                 "date": str(datetime.utcnow()),
             }
 
@@ -307,7 +372,11 @@ def create_post_in_db(post_data: dict, user_id: str) -> Optional[str]:
 
             logger.debug(f"[create_post_in_db] Sanity payload: {sanity_payload}")
 
-            return _sanity_client.create_document("post", sanity_payload)
+            doc_id = await _sanity_client.create_document("post", sanity_payload)
+            if doc_id:
+                await feed_index.index_post({**sanity_payload, "_id": doc_id})
+                await search_index.index_post({**sanity_payload, "_id": doc_id})
+            return doc_id
         except Exception as e:
             logger.error(f"[create_post_in_db] Sanity create post failed: {e}")
             return None
@@ -329,8 +398,12 @@ def create_post_in_db(post_data: dict, user_id: str) -> Optional[str]:
         if 'is_approved' not in post_data:
             post_data['is_approved'] = False
 
-        if 'registrants' not in post_data:
-            post_data['registrants'] = []
+        # Registrations live in their own store (see backend/registrations.py)
+        post_data.pop('registrants', None)
+        post_data.setdefault('registrant_count', 0)
+        # No capacity means unlimited seats; a stored NULL would fail the seat check
+        if post_data.get('capacity') is None:
+            post_data.pop('capacity', None)
 
         post_data.update({
             'post_id': post_id,
@@ -342,8 +415,10 @@ def create_post_in_db(post_data: dict, user_id: str) -> Optional[str]:
 
         try:
             serialized_data = jsonable_encoder(post_data)  
-            response = posts_table.put_item(Item=serialized_data)
+            response = await posts_table.put_item(Item=serialized_data)
             logger.debug(f"[create_post_in_db] Post saved successfully. Response: {response}")
+            await feed_index.index_post(serialized_data)
+            await search_index.index_post(serialized_data)
             return post_id
         except ClientError as e:
             logger.error(f"[create_post_in_db] [ClientError] Failed: {e.response['Error']['Message']}")
@@ -351,36 +426,89 @@ def create_post_in_db(post_data: dict, user_id: str) -> Optional[str]:
             logger.exception(f"[create_post_in_db] Unexpected error: {e}")
         return None
 
-def get_post_from_db(post_id: str) -> Optional[dict]:
+async def get_post_from_db(post_id: str, use_cdn: bool = False) -> Optional[dict]:
+    """Fetch one post. Pass ``use_cdn=True`` only for public reads that tolerate
+    a few seconds of staleness; writes and checks that follow writes stay live."""
+    if use_cdn:
+        post = post_replica.get(post_id)
+        if post is not MISSING:
+            return post
     if _sanity_client:
         try:
-            return _sanity_client.get_document(post_id)
+            return await _sanity_client.get_document(post_id, POST_DETAIL, use_cdn=use_cdn)
+        except DependencyUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[get_post_from_db] Sanity get post failed: {e}")
             return None
     else:
         try:
-            response = posts_table.get_item(Key={'post_id': post_id})
+            response = await posts_table.get_item(Key={'post_id': post_id})
             logger.debug(f"[get_post_from_db] Get post response: {response}")  
             return response.get('Item')
         except ClientError as e:
             logger.error(f"[get_post_from_db] Get post failed: {e}")
             return None
 
-def get_posts_by_user(user_id: str) -> List[dict]:
-    """Return all posts owned by user from Sanity or Dynamo."""
+def post_edits_tracked() -> bool:
+    """Whether every change to a post bumps its ETag generation.
+
+    DynamoDB posts only change through the API, which bumps on each write.
+    Sanity posts can also be edited in the Studio; those edits are only
+    seen while the post replica's change feed is up.
+    """
+    return not _sanity_client or post_replica.tracks_edits()
+
+
+async def get_posts_by_ids(post_ids: List[str]) -> Dict[str, dict]:
+    """Multi-get posts by ID in one Sanity query or BatchGetItem; unknown IDs are omitted."""
+    if not post_ids:
+        return {}
+    posts = post_replica.get_many(post_ids)
+    if posts is not None:
+        return posts
+    if _sanity_client:
+        try:
+            # Feed-index multi-gets only serve public, approved posts
+            docs = await _sanity_client.get_documents(post_ids, FEED_CARD, use_cdn=True)
+            return {doc["_id"]: doc for doc in docs}
+        except DependencyUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"[get_posts_by_ids] Sanity query failed: {e}")
+            return {}
+    try:
+        items = await batch_get(posts_table.name, [{'post_id': pid} for pid in dict.fromkeys(post_ids)])
+        return {item['post_id']: item for item in items}
+    except ClientError as e:
+        logger.error(f"[get_posts_by_ids] Dynamo batch get failed: {e}")
+        return {}
+
+async def get_posts_by_user(user_id: str, use_cdn: bool = False) -> List[dict]:
+    """Return all posts owned by user from Sanity or Dynamo.
+
+    ``use_cdn`` is for public profile pages; the owner's own view stays live.
+    """
+    if use_cdn:
+        posts = post_replica.by_owner(user_id)
+        if posts is not None:
+            return posts
     if _sanity_client:
         try:
-            query = f'*[_type == "post" && testerId == "{user_id}"] | order(date desc)'
-            results = _sanity_client.query_documents(query)
+            query = (GroqQuery('_type == "post"', 'testerId == $userId', userId=user_id)
+                     .order('date desc')
+                     .project(OWNER_VIEW))
+            results = await _sanity_client.fetch(query, use_cdn=use_cdn)
             logger.debug(f"[get_posts_by_user] Sanity results: {len(results)} items")
             return results
+        except DependencyUnavailable:
+            raise
         except Exception as e:
             logger.error(f"[get_posts_by_user] Sanity query failed: {e}")
             return []
     # Dynamo fallback
     try:
-        response = posts_table.query(
+        response = await posts_table.query(
             IndexName="user_id-index",
             KeyConditionExpression=Key('user_id').eq(user_id)
         )
@@ -390,69 +518,239 @@ def get_posts_by_user(user_id: str) -> List[dict]:
         logger.error(f"[get_posts_by_user] Dynamo query failed: {e}")
         return []
 
-def get_all_posts_from_db(post_type: Optional[str] = None, tags: Optional[List[str]] = None) -> List[dict]:
+# ---------------------------------------------------------------------
+# Pagination helpers
+# ---------------------------------------------------------------------
+
+POST_KEY_ATTRS = ('post_id',)
+USER_KEY_ATTRS = ('user_id',)
+
+# Approved posts, or posts created before the approval flag existed
+SANITY_APPROVED = '(is_approved == true || !defined(is_approved))'
+
+async def _scan_page(table: AsyncTable, key_attrs: tuple, limit: Optional[int] = None,
+                     cursor: Optional[str] = None, **scan_kwargs) -> Page:
+    """Scan `table`, following LastEvaluatedKey until `limit` matching items are
+    collected (or until the table is exhausted when `limit` is None).
+
+    A FilterExpression is applied after DynamoDB's own `Limit`, so one call may
+    need several round trips; any overshoot is trimmed and the cursor points at
+    the last item returned.
+    """
+    items: List[dict] = []
+    start_key = decode_cursor(cursor)
+    while True:
+        kwargs = dict(scan_kwargs)
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        if limit:
+            kwargs['Limit'] = limit
+        response = await table.scan(**kwargs)
+        items.extend(response.get('Items', []))
+        start_key = response.get('LastEvaluatedKey')
+        if not start_key or (limit and len(items) >= limit):
+            break
+    if limit and len(items) > limit:
+        items = items[:limit]
+        start_key = {attr: items[-1][attr] for attr in key_attrs}
+    return Page(items, encode_cursor(start_key) if start_key else None)
+
+async def _sanity_page(conditions: List[str], params: dict, limit: Optional[int] = None,
+                       cursor: Optional[str] = None, order: Optional[str] = None,
+                       projection: str = FEED_CARD, use_cdn: bool = False) -> Page:
+    """Run `*[conditions]` against Sanity one page at a time.
+
+    The default ordering (newest first) is paginated by keyset on
+    (`_createdAt`, `_id`), so deep pages cost the same as the first one. A custom
+    `order` (e.g. Trending) falls back to an offset range slice. `projection`
+    must include `_createdAt` and `_id`.
+    """
+    state = decode_cursor(cursor) or {}
+    query = GroqQuery(*conditions, **params).project(projection)
+    keyset = order is None
+    offset = 0
+    try:
+        if keyset:
+            order = '_createdAt desc, _id desc'
+            if state:
+                query = query.where(
+                    '(_createdAt < $cursorCreatedAt || (_createdAt == $cursorCreatedAt && _id < $cursorId))',
+                    cursorCreatedAt=str(state['created_at']), cursorId=str(state['id']),
+                )
+        else:
+            offset = int(state.get('offset', 0))
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursor("Cursor does not match this listing")
+
+    query = query.order(order)
+    if limit:
+        # Fetch one extra document to learn whether another page exists
+        query = query.slice(offset, offset + limit + 1)
+    results = await _sanity_client.fetch(query, use_cdn=use_cdn)
+    if not limit or len(results) <= limit:
+        return Page(results)
+
+    results = results[:limit]
+    if keyset:
+        next_state = {'created_at': results[-1]['_createdAt'], 'id': results[-1]['_id']}
+    else:
+        next_state = {'offset': offset + limit}
+    return Page(results, encode_cursor(next_state))
+
+def _dynamo_approved_filter():
+    return Attr('is_approved').eq(True) | Attr('is_approved').not_exists()
+
+def _dynamo_tags_filter(tags: List[str]):
+    tag_filter = None
+    for tag in tags:
+        cond = Attr('tags').contains(tag)
+        tag_filter = tag_filter | cond if tag_filter else cond
+    return tag_filter
+
+def _replica_page(order: str, post_type: Optional[str], tags: Optional[List[str]],
+                  limit: Optional[int], cursor: Optional[str],
+                  studio: Optional[str] = None) -> Optional[Page]:
+    """Serve a feed page from the in-process post replica (see services/post_replica.py).
+
+    Returns None when the replica is not usable or the cursor belongs to the
+    feed index; replica cursors are the same as `_sanity_page` cursors.
+    """
+    state = decode_cursor(cursor)
+    if state is not None and 'feed_offset' in state:
+        return None
+    return post_replica.page(order, post_type, tags, limit, state, studio=studio)
+
+async def _feed_index_page(order: str, post_type: Optional[str], tags: Optional[List[str]],
+                           limit: Optional[int], cursor: Optional[str],
+                           studio: Optional[str] = None) -> Optional[Page]:
+    """Serve a feed page from the Redis feed index (see services/feed_index.py).
+
+    Returns None when the primary store should answer instead: the index is not
+    built or Redis is down, or the cursor was issued by the primary-store path.
+    """
+    state = decode_cursor(cursor)
+    if state is not None and 'feed_offset' not in state:
+        return None
+    offset = state['feed_offset'] if state else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidCursor("Malformed cursor")
+
+    result = await feed_index.query(order, post_type, tags, offset, limit, studio=studio)
+    if result is None:
+        if state is not None:
+            raise InvalidCursor("Feed cursor has expired")
+        return None
+
+    post_ids, has_more = result
+    posts = await get_posts_by_ids(post_ids)
+    items = [posts[pid] for pid in post_ids if pid in posts]
+    next_cursor = encode_cursor({'feed_offset': offset + len(post_ids)}) if has_more else None
+    return Page(items, next_cursor)
+
+async def get_all_posts_from_db(post_type: Optional[str] = None, tags: Optional[List[str]] = None,
+                                limit: Optional[int] = None, cursor: Optional[str] = None,
+                                use_index: bool = True, raise_errors: bool = False) -> Page:
+    """Approved posts, newest first. A failed read returns an empty page unless
+    ``raise_errors`` is set (callers that must not mistake a failure for the end)."""
+    if use_index:
+        page = _replica_page('newest', post_type, tags, limit, cursor)
+        if page is None:
+            page = await _feed_index_page('newest', post_type, tags, limit, cursor)
+        if page is not None:
+            return page
+
     if _sanity_client:
         try:
-            # Only return approved posts (if field exists) OR posts created before approval existed (field missing)
-            base_query = '*[_type == "post" && (is_approved == true || !defined(is_approved))'
-            conditions = []
+            conditions = ['_type == "post"', SANITY_APPROVED]
+            params: Dict[str, Any] = {}
             if post_type:
-                conditions.append(f'postType == "{post_type}"')
+                conditions.append('postType == $postType')
+                params['postType'] = post_type
             if tags:
-                tag_cond = ' || '.join([f'"{t}" in tags' for t in tags])
-                conditions.append(f'({tag_cond})')
-            query = base_query + (' && ' + ' && '.join(conditions) if conditions else '') + ']'
-            return _sanity_client.query_documents(query)
+                conditions.append('count(tags[@ in $tags]) > 0')
+                params['tags'] = tags
+            return await _sanity_page(conditions, params, limit, cursor, use_cdn=True)
+        except (InvalidCursor, DependencyUnavailable):
+            raise
         except Exception as e:
             logger.error(f"[get_all_posts_from_db] Sanity get all posts failed: {e}")
-            return []
+            if raise_errors:
+                raise
+            return Page([])
     else:
         try:
-            response = posts_table.scan()
-            logger.debug("[get_all_posts_from_db] Scanned posts table successfully.")
-            logger.debug(f"[get_all_posts_from_db] Scan posts table response: {response}")
-            all_items = response.get('Items', [])
-            
             # Keep only approved posts (treat older posts without the field as approved)
-            filtered_items = [
-                item for item in all_items
-                if item.get('is_approved', True) is True and 'title' in item and 'description' in item
-            ]
-
+            filter_expr = _dynamo_approved_filter() & Attr('title').exists() & Attr('description').exists()
             if post_type:
-                filtered_items = [item for item in filtered_items if item.get('post_type') == post_type]
-
+                filter_expr = filter_expr & Attr('post_type').eq(post_type)
             if tags:
-                filtered_items = [
-                    item for item in filtered_items
-                    if 'tags' in item and any(tag in item['tags'] for tag in tags)
-                ]
+                filter_expr = filter_expr & _dynamo_tags_filter(tags)
 
-            return filtered_items
+            page = await _scan_page(posts_table, POST_KEY_ATTRS, limit, cursor, FilterExpression=filter_expr)
+            logger.debug(f"[get_all_posts_from_db] Scanned {len(page.items)} posts.")
+            return page
 
         except ClientError as e:
             logger.error(f"[get_all_posts_from_db] Error scanning posts table: {e}")
-            return []
+            if raise_errors:
+                raise
+            return Page([])
+
+async def iter_approved_posts(page_size: int = 500) -> AsyncIterator[dict]:
+    """Every approved post, read from the primary store (for index rebuilds).
+
+    Read errors propagate, so a rebuild aborts instead of committing a
+    truncated index.
+    """
+    cursor = None
+    while True:
+        page = await get_all_posts_from_db(limit=page_size, cursor=cursor, use_index=False, raise_errors=True)
+        for post in page.items:
+            yield post
+        cursor = page.next_cursor
+        if not cursor:
+            break
+
+async def filter_posts_from_db(tab: str, main: str, subs: list,
+                               limit: Optional[int] = None, cursor: Optional[str] = None,
+                               studio: Optional[str] = None) -> Page:
+    order = 'trending' if tab == "Trending" else 'newest'
+    post_type = main.lower() if main and main.lower() != "null" else None
+    # Trending scores live in the feed index (services/trending.py); the replica
+    # and the primary stores can only approximate them by advertisingTags
+    page = None
+    if order == 'newest':
+        page = _replica_page(order, post_type, subs, limit, cursor, studio=studio)
+    if page is None:
+        page = await _feed_index_page(order, post_type, subs, limit, cursor, studio=studio)
+    if page is None and order == 'trending':
+        page = _replica_page(order, post_type, subs, limit, cursor, studio=studio)
+    if page is not None:
+        return page
 
-def filter_posts_from_db(tab: str, main: str, subs: list) -> List[dict]:
     if _sanity_client:
         try:
             # Base: only approved posts
-            query_parts = ['*[_type == "post" && (is_approved == true || !defined(is_approved))']
+            conditions = ['_type == "post"', SANITY_APPROVED]
+            params: Dict[str, Any] = {}
             if main:
-                query_parts.append(f'postType == "{main.lower()}"')
+                conditions.append('postType == $postType')
+                params['postType'] = main.lower()
             if subs:
-                subs_query = ' || '.join([f'"{s}" in tags' for s in subs])
-                query_parts.append(f'({subs_query})')
-            query = ' && '.join(query_parts) + ']'
+                conditions.append('count(tags[@ in $tags]) > 0')
+                params['tags'] = subs
+            if studio:
+                conditions.append('studio == $studio')
+                params['studio'] = studio
+            order = None  # Newest / default: keyset on _createdAt
             if tab == "Trending":
-                query += " | order(count(advertisingTags) desc)"
-            elif tab == "Newest":
-                query += " | order(date desc)"
-            return _sanity_client.query_documents(query)
+                order = 'count(advertisingTags) desc, _createdAt desc, _id desc'
+            return await _sanity_page(conditions, params, limit, cursor, order=order, use_cdn=True)
+        except (InvalidCursor, DependencyUnavailable):
+            raise
         except Exception as e:
             logger.error(f"[filter_posts_from_db] Sanity filter posts failed: {e}")
-            return []
+            return Page([])
     else:
         try:
             filter_expr = None
@@ -460,37 +758,95 @@ def filter_posts_from_db(tab: str, main: str, subs: list) -> List[dict]:
                 filter_expr = Attr('post_type').eq(main.lower())  
 
             if subs:
-                sub_filter = None
-                for sub in subs:
-                    if sub_filter:
-                        sub_filter = sub_filter | Attr('tags').contains(sub)
-                    else:
-                        sub_filter = Attr('tags').contains(sub)
-
+                sub_filter = _dynamo_tags_filter(subs)
                 filter_expr = filter_expr & sub_filter if filter_expr else sub_filter
 
-            # Build approval filter: approved or missing field
-            approval_filter = Attr('is_approved').eq(True) | Attr('is_approved').not_exists()
+            if studio:
+                studio_filter = Attr('studio').eq(studio)
+                filter_expr = filter_expr & studio_filter if filter_expr else studio_filter
 
-            # Combine with approval filter
+            # Combine with approval filter: approved or missing field
+            approval_filter = _dynamo_approved_filter()
             filter_expr = filter_expr & approval_filter if filter_expr else approval_filter
 
-            response = posts_table.scan(FilterExpression=filter_expr)
-            logger.debug("[filter_posts_from_db] Filtered posts fetched successfully.")
-            logger.debug(f"[filter_posts_from_db] Filter posts response: {response}")  
-            return response.get('Items', [])
+            page = await _scan_page(posts_table, POST_KEY_ATTRS, limit, cursor, FilterExpression=filter_expr)
+            logger.debug(f"[filter_posts_from_db] Filtered {len(page.items)} posts.")
+            return page
         except ClientError as e:
             logger.error(f"[filter_posts_from_db] Error filtering posts: {e}")
-            return []
-
-def update_user_password(user_id: str, new_password: str) -> bool:
+            return Page([])
+
+def _count_facets(posts: List[dict], partial: bool = False) -> Dict[str, Any]:
+    tag_counts: Counter = Counter()
+    studio_counts: Counter = Counter()
+    for post in posts:
+        tag_counts.update(set(post.get('tags') or []))
+        if post.get('studio'):
+            studio_counts[post['studio']] += 1
+    facets = {
+        "total": len(posts),
+        "tags": dict(sorted(tag_counts.items())),
+        "studios": dict(sorted(studio_counts.items())),
+    }
+    if partial:
+        facets["partial"] = True
+    return facets
+
+async def get_post_facets(main: str, subs: list, studio: Optional[str] = None) -> Dict[str, Any]:
+    """Per-tag and per-studio post counts for a /posts/filter selection.
+
+    Answered from the feed index with ZINTERCARD, else counted over the post
+    replica. Failing both, the counts cover at most FACETS_FALLBACK_LIMIT
+    posts from the primary store (flagged ``"partial"`` when cut short) and
+    are cached for FACETS_FALLBACK_TTL seconds, so facet requests never
+    turn into full scans.
+    """
+    post_type = main.lower() if main and main.lower() != "null" else None
+    facets = await feed_index.facets(post_type, subs, studio)
+    if facets is not None:
+        return facets
+
+    posts = post_replica.selection(post_type, subs, studio)
+    if posts is not None:
+        return _count_facets(posts)
+
+    key = (post_type, tuple(sorted(subs or [])), studio)
+    facets = _facet_fallback.get(key)
+    if facets is MISSING:
+        page = await filter_posts_from_db("Newest", main, subs, limit=FACETS_FALLBACK_LIMIT, studio=studio)
+        facets = _count_facets(page.items, partial=bool(page.next_cursor))
+        _facet_fallback.set(key, facets)
+    return facets
+
+async def search_posts(text: str, post_type: Optional[str] = None, limit: int = 20,
+                       cursor: Optional[str] = None) -> Page:
+    """Full-text search over approved posts, best BM25 match first.
+
+    Matching and ranking come from the local FTS5 index
+    (services/search_index.py); the posts themselves from the usual multi-get.
+    Each post carries its ``search_score`` (lower is better).
+    """
+    state = decode_cursor(cursor)
+    offset = state.get("search_offset") if state else 0
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidCursor("Malformed cursor")
+    hits, has_more = await search_index.search(text, post_type, offset, limit)
+    posts = await get_posts_by_ids([hit["post_id"] for hit in hits])
+    items = [
+        {**posts[hit["post_id"]], "search_score": hit["score"]}
+        for hit in hits if hit["post_id"] in posts
+    ]
+    return Page(items, encode_cursor({"search_offset": offset + limit}) if has_more else None)
+
+async def update_user_password(user_id: str, new_password: str) -> bool:
     try:
         hashed = hash_password(new_password)
-        response = users_table.update_item(
+        response = await users_table.update_item(
             Key={'user_id': user_id},
             UpdateExpression="SET password = :p",
             ExpressionAttributeValues={":p": hashed}
         )
+        await user_cache.invalidate(user_id)
         logger.debug(f"[update_user_password] Password updated for user: {user_id}")
         logger.debug(f"[update_user_password] Password update response: {response}")  
         return True
@@ -498,19 +854,19 @@ def update_user_password(user_id: str, new_password: str) -> bool:
         logger.error(f"[update_user_password] Password update failed for user {user_id}: {e}")
         return False
 
-def update_user_steam_data(user_id: str, steam_data: dict) -> bool:
+async def update_user_steam_data(user_id: str, steam_data: dict) -> bool:
     """Update user's Steam-related data"""
     try:
         # Use the existing update_user_profile function which handles None values properly
-        return update_user_profile(user_id, steam_data)
+        return await update_user_profile(user_id, steam_data)
     except Exception as e:
         logger.error(f"[update_user_steam_data] Error updating Steam data: {e}")
         return False
 
-def update_user_2fa(user_id: str, secret: str, enabled: bool = False) -> bool:
+async def update_user_2fa(user_id: str, secret: str, enabled: bool = False) -> bool:
     """Update user's 2FA settings"""
     try:
-        response = users_table.update_item(
+        response = await users_table.update_item(
             Key={'user_id': user_id},
             UpdateExpression="SET two_factor_secret = :s, two_factor_enabled = :e",
             ExpressionAttributeValues={
@@ -518,6 +874,7 @@ def update_user_2fa(user_id: str, secret: str, enabled: bool = False) -> bool:
                 ':e': enabled
             }
         )
+        await user_cache.invalidate(user_id)
         logger.debug(f"[update_user_2fa] 2FA settings updated for user: {user_id}")
         logger.debug(f"[update_user_2fa] 2FA update response: {response}")
         return True
@@ -526,10 +883,11 @@ def update_user_2fa(user_id: str, secret: str, enabled: bool = False) -> bool:
         return False
 
 
-def verify_2fa_code(user_id: str, code: str) -> bool:
-    """Verify a 2FA code for a user"""
+async def verify_2fa_code(user_id: str, code: str, user: Optional[dict] = None) -> bool:
+    """Verify a 2FA code for a user. Pass `user` when the caller already loaded it."""
     try:
-        user = get_user_from_db(user_id)
+        if user is None:
+            user = await get_user_from_db(user_id, with_secrets=True)
         if not user or not user.get('two_factor_secret'):
             return False
 
@@ -541,19 +899,17 @@ def verify_2fa_code(user_id: str, code: str) -> bool:
 
 # Steam User Management
 
-def get_user_by_steam_id(steam_id: str) -> Optional[dict]:
+async def get_user_by_steam_id(steam_id: str) -> Optional[dict]:
     """Find user by Steam ID"""
     try:
-        response = users_table.scan(
-            FilterExpression=Attr('external_ids.steam').eq(steam_id)
-        )
-        items = response.get('Items', [])
-        return items[0] if items else None
+        # GSIs cannot key on nested attributes, so Steam users carry a top-level
+        # `steam_id` mirroring `external_ids.steam`
+        return await _query_user_index(STEAM_ID_INDEX, 'steam_id', steam_id)
     except ClientError as e:
         logger.error(f"[get_user_by_steam_id] Error finding user by Steam ID: {e}")
         return None
 
-def create_user_from_steam(steam_profile: dict) -> dict:
+async def create_user_from_steam(steam_profile: dict) -> dict:
     """Create new user from Steam profile"""
     try:
         user_id = str(uuid.uuid4())
@@ -566,90 +922,105 @@ def create_user_from_steam(steam_profile: dict) -> dict:
             "is_verified": True,
             "user_type": "Tester",
             "external_ids": {"steam": steam_profile['steam_id']},
+            "steam_id": steam_profile['steam_id'],
             "steam_profile": steam_profile,
             "created_at": str(datetime.utcnow()),
             "updated_at": str(datetime.utcnow())
         }
         
-        users_table.put_item(Item=user_data)
+        await users_table.put_item(Item=user_data)
         logger.info(f"Created new user from Steam profile: {user_id}")
         return user_data
     except Exception as e:
         logger.error(f"[create_user_from_steam] Error creating user: {e}")
         raise HTTPException(status_code=500, detail="Error creating user from Steam profile")
 
-def get_users_with_steam() -> List[Dict[str, Any]]:
-    """Get all users with Steam profiles"""
+async def list_users(limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """Page through the Users table for the admin panel."""
     try:
-        response = users_table.scan(
-            FilterExpression=Attr('steam_profile').exists()
-        )
-        items = response.get('Items', [])
-        logger.info(f"Found {len(items)} users with Steam profiles")
-        return items
+        return await _scan_page(users_table, USER_KEY_ATTRS, limit, cursor)
     except ClientError as e:
-        logger.error(f"[get_users_with_steam] Error: {e}")
-        return []
+        logger.error(f"[list_users] Error: {e}")
+        return Page([])
+
+async def count_users() -> Optional[int]:
+    """Approximate user count from table metadata (refreshed by DynamoDB roughly every six hours)."""
+    try:
+        client = await dynamo.client()
+        response = await client.describe_table(TableName=users_table.name)
+        return response['Table'].get('ItemCount')
+    except ClientError as e:
+        logger.error(f"[count_users] Error: {e}")
+        return None
 
 # ---------------------------------------------------------------------
 # Pending Posts
 # ---------------------------------------------------------------------
 
-def get_pending_posts_from_db() -> List[dict]:
-    """Return all posts that are not yet approved (is_approved == False)."""
+async def get_pending_posts_from_db(limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """Return posts that are not yet approved (is_approved == False), newest first."""
 
     if _sanity_client:
         try:
-            query = '*[_type == "post" && (!defined(is_approved) || is_approved != true)] | order(_createdAt desc)'
-            results = _sanity_client.query_documents(query)
-            logger.debug(f"[get_pending_posts_from_db] Sanity results: {len(results)} items")
-            return results
+            conditions = ['_type == "post"', '(!defined(is_approved) || is_approved != true)']
+            page = await _sanity_page(conditions, {}, limit, cursor, projection=ADMIN_QUEUE)
+            logger.debug(f"[get_pending_posts_from_db] Sanity results: {len(page.items)} items")
+            return page
+        except (InvalidCursor, DependencyUnavailable):
+            raise
         except Exception as e:
             logger.error(f"[get_pending_posts_from_db] Sanity query failed: {e}")
-            return []
+            return Page([])
 
     # DynamoDB fallback
     try:
-        from boto3.dynamodb.conditions import Attr
-        scan_kwargs = {
-            "FilterExpression": Attr("is_approved").ne(True) | Attr("is_approved").not_exists(),
-        }
-        response = posts_table.scan(**scan_kwargs)
-        logger.debug(f"[get_pending_posts_from_db] Dynamo response: {response}")
-        return response.get("Items", [])
+        page = await _scan_page(
+            posts_table, POST_KEY_ATTRS, limit, cursor,
+            FilterExpression=Attr("is_approved").ne(True) | Attr("is_approved").not_exists(),
+        )
+        logger.debug(f"[get_pending_posts_from_db] Dynamo returned {len(page.items)} items")
+        return page
     except ClientError as e:
         logger.error(f"[get_pending_posts_from_db] Dynamo scan failed: {e}")
-        return []
+        return Page([])
 
 # ---------------------------------------------------------------------
 # Delete Post
 # ---------------------------------------------------------------------
 
-def delete_post_in_db(post_id: str, user_id: str) -> bool:
+async def delete_post_in_db(post_id: str, user_id: str) -> bool:
     """Delete a post from Sanity or DynamoDB depending on environment."""
     if _sanity_client:
         try:
             # Fetch doc to verify ownership
-            doc = _sanity_client.get_document(post_id)
+            doc = await _sanity_client.get_document(post_id, OWNERSHIP)
             if not doc:
                 logger.warning(f"[delete_post_in_db] Document {post_id} not found in Sanity")
                 return False
             if doc.get("testerId") != user_id:
                 logger.warning("[delete_post_in_db] User does not own this post")
                 return False
-            _sanity_client.delete_document(post_id)
+            await _sanity_client.delete_document(post_id)
             logger.debug(f"[delete_post_in_db] Deleted Sanity doc {post_id}")
+            await etag_cache.bump(post_dep(post_id))
+            await feed_index.remove_post(post_id)
+            await search_index.remove_post(post_id)
+            await delete_registrations_for_post(post_id)
             return True
         except Exception as e:
             logger.error(f"[delete_post_in_db] Sanity delete failed: {e}")
             return False
     # Dynamo fallback
     try:
-        response = posts_table.delete_item(
+        response = await posts_table.delete_item(
             Key={"post_id": post_id, "user_id": user_id},
             ConditionExpression=Attr("user_id").eq(user_id)
         )
         logger.debug(f"[delete_post_in_db] Dynamo delete response: {response}")
+        await etag_cache.bump(post_dep(post_id))
+        await feed_index.remove_post(post_id)
+        await search_index.remove_post(post_id)
+        await delete_registrations_for_post(post_id)
         return True
     except ClientError as e:
         logger.error(f"[delete_post_in_db] Dynamo delete failed: {e}")
@@ -0,0 +1,177 @@
+import os
+import random
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional
+
+import aioboto3
+from aiobotocore.config import AioConfig
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, \
+    ConnectTimeoutError, EndpointConnectionError, HTTPClientError
+
+from backend.utils.resilience import Dependency
+
+logger = logging.getLogger(__name__)
+
+DYNAMODB_REGION = "us-east-2"
+# Upper bound on concurrent HTTP connections the shared client keeps open to DynamoDB
+MAX_POOL_CONNECTIONS = int(os.getenv("DYNAMODB_MAX_POOL_CONNECTIONS", "50"))
+# Optional override, e.g. http://localhost:8001 for DynamoDB Local
+ENDPOINT_URL = os.getenv("DYNAMODB_ENDPOINT_URL") or None
+CONNECT_TIMEOUT = float(os.getenv("DYNAMODB_CONNECT_TIMEOUT", "2"))
+READ_TIMEOUT = float(os.getenv("DYNAMODB_READ_TIMEOUT", "5"))
+# Retries live in the resilience layer (budgeted, deadline-aware); keep the SDK's own off by default
+SDK_MAX_ATTEMPTS = int(os.getenv("DYNAMODB_SDK_MAX_ATTEMPTS", "1"))
+
+# BatchGetItem accepts at most 100 keys per request
+BATCH_GET_MAX_KEYS = 100
+BATCH_GET_MAX_RETRIES = 5
+
+
+class DynamoDB:
+    """Process-wide aioboto3 DynamoDB resource.
+
+    A single resource (and therefore a single pooled aiohttp connector) is shared
+    by every request on the worker. It is opened lazily on first use and closed
+    on application shutdown.
+    """
+
+    def __init__(self, region_name: str = DYNAMODB_REGION):
+        self.region_name = region_name
+        self._session = aioboto3.Session()
+        self._stack: Optional[AsyncExitStack] = None
+        self._resource = None
+        self._tables: dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+
+    async def resource(self):
+        if self._resource is None:
+            async with self._lock:
+                if self._resource is None:
+                    stack = AsyncExitStack()
+                    self._resource = await stack.enter_async_context(
+                        self._session.resource(
+                            "dynamodb",
+                            region_name=self.region_name,
+                            endpoint_url=ENDPOINT_URL,
+                            config=AioConfig(
+                                max_pool_connections=MAX_POOL_CONNECTIONS,
+                                connect_timeout=CONNECT_TIMEOUT,
+                                read_timeout=READ_TIMEOUT,
+                                retries={"max_attempts": SDK_MAX_ATTEMPTS, "mode": "standard"},
+                            ),
+                        )
+                    )
+                    self._stack = stack
+                    logger.debug(f"[DynamoDB] Opened shared resource ({MAX_POOL_CONNECTIONS} connections)")
+        return self._resource
+
+    async def client(self):
+        """Low-level client sharing the resource's connection pool."""
+        return (await self.resource()).meta.client
+
+    async def table(self, name: str):
+        if name not in self._tables:
+            resource = await self.resource()
+            self._tables[name] = await resource.Table(name)
+        return self._tables[name]
+
+    async def close(self) -> None:
+        if self._stack is not None:
+            await self._stack.aclose()
+        self._stack = None
+        self._resource = None
+        self._tables = {}
+
+
+dynamo = DynamoDB()
+
+_THROTTLING_CODES = frozenset({
+    "ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded",
+})
+_SERVER_CODES = frozenset({"InternalServerError", "ServiceUnavailable"})
+
+
+def _is_failure(exc: BaseException) -> bool:
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in _THROTTLING_CODES | _SERVER_CODES
+    return isinstance(exc, (BotoConnectionError, HTTPClientError))
+
+
+def _is_unsent(exc: BaseException) -> bool:
+    if isinstance(exc, ClientError):
+        return exc.response.get("Error", {}).get("Code") in _THROTTLING_CODES
+    return isinstance(exc, (ConnectTimeoutError, EndpointConnectionError))
+
+
+dynamo_dependency = Dependency("dynamodb", _is_failure, _is_unsent)
+
+
+class AsyncTable:
+    """Awaitable stand-in for a boto3 ``Table`` bound to the shared resource.
+
+    Mirrors the boto3 method names so call sites read the same, e.g.
+    ``await users_table.get_item(Key={"user_id": uid})``.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    async def _call(self, op: str, idempotent: bool = True, hedge: bool = False, **kwargs) -> dict:
+        table = await dynamo.table(self.name)
+        return await dynamo_dependency.call(
+            lambda: getattr(table, op)(**kwargs), idempotent=idempotent, hedge=hedge
+        )
+
+    async def get_item(self, **kwargs) -> dict:
+        return await self._call("get_item", hedge=True, **kwargs)
+
+    async def put_item(self, **kwargs) -> dict:
+        return await self._call("put_item", idempotent=False, **kwargs)
+
+    async def update_item(self, **kwargs) -> dict:
+        return await self._call("update_item", idempotent=False, **kwargs)
+
+    async def delete_item(self, **kwargs) -> dict:
+        # A plain delete can be replayed; a conditional one would fail its check
+        # on retry and report an error for a delete that already happened
+        return await self._call("delete_item", idempotent="ConditionExpression" not in kwargs, **kwargs)
+
+    async def query(self, **kwargs) -> dict:
+        return await self._call("query", hedge=True, **kwargs)
+
+    async def scan(self, **kwargs) -> dict:
+        return await self._call("scan", **kwargs)
+
+
+async def _batch_get_chunk(table_name: str, keys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    resource = await dynamo.resource()
+    request = {table_name: {"Keys": keys}}
+    items: List[Dict[str, Any]] = []
+    for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+        response = await dynamo_dependency.call(lambda: resource.batch_get_item(RequestItems=request))
+        items.extend(response.get("Responses", {}).get(table_name, []))
+        unprocessed = response.get("UnprocessedKeys") or {}
+        if not unprocessed:
+            return items
+        # Throttled keys come back unprocessed; retry them with jittered backoff
+        request = unprocessed
+        await asyncio.sleep(random.uniform(0, min(1.0, 0.05 * 2 ** attempt)))
+    logger.warning(
+        f"[batch_get] {len(request[table_name]['Keys'])} keys still unprocessed in {table_name} "
+        f"after {BATCH_GET_MAX_RETRIES} retries"
+    )
+    return items
+
+
+async def batch_get(table_name: str, keys: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fetch many items by primary key with BatchGetItem.
+
+    Keys are split into chunks of 100 that are requested concurrently, and
+    ``UnprocessedKeys`` are retried. Missing items are simply absent from the
+    result, which is unordered.
+    """
+    chunks = [keys[i:i + BATCH_GET_MAX_KEYS] for i in range(0, len(keys), BATCH_GET_MAX_KEYS)]
+    results = await asyncio.gather(*(_batch_get_chunk(table_name, chunk) for chunk in chunks))
+    return [item for chunk_items in results for item in chunk_items]
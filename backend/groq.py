@@ -0,0 +1,130 @@
+"""Small GROQ query builder used by every Sanity read.
+
+Values are always bound as ``$params`` (never interpolated), documents are
+fetched through a per-use-case projection, and slicing happens server-side::
+
+    q = (GroqQuery('_type == "post"', 'postType == $postType', postType="gaming")
+         .order('_createdAt desc')
+         .project(FEED_CARD)
+         .slice(0, 20))
+    docs = await client.fetch(q)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+# ---------------------------------------------------------------------
+# Projections
+# ---------------------------------------------------------------------
+
+# Post cards in /posts, /posts/filter and the feed index multi-get. Carries the
+# fields the feed index needs (tags, studio, postType, date, advertisingTags).
+FEED_CARD = """{
+  _id, _createdAt, title, description, studio, tags, postType, date,
+  advertisingTags, bannerImage, "images": images[0...1], testerId, capacity,
+  "registrant_count": coalesce(registrant_count, 0)
+}"""
+
+# Full post page (registrants are never returned; see backend/registrations.py)
+POST_DETAIL = """{
+  _id, _rev, _createdAt, _updatedAt, title, description, studio, tags, postType, date,
+  advertisingTags, bannerImage, images, testerId, createdBy, status,
+  is_approved, approved_at, access_instructions, has_nda, rewards, capacity,
+  "registrant_count": coalesce(registrant_count, 0),
+  "waitlist_count": coalesce(waitlist_count, 0)
+}"""
+
+# Admin pending-posts queue
+ADMIN_QUEUE = """{
+  _id, _createdAt, title, description, studio, tags, postType, date,
+  bannerImage, testerId, status, is_approved
+}"""
+
+# A Dev's own posts on their profile pages
+OWNER_VIEW = """{
+  _id, _createdAt, title, description, studio, tags, postType, date,
+  bannerImage, "images": images[0...1], testerId, status, is_approved,
+  "registrant_count": coalesce(registrant_count, 0)
+}"""
+
+# Ownership checks before mutations
+OWNERSHIP = "{_id, testerId}"
+
+# Seat accounting for capped registrations (see backend/registrations.py)
+SEATS = """{
+  _id, _rev, capacity,
+  "registrant_count": coalesce(registrant_count, 0),
+  "waitlist_count": coalesce(waitlist_count, 0)
+}"""
+
+
+class GroqQuery:
+    """Immutable-style builder for ``*[filter] | order(...) [slice] {projection}``."""
+
+    def __init__(self, *conditions: str, **params: Any):
+        self._conditions: List[str] = list(conditions)
+        self._params: Dict[str, Any] = dict(params)
+        self._order: Optional[str] = None
+        self._projection: Optional[str] = None
+        self._slice: str = ""
+        self._pluck: str = ""
+
+    def _copy(self) -> "GroqQuery":
+        other = GroqQuery(*self._conditions, **self._params)
+        other._order = self._order
+        other._projection = self._projection
+        other._slice = self._slice
+        other._pluck = self._pluck
+        return other
+
+    def where(self, condition: str, **params: Any) -> "GroqQuery":
+        """Add a filter condition (AND-ed) and the parameters it references."""
+        other = self._copy()
+        other._conditions.append(condition)
+        other._params.update(params)
+        return other
+
+    def order(self, ordering: str) -> "GroqQuery":
+        other = self._copy()
+        other._order = ordering
+        return other
+
+    def project(self, projection: str) -> "GroqQuery":
+        other = self._copy()
+        other._projection = projection
+        return other
+
+    def pluck(self, attribute: str) -> "GroqQuery":
+        """Return a single attribute per document, e.g. ``.pluck("postId")``."""
+        other = self._copy()
+        other._pluck = f".{attribute}"
+        return other
+
+    def slice(self, start: int, end: int) -> "GroqQuery":
+        """Server-side range ``[start...end]`` (end exclusive)."""
+        other = self._copy()
+        other._slice = f"[{int(start)}...{int(end)}]"
+        return other
+
+    def first(self) -> "GroqQuery":
+        """Return the first matching document (or null) instead of a list."""
+        other = self._copy()
+        other._slice = "[0]"
+        return other
+
+    def build(self) -> Tuple[str, Dict[str, Any]]:
+        query = f'*[{" && ".join(self._conditions) or "true"}]'
+        if self._order:
+            query += f" | order({self._order})"
+        query += self._slice + self._pluck
+        if self._projection:
+            query += " " + self._projection
+        return query, dict(self._params)
+
+
+def by_id(doc_id: str, projection: Optional[str] = None) -> GroqQuery:
+    q = GroqQuery("_id == $id", id=doc_id).first()
+    return q.project(projection) if projection else q
+
+
+def by_ids(doc_ids: List[str], projection: Optional[str] = None) -> GroqQuery:
+    q = GroqQuery("_id in $ids", ids=list(doc_ids))
+    return q.project(projection) if projection else q
@@ -0,0 +1,41 @@
+import os
+
+from fastapi import Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from backend.utils.resilience import deadline
+
+# Upper bound on the time a request may spend waiting on Sanity/DynamoDB
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "8"))
+# Routes that stream images into Sanity (each upload alone may take
+# SANITY_UPLOAD_TIMEOUT) get this budget instead
+UPLOAD_DEADLINE = float(os.getenv("UPLOAD_REQUEST_DEADLINE", "120"))
+UPLOAD_ROUTES = frozenset({
+    ("POST", "/posts"),
+    ("POST", "/posts/"),
+    ("POST", "/users/profile/upload-avatar"),
+    ("POST", "/uploads/image"),
+})
+
+
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """Give every request a deadline that outbound calls inherit.
+
+    Clients (or an upstream proxy) may ask for a shorter budget with
+    ``X-Request-Timeout: <seconds>``; it can never exceed ``REQUEST_DEADLINE``
+    (``UPLOAD_DEADLINE`` for the image upload routes in ``UPLOAD_ROUTES``).
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if (request.method, request.url.path) in UPLOAD_ROUTES:
+            seconds = UPLOAD_DEADLINE
+        else:
+            seconds = REQUEST_DEADLINE
+        requested = request.headers.get("X-Request-Timeout")
+        if requested:
+            try:
+                seconds = min(seconds, max(0.0, float(requested)))
+            except ValueError:
+                pass
+        with deadline(seconds):
+            return await call_next(request)
@@ -1,15 +1,16 @@
 from datetime import datetime
 import uuid
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable
 
-import boto3
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
 
+from backend.dynamo import AsyncTable
+
 # Attempt to import the Sanity client from the project
 try:
-    from backend.sanity_client import SanityClient
+    from backend.sanity_client import SanityClient, SanityTransaction
     _sanity_client = SanityClient()
 except Exception as e:
     _sanity_client = None
@@ -18,56 +19,105 @@ except Exception as e:
 logger = logging.getLogger(__name__)
 
 # DynamoDB fallback setup (used if Sanity is not configured)
-dynamodb = boto3.resource("dynamodb", region_name="us-east-2")
-notifications_table = dynamodb.Table("Notifications")
+notifications_table = AsyncTable("Notifications")
 
 
-def send_notification(
-    recipient_id: str,
+def _sanity_notification(recipient_id: str, message: str,
+                         metadata: Optional[Dict[str, Any]], timestamp_iso: str) -> Dict[str, Any]:
+    return {
+        "_id": str(uuid.uuid4()),
+        "recipientId": recipient_id,
+        "message": message,
+        "metadata": metadata or {},
+        "createdAt": timestamp_iso,
+    }
+
+
+def add_notifications(
+    transaction: "SanityTransaction",
+    recipient_ids: Iterable[str],
     message: str,
     metadata: Optional[Dict[str, Any]] = None,
-) -> bool:
-    """Create a notification entry for a single recipient.
+) -> None:
+    """Queue one Sanity `notification` document per recipient on an open transaction.
 
-    Depending on the environment, this will either create a Sanity document of
-    type `notification` **or** store a record in the DynamoDB `Notifications`
-    table. The function is best-effort and will return ``False`` on failure so
-    the caller can decide whether a hard failure is required.
+    Lets callers commit notifications atomically with the change they announce.
     """
     timestamp_iso = datetime.utcnow().isoformat()
-    notif_id = str(uuid.uuid4())
+    for recipient_id in dict.fromkeys(filter(None, recipient_ids)):
+        transaction.create("notification", _sanity_notification(recipient_id, message, metadata, timestamp_iso))
+
+
+async def send_notifications(
+    recipient_ids: Iterable[str],
+    message: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Create the same notification for several recipients.
+
+    On Sanity all documents are written in a single transaction; the DynamoDB
+    fallback writes one item per recipient. Best-effort like ``send_notification``.
+    """
+    recipients = list(dict.fromkeys(filter(None, recipient_ids)))
+    if not recipients:
+        return True
 
-    # If a Sanity client is configured, create a document there
     if _sanity_client:
         try:
-            doc = {
-                "_type": "notification",
-                "_id": notif_id,
-                "recipientId": recipient_id,
-                "message": message,
-                "metadata": metadata or {},
-                "createdAt": timestamp_iso,
-            }
-            _sanity_client.create_document("notification", doc)
-            logger.debug(f"[send_notification] Sanity notification created: {notif_id}")
+            async with _sanity_client.transaction() as tx:
+                add_notifications(tx, recipients, message, metadata)
+            logger.debug(f"[send_notifications] Sanity notifications created for {len(recipients)} recipients")
             return True
         except Exception as e:
-            logger.error(f"[send_notification] Failed to create Sanity notification: {e}")
+            logger.error(f"[send_notifications] Failed to create Sanity notifications: {e}")
             # Fall through to DynamoDB as secondary storage
 
-    # DynamoDB fallback
+    results = [await _put_dynamo_notification(rid, message, metadata) for rid in recipients]
+    return all(results)
+
+
+async def _put_dynamo_notification(recipient_id: str, message: str,
+                                   metadata: Optional[Dict[str, Any]]) -> bool:
+    notif_id = str(uuid.uuid4())
     try:
         item = {
             "recipient_id": recipient_id,
             "notification_id": notif_id,
             "message": message,
-            "created_at": timestamp_iso,
+            "created_at": datetime.utcnow().isoformat(),
         }
         if metadata is not None:
             item["metadata"] = metadata
-        notifications_table.put_item(Item=item)
+        await notifications_table.put_item(Item=item)
         logger.debug(f"[send_notification] DynamoDB notification created: {notif_id}")
         return True
     except ClientError as e:
         logger.error(f"[send_notification] DynamoDB put_item failed: {e}")
         return False
+
+
+async def send_notification(
+    recipient_id: str,
+    message: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Create a notification entry for a single recipient.
+
+    Depending on the environment, this will either create a Sanity document of
+    type `notification` **or** store a record in the DynamoDB `Notifications`
+    table. The function is best-effort and will return ``False`` on failure so
+    the caller can decide whether a hard failure is required.
+    """
+    # If a Sanity client is configured, create a document there
+    if _sanity_client:
+        try:
+            doc = _sanity_notification(recipient_id, message, metadata, datetime.utcnow().isoformat())
+            await _sanity_client.create_document("notification", doc)
+            logger.debug(f"[send_notification] Sanity notification created: {doc['_id']}")
+            return True
+        except Exception as e:
+            logger.error(f"[send_notification] Failed to create Sanity notification: {e}")
+            # Fall through to DynamoDB as secondary storage
+
+    # DynamoDB fallback
+    return await _put_dynamo_notification(recipient_id, message, metadata)
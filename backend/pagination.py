@@ -0,0 +1,38 @@
+import base64
+import json
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Page size used by list endpoints when the client does not pass `limit`
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client-supplied cursor cannot be decoded."""
+
+
+class Page(NamedTuple):
+    """One page of results plus the opaque cursor for the next page (None when exhausted)."""
+
+    items: List[dict]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(state: Dict[str, Any]) -> str:
+    """Serialise pagination state (a DynamoDB LastEvaluatedKey, a GROQ keyset, ...)
+    into an opaque URL-safe token."""
+    raw = json.dumps(state, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Malformed cursor: {e}")
+    if not isinstance(state, dict):
+        raise InvalidCursor("Malformed cursor")
+    return state
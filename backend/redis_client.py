@@ -0,0 +1,23 @@
+import logging
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Set once by the app's startup hook (see app.py); None until Redis is reachable
+_client: Optional[aioredis.Redis] = None
+
+
+def set_redis(client: aioredis.Redis) -> None:
+    global _client
+    _client = client
+
+
+def get_redis() -> Optional[aioredis.Redis]:
+    """Return the shared async Redis client, or None when Redis is not configured.
+
+    Callers treat Redis as an optimisation and must fall back to the primary
+    store when this returns None or a command raises ``RedisError``.
+    """
+    return _client
@@ -0,0 +1,670 @@
+from datetime import datetime
+import os
+import uuid
+import random
+import asyncio
+import logging
+import weakref
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+
+from backend.dynamo import AsyncTable, dynamo, dynamo_dependency
+from backend.groq import SEATS, GroqQuery
+from backend.pagination import Page, InvalidCursor, encode_cursor, decode_cursor
+from backend.services.etag_cache import etag_cache, post_dep
+from backend.utils.resilience import DependencyUnavailable
+
+# Attempt to import the Sanity client from the project
+try:
+    from backend.sanity_client import SanityClient, SanityConflictError
+    _sanity_client = SanityClient()
+except Exception as e:
+    _sanity_client = None
+    logging.warning(f"Sanity client not initialized for registrations: {e}")
+
+logger = logging.getLogger(__name__)
+
+# DynamoDB fallback setup (used if Sanity is not configured).
+# Key: post_id (HASH) + user_id (RANGE); USER_INDEX is the reverse lookup.
+# Created by scripts/registrations_table.py.
+registrations_table = AsyncTable("Registrations")
+posts_table = AsyncTable("Posts")
+USER_INDEX = "user_id-index"
+
+# Counters kept on the post item/document, updated in the same transaction.
+# registrant_count counts confirmed seats only; an optional `capacity` caps it.
+COUNT_FIELD = "registrant_count"
+WAITLIST_FIELD = "waitlist_count"
+CAPACITY_FIELD = "capacity"
+
+CONFIRMED = "confirmed"
+WAITLISTED = "waitlisted"
+
+# Concurrent sign-ups for one post are committed together, up to this many per transaction
+BATCH_MAX = int(os.getenv("REGISTRATION_BATCH_MAX", "25"))
+# Optimistic-concurrency retries (revision conflicts, DynamoDB TransactionConflict)
+MAX_ATTEMPTS = int(os.getenv("REGISTRATION_MAX_ATTEMPTS", "10"))
+BACKOFF_BASE = float(os.getenv("REGISTRATION_BACKOFF_BASE", "0.01"))
+BACKOFF_CAP = float(os.getenv("REGISTRATION_BACKOFF_CAP", "0.5"))
+
+REGISTRATION = '{postId, userId, name, email, registeredAt, "status": coalesce(status, "confirmed")}'
+
+# Seat changes for one post are serialised within this worker, so they never
+# conflict with each other; other workers are caught by the optimistic checks
+_post_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+# Sign-ups waiting for the next group commit, per post
+_queues: Dict[str, List["_Pending"]] = {}
+_drainers: Set[asyncio.Task] = set()
+
+
+class AlreadyRegistered(Exception):
+    """The user already has a registration for this post."""
+
+
+def _sanity_id(post_id: str, user_id: str) -> str:
+    # Dotted IDs are private in Sanity: registrant details are never served publicly
+    return f"registration.{post_id}.{user_id}"
+
+
+def _from_sanity(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "post_id": doc.get("postId"),
+        "user_id": doc.get("userId"),
+        "name": doc.get("name"),
+        "email": doc.get("email"),
+        "registered_at": doc.get("registeredAt"),
+        "status": doc.get("status"),
+    }
+
+
+class _Pending(NamedTuple):
+    user_id: str
+    fields: Dict[str, Any]
+    future: asyncio.Future
+
+
+def _post_lock(post_id: str) -> asyncio.Lock:
+    lock = _post_locks.get(post_id)
+    if lock is None:
+        lock = _post_locks[post_id] = asyncio.Lock()
+    return lock
+
+
+async def _backoff(attempt: int) -> None:
+    await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+
+def _contention(post_id: str) -> DependencyUnavailable:
+    logger.warning(f"[registrations] Gave up on post {post_id} after {MAX_ATTEMPTS} conflicting attempts")
+    return DependencyUnavailable("registrations", "too many concurrent sign-ups, please retry", retry_after=1)
+
+
+async def register(post_id: str, user_id: str, name: Optional[str] = None,
+                   email: Optional[str] = None) -> Optional[str]:
+    """Register a user for a post and return ``"confirmed"`` or ``"waitlisted"``.
+
+    Posts without a ``capacity`` confirm everyone. Otherwise a seat is taken
+    only while ``registrant_count < capacity``, and later sign-ups join the
+    waitlist (counted in ``waitlist_count``). Registrations and counters
+    change in one transaction, so seats are never oversold.
+
+    Sign-ups for the same post that arrive while a commit is in flight are
+    queued and committed together (group commit). A burst on a popular post
+    therefore costs a few transactions rather than one conflicting
+    transaction per user. Raises ``AlreadyRegistered`` for a duplicate and
+    returns ``None`` on any other failure.
+    """
+    fields = {"registered_at": datetime.utcnow().isoformat()}
+    if name:
+        fields["name"] = name
+    if email:
+        fields["email"] = email
+    pending = _Pending(user_id, fields, asyncio.get_running_loop().create_future())
+    queue = _queues.get(post_id)
+    if queue is None:
+        queue = _queues[post_id] = []
+        task = asyncio.create_task(_drain(post_id, queue))
+        _drainers.add(task)
+        task.add_done_callback(_drainers.discard)
+    queue.append(pending)
+    return await pending.future
+
+
+async def _drain(post_id: str, queue: List[_Pending]) -> None:
+    commit = _sanity_commit if _sanity_client else _dynamo_commit
+    batch: List[_Pending] = []
+    try:
+        while queue:
+            batch = []
+            seen: Set[str] = set()
+            for pending in queue[:BATCH_MAX]:
+                if pending.user_id in seen:
+                    _settle([pending], exc=AlreadyRegistered(post_id))
+                else:
+                    seen.add(pending.user_id)
+                    batch.append(pending)
+            del queue[:BATCH_MAX]
+            async with _post_lock(post_id):
+                try:
+                    await commit(post_id, batch)
+                except DependencyUnavailable as e:
+                    _settle(batch, exc=e)
+                except Exception as e:
+                    logger.error(f"[register] Commit of {len(batch)} registrations failed: {e}")
+                    _settle(batch, result=None)
+            await etag_cache.bump(post_dep(post_id))
+    finally:
+        _queues.pop(post_id, None)
+        # Only reached with work left over if the drain was cancelled (shutdown)
+        _settle(batch + queue, exc=DependencyUnavailable("registrations", "server shutting down"))
+
+
+def _settle(batch: List[_Pending], result: Any = None, exc: Optional[BaseException] = None) -> None:
+    for pending in batch:
+        if pending.future.done():
+            continue
+        if exc is not None:
+            pending.future.set_exception(exc)
+        else:
+            pending.future.set_result(result)
+
+
+def _resolve(batch: List[_Pending], statuses: List[str]) -> None:
+    """Hand each waiter its committed status.
+
+    A waiter whose request was cancelled meanwhile keeps the registration;
+    the others must still hear that theirs went through.
+    """
+    for pending, status in zip(batch, statuses):
+        if not pending.future.done():
+            pending.future.set_result(status)
+
+
+def _assign(batch: List[_Pending], capacity: Optional[int], taken: int) -> List[str]:
+    """Seats go to the batch in arrival order; the rest are waitlisted."""
+    free = len(batch) if capacity is None else max(0, int(capacity) - int(taken))
+    return [CONFIRMED if i < free else WAITLISTED for i in range(len(batch))]
+
+
+async def unregister(post_id: str, user_id: str) -> bool:
+    """Cancel a registration; a freed seat goes to the head of the waitlist."""
+    async with _post_lock(post_id):
+        if _sanity_client:
+            status = await _sanity_unregister(post_id, user_id)
+        else:
+            status = await _dynamo_unregister(post_id, user_id)
+    if status is not None:
+        await etag_cache.bump(post_dep(post_id))
+    if status == CONFIRMED:
+        await promote_waitlist(post_id)
+    return status is not None
+
+
+async def promote_waitlist(post_id: str) -> int:
+    """Move waitlisted users (oldest first) into free seats; returns how many moved.
+
+    Called after a confirmed registration is cancelled; also safe to run any
+    time, e.g. after raising a post's capacity.
+    """
+    try:
+        async with _post_lock(post_id):
+            if _sanity_client:
+                promoted = await _sanity_promote(post_id)
+            else:
+                promoted = await _dynamo_promote(post_id)
+    except DependencyUnavailable as e:
+        # The seat stays free until the next cancellation or promotion run
+        logger.warning(f"[promote_waitlist] Promotion for {post_id} deferred: {e}")
+        return 0
+    if promoted:
+        await etag_cache.bump(post_dep(post_id))
+        logger.info(f"[promote_waitlist] Promoted {promoted} waitlisted registrations for {post_id}")
+    return promoted
+
+
+# ---------------------------------------------------------------------
+# Sanity: the post's _rev guards capped posts (optimistic concurrency)
+# ---------------------------------------------------------------------
+
+async def _sanity_commit(post_id: str, batch: List[_Pending]) -> None:
+    for attempt in range(MAX_ATTEMPTS):
+        post = await _sanity_client.get_document(post_id, SEATS)
+        if not post:
+            logger.error(f"[register] Post {post_id} not found in Sanity")
+            _settle(batch, result=None)
+            return
+        capacity = post.get(CAPACITY_FIELD)
+        statuses = _assign(batch, capacity, post[COUNT_FIELD])
+        inc = {COUNT_FIELD: statuses.count(CONFIRMED), WAITLIST_FIELD: statuses.count(WAITLISTED)}
+        inc = {field: n for field, n in inc.items() if n}
+        try:
+            async with _sanity_client.transaction() as tx:
+                for pending, status in zip(batch, statuses):
+                    tx.create("registration", {
+                        "_id": _sanity_id(post_id, pending.user_id),
+                        "postId": post_id,
+                        "userId": pending.user_id,
+                        "name": pending.fields.get("name"),
+                        "email": pending.fields.get("email"),
+                        "registeredAt": pending.fields["registered_at"],
+                        "status": status,
+                    })
+                # `create` fails on an existing ID and rolls back the counters; on capped
+                # posts the revision check also fails if the seat count moved since the read
+                tx.patch(post_id, set_if_missing={field: 0 for field in inc}, inc=inc,
+                         if_revision_id=post["_rev"] if capacity is not None else None)
+        except SanityConflictError:
+            existing = set(await _sanity_client.fetch(
+                GroqQuery('_id in $ids', ids=[_sanity_id(post_id, p.user_id) for p in batch]).pluck("_id")
+            ))
+            duplicates = [p for p in batch if _sanity_id(post_id, p.user_id) in existing]
+            _settle(duplicates, exc=AlreadyRegistered(post_id))
+            batch = [p for p in batch if p not in duplicates]
+            if not batch:
+                return
+            if not duplicates:
+                await _backoff(attempt)
+            continue
+        _resolve(batch, statuses)
+        return
+    _settle(batch, exc=_contention(post_id))
+
+
+async def _sanity_unregister(post_id: str, user_id: str) -> Optional[str]:
+    doc_id = _sanity_id(post_id, user_id)
+    try:
+        for attempt in range(MAX_ATTEMPTS):
+            reg = await _sanity_client.get_document(doc_id, '{_rev, "status": coalesce(status, "confirmed")}')
+            if not reg:
+                return None
+            counter = COUNT_FIELD if reg["status"] == CONFIRMED else WAITLIST_FIELD
+            try:
+                async with _sanity_client.transaction() as tx:
+                    # Pins the status read above: a concurrent promotion makes this retry
+                    tx.patch(doc_id, set={"status": reg["status"]}, if_revision_id=reg["_rev"])
+                    tx.delete(doc_id)
+                    tx.patch(post_id, inc={counter: -1})
+                return reg["status"]
+            except SanityConflictError:
+                await _backoff(attempt)
+        raise _contention(post_id)
+    except DependencyUnavailable:
+        raise
+    except Exception as e:
+        logger.error(f"[unregister] Sanity transaction failed: {e}")
+        return None
+
+
+async def _sanity_promote(post_id: str) -> int:
+    promoted = 0
+    conflicts = 0
+    next_in_line = (
+        GroqQuery('_type == "registration"', 'postId == $postId', 'status == $status',
+                  postId=post_id, status=WAITLISTED)
+        .order('registeredAt asc')
+        .project("{_id, _rev}")
+        .first()
+    )
+    while conflicts < MAX_ATTEMPTS:
+        post = await _sanity_client.get_document(post_id, SEATS)
+        if not post:
+            break
+        capacity = post.get(CAPACITY_FIELD)
+        if capacity is not None and post[COUNT_FIELD] >= capacity:
+            break
+        reg = await _sanity_client.fetch(next_in_line)
+        if not reg:
+            break
+        try:
+            async with _sanity_client.transaction() as tx:
+                tx.patch(reg["_id"], set={"status": CONFIRMED, "promotedAt": datetime.utcnow().isoformat()},
+                         if_revision_id=reg["_rev"])
+                tx.patch(post_id, set_if_missing={COUNT_FIELD: 0, WAITLIST_FIELD: 0},
+                         inc={COUNT_FIELD: 1, WAITLIST_FIELD: -1}, if_revision_id=post["_rev"])
+            promoted += 1
+        except SanityConflictError:
+            await _backoff(conflicts)
+            conflicts += 1
+    return promoted
+
+
+# ---------------------------------------------------------------------
+# DynamoDB: conditional counters inside TransactWriteItems
+# ---------------------------------------------------------------------
+
+# A promotion's seat check runs on the post item in the same transaction
+_HAS_SEAT = (
+    f"attribute_exists(post_id) AND (attribute_not_exists({CAPACITY_FIELD}) "
+    f"OR attribute_not_exists({COUNT_FIELD}) OR {COUNT_FIELD} < {CAPACITY_FIELD})"
+)
+
+
+async def _transact(items: List[Dict[str, Any]]) -> None:
+    client = await dynamo.client()
+    # The request token makes a retried transaction a no-op if the first one landed
+    token = str(uuid.uuid4())
+    await dynamo_dependency.call(lambda: client.transact_write_items(ClientRequestToken=token, TransactItems=items))
+
+
+def _reasons(e: ClientError) -> List[str]:
+    """Cancellation code per transaction item (``"None"`` for items that passed)."""
+    return [r.get("Code", "None") for r in e.response.get("CancellationReasons") or []]
+
+
+def _post_update(post_id: str, expression: str, condition: str, values: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "Update": {
+            "TableName": "Posts",
+            "Key": {"post_id": post_id},
+            "UpdateExpression": expression,
+            "ConditionExpression": condition,
+            "ExpressionAttributeValues": values,
+            # Tells "post is full" (item returned) apart from "post does not exist"
+            "ReturnValuesOnConditionCheckFailure": "ALL_OLD",
+        }
+    }
+
+
+async def _dynamo_commit(post_id: str, batch: List[_Pending]) -> None:
+    for attempt in range(MAX_ATTEMPTS):
+        response = await posts_table.get_item(
+            Key={"post_id": post_id},
+            ConsistentRead=True,
+            ProjectionExpression=f"post_id, {CAPACITY_FIELD}, {COUNT_FIELD}",
+        )
+        post = response.get("Item")
+        if not post:
+            logger.error(f"[register] Post {post_id} not found in DynamoDB")
+            _settle(batch, result=None)
+            return
+        capacity = post.get(CAPACITY_FIELD)
+        statuses = _assign(batch, capacity, post.get(COUNT_FIELD, 0))
+
+        # On capped posts the counter read above acts as the version: the
+        # update only applies if nobody took or freed a seat in between
+        values: Dict[str, Any] = {":confirmed": statuses.count(CONFIRMED), ":waitlisted": statuses.count(WAITLISTED)}
+        condition = "attribute_exists(post_id)"
+        if capacity is not None:
+            values[":capacity"] = capacity
+            condition += f" AND {CAPACITY_FIELD} = :capacity"
+            if COUNT_FIELD in post:
+                values[":taken"] = post[COUNT_FIELD]
+                condition += f" AND {COUNT_FIELD} = :taken"
+            else:
+                condition += f" AND attribute_not_exists({COUNT_FIELD})"
+        items: List[Dict[str, Any]] = [
+            {
+                "Put": {
+                    "TableName": registrations_table.name,
+                    "Item": {"post_id": post_id, "user_id": pending.user_id, "status": status, **pending.fields},
+                    "ConditionExpression": "attribute_not_exists(user_id)",
+                }
+            }
+            for pending, status in zip(batch, statuses)
+        ]
+        items.append(_post_update(post_id, f"ADD {COUNT_FIELD} :confirmed, {WAITLIST_FIELD} :waitlisted",
+                                  condition, values))
+        try:
+            await _transact(items)
+        except ClientError as e:
+            reasons = _reasons(e)
+            if not reasons:
+                raise
+            duplicates = [p for p, code in zip(batch, reasons) if code == "ConditionalCheckFailed"]
+            _settle(duplicates, exc=AlreadyRegistered(post_id))
+            batch = [p for p in batch if p not in duplicates]
+            post_failed = reasons[-1] == "ConditionalCheckFailed"
+            if post_failed and "Item" not in e.response["CancellationReasons"][-1]:
+                logger.error(f"[register] Post {post_id} disappeared during registration")
+                _settle(batch, result=None)
+                return
+            if not batch:
+                return
+            if not duplicates:
+                if not post_failed and "TransactionConflict" not in reasons:
+                    raise
+                await _backoff(attempt)
+            continue
+        _resolve(batch, statuses)
+        return
+    _settle(batch, exc=_contention(post_id))
+
+
+async def _dynamo_unregister(post_id: str, user_id: str) -> Optional[str]:
+    key = {"post_id": post_id, "user_id": user_id}
+    try:
+        for attempt in range(MAX_ATTEMPTS):
+            response = await registrations_table.get_item(Key=key, ProjectionExpression="#s",
+                                                          ExpressionAttributeNames={"#s": "status"})
+            if "Item" not in response:
+                return None
+            status = response["Item"].get("status", CONFIRMED)
+            # Rows from before the waitlist have no status and count as confirmed
+            condition = "#s = :status" if "status" in response["Item"] else "attribute_not_exists(#s)"
+            values = {":status": status} if "status" in response["Item"] else None
+            delete: Dict[str, Any] = {
+                "TableName": registrations_table.name,
+                "Key": key,
+                "ConditionExpression": condition,
+                "ExpressionAttributeNames": {"#s": "status"},
+            }
+            if values:
+                delete["ExpressionAttributeValues"] = values
+            counter = COUNT_FIELD if status == CONFIRMED else WAITLIST_FIELD
+            try:
+                await _transact([
+                    {"Delete": delete},
+                    {"Update": {
+                        "TableName": "Posts",
+                        "Key": {"post_id": post_id},
+                        "UpdateExpression": f"ADD {counter} :minus",
+                        "ExpressionAttributeValues": {":minus": -1},
+                    }},
+                ])
+                return status
+            except ClientError as e:
+                reasons = _reasons(e)
+                if "TransactionConflict" not in reasons and reasons[:1] != ["ConditionalCheckFailed"]:
+                    raise
+                await _backoff(attempt)
+        raise _contention(post_id)
+    except ClientError as e:
+        logger.error(f"[unregister] DynamoDB transaction failed: {e}")
+        return None
+
+
+async def _dynamo_waitlist(post_id: str) -> List[Dict[str, Any]]:
+    """Waitlisted registrations for a post, oldest first."""
+    query_kwargs: Dict[str, Any] = {
+        "KeyConditionExpression": Key("post_id").eq(post_id),
+        "FilterExpression": Attr("status").eq(WAITLISTED),
+        "ProjectionExpression": "user_id, registered_at",
+    }
+    entries: List[Dict[str, Any]] = []
+    while True:
+        response = await registrations_table.query(**query_kwargs)
+        entries.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    entries.sort(key=lambda item: item.get("registered_at", ""))
+    return entries
+
+
+async def _dynamo_promote(post_id: str) -> int:
+    promoted = 0
+    conflicts = 0
+    try:
+        waitlist = await _dynamo_waitlist(post_id)
+    except ClientError as e:
+        logger.error(f"[promote_waitlist] DynamoDB waitlist query failed: {e}")
+        return 0
+    for entry in waitlist:
+        while True:
+            seat = _post_update(post_id, f"ADD {COUNT_FIELD} :one, {WAITLIST_FIELD} :minus", _HAS_SEAT,
+                                {":one": 1, ":minus": -1})
+            try:
+                await _transact([
+                    {"Update": {
+                        "TableName": registrations_table.name,
+                        "Key": {"post_id": post_id, "user_id": entry["user_id"]},
+                        "UpdateExpression": "SET #s = :confirmed, promoted_at = :now",
+                        "ConditionExpression": "#s = :waitlisted",
+                        "ExpressionAttributeNames": {"#s": "status"},
+                        "ExpressionAttributeValues": {
+                            ":confirmed": CONFIRMED,
+                            ":waitlisted": WAITLISTED,
+                            ":now": datetime.utcnow().isoformat(),
+                        },
+                    }},
+                    seat,
+                ])
+                promoted += 1
+                break
+            except ClientError as e:
+                reasons = _reasons(e)
+                if "TransactionConflict" in reasons and conflicts < MAX_ATTEMPTS:
+                    await _backoff(conflicts)
+                    conflicts += 1
+                    continue
+                if reasons[:1] == ["ConditionalCheckFailed"]:
+                    break  # cancelled or promoted elsewhere: try the next in line
+                if reasons[1:2] != ["ConditionalCheckFailed"]:
+                    logger.error(f"[promote_waitlist] DynamoDB transaction failed: {e}")
+                return promoted  # no free seat left
+    return promoted
+
+
+async def is_registered(post_id: str, user_id: str) -> bool:
+    """Point lookup of a single registration."""
+    if _sanity_client:
+        try:
+            return bool(await _sanity_client.get_document(_sanity_id(post_id, user_id), "{_id}"))
+        except DependencyUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"[is_registered] Sanity lookup failed: {e}")
+            return False
+    try:
+        response = await registrations_table.get_item(
+            Key={"post_id": post_id, "user_id": user_id},
+            ProjectionExpression="user_id",
+        )
+        return "Item" in response
+    except ClientError as e:
+        logger.error(f"[is_registered] DynamoDB get_item failed: {e}")
+        return False
+
+
+async def list_registrants(post_id: str, limit: Optional[int] = None,
+                           cursor: Optional[str] = None) -> Page:
+    """Registrations for a post ordered by user_id, one page at a time.
+
+    Waitlisted users are included; each item carries its ``status``.
+    """
+    state = decode_cursor(cursor)
+    after = state.get("after") if state else None
+    if state is not None and not isinstance(after, str):
+        raise InvalidCursor("Malformed cursor")
+
+    if _sanity_client:
+        query = GroqQuery('_type == "registration"', 'postId == $postId', postId=post_id)
+        if after:
+            query = query.where('userId > $after', after=after)
+        query = query.order('userId asc').project(REGISTRATION)
+        if limit:
+            query = query.slice(0, limit + 1)
+        try:
+            docs = await _sanity_client.fetch(query)
+        except DependencyUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"[list_registrants] Sanity query failed: {e}")
+            return Page([])
+        items = [_from_sanity(doc) for doc in docs]
+        if limit and len(items) > limit:
+            items = items[:limit]
+            return Page(items, encode_cursor({"after": items[-1]["user_id"]}))
+        return Page(items)
+
+    query_kwargs: Dict[str, Any] = {"KeyConditionExpression": Key("post_id").eq(post_id)}
+    if after:
+        query_kwargs["ExclusiveStartKey"] = {"post_id": post_id, "user_id": after}
+    items: List[dict] = []
+    try:
+        while True:
+            if limit:
+                query_kwargs["Limit"] = limit - len(items)
+            response = await registrations_table.query(**query_kwargs)
+            items.extend({"status": CONFIRMED, **item} for item in response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return Page(items)
+            if limit and len(items) >= limit:
+                return Page(items, encode_cursor({"after": last_key["user_id"]}))
+            query_kwargs["ExclusiveStartKey"] = last_key
+    except ClientError as e:
+        logger.error(f"[list_registrants] DynamoDB query failed: {e}")
+        return Page([])
+
+
+async def list_registrant_ids(post_id: str) -> List[str]:
+    """Every registered user_id for a post (follows all pages)."""
+    user_ids: List[str] = []
+    cursor = None
+    while True:
+        page = await list_registrants(post_id, limit=500, cursor=cursor)
+        user_ids.extend(r["user_id"] for r in page.items)
+        cursor = page.next_cursor
+        if not cursor:
+            return user_ids
+
+
+async def list_user_registrations(user_id: str) -> List[str]:
+    """Post IDs a user has registered for (reverse index)."""
+    if _sanity_client:
+        try:
+            return await _sanity_client.fetch(
+                GroqQuery('_type == "registration"', 'userId == $userId', userId=user_id).pluck("postId")
+            )
+        except DependencyUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"[list_user_registrations] Sanity query failed: {e}")
+            return []
+    post_ids: List[str] = []
+    query_kwargs: Dict[str, Any] = {
+        "IndexName": USER_INDEX,
+        "KeyConditionExpression": Key("user_id").eq(user_id),
+        "ProjectionExpression": "post_id",
+    }
+    try:
+        while True:
+            response = await registrations_table.query(**query_kwargs)
+            post_ids.extend(item["post_id"] for item in response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                return post_ids
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    except ClientError as e:
+        logger.error(f"[list_user_registrations] DynamoDB query failed: {e}")
+        return []
+
+
+async def delete_registrations_for_post(post_id: str) -> None:
+    """Best-effort cleanup when a post is deleted."""
+    if _sanity_client:
+        try:
+            await _sanity_client.mutate([
+                {"delete": {"query": '*[_type == "registration" && postId == $postId]',
+                            "params": {"postId": post_id}}}
+            ])
+        except Exception as e:
+            logger.error(f"[delete_registrations_for_post] Sanity delete failed: {e}")
+        return
+    try:
+        for user_id in await list_registrant_ids(post_id):
+            await registrations_table.delete_item(Key={"post_id": post_id, "user_id": user_id})
+    except ClientError as e:
+        logger.error(f"[delete_registrations_for_post] DynamoDB delete failed: {e}")
@@ -6,12 +6,27 @@ from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
 from pydantic import BaseModel
 import os
+import logging
 import datetime
 from ..utils.security import get_current_user, get_admin_user
-from ..database import (get_user_collection, get_user_by_id, get_post_from_db,
+from ..database import (get_user_by_id, get_post_from_db, list_users, count_users,
                         update_user_profile, get_pending_posts_from_db)
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor
 from ..config import get_settings
-from ..notifications import send_notification
+from ..notifications import add_notifications, send_notification, send_notifications
+from ..sanity_client import SanityConflictError, query_stats as sanity_query_stats
+from ..services.asset_cache import asset_cache
+from ..services.etag_cache import etag_cache, post_dep
+from ..services.feed_index import feed_index
+from ..services.for_you import for_you
+from ..services.post_replica import post_replica
+from ..services.registrant_export import registrant_exporter
+from ..services.search_index import search_index
+from ..services.trending import trending
+from ..services.user_cache import user_cache
+from ..services.user_loader import UserLoader, get_user_loader
+from ..utils.resilience import dependency_stats
+from ..utils.responses import STREAM_PAGE_SIZE, stream_pages
 
 router = APIRouter(
     prefix="/admin",
@@ -37,38 +52,24 @@ class PostApprovalRequest(BaseModel):
 
 @router.get("/users", response_model=Dict[str, Any])
 async def get_users(
-    skip: int = Query(0, ge=0),
-    limit: int = Query(10, ge=1, le=100),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
     current_user: dict = Depends(get_admin_user),
 ):
-    """Get users with pagination. Handles both Mongo-style and DynamoDB backends."""
-
-    users_collection = get_user_collection()
-
-    # ---------------- Mongo / Motor style ----------------
-    if hasattr(users_collection, "count_documents"):
-        total = await users_collection.count_documents({})
-        cursor = users_collection.find({}).skip(skip).limit(limit)
-        users: List[Dict[str, Any]] = []
-        async for user in cursor:
-            user["_id"] = str(user.get("_id", ""))
-            users.append(user)
-        return {"total": total, "users": users}
-
-    # ---------------- DynamoDB style ----------------
+    """Get users with cursor pagination. `total` is DynamoDB's approximate item count."""
     try:
-        # Dynamo doesn't support native offset; scan entire table (OK for small user counts)
-        response = users_collection.scan()
-        all_items = response.get("Items", [])
-        total = len(all_items)
-        paged_items = all_items[skip : skip + limit]
-        # For compatibility with frontend, mimic Mongo field names
-        for u in paged_items:
-            u["_id"] = u.get("user_id", "")
-        return {"total": total, "users": paged_items}
+        page = await list_users(limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch users: {e}")
 
+    # For compatibility with frontend, mimic Mongo field names
+    for u in page.items:
+        u["_id"] = u.get("user_id", "")
+    total = await count_users()
+    return {"total": total, "users": page.items, "next_cursor": page.next_cursor}
+
 @router.post("/send-demographic-email", response_model=EmailResponse)
 async def send_demographic_email(request: EmailRequest, current_user: dict = Depends(get_admin_user)):
     """Send demographic information via email. Only accessible by admin users."""
@@ -142,7 +143,9 @@ async def send_demographic_email(request: EmailRequest, current_user: dict = Dep
 
 @router.post("/send-demographic-email-batch", response_model=EmailResponse)
 async def send_demographic_email_batch(
-    request: EmailBatchRequest, current_user: dict = Depends(get_admin_user)
+    request: EmailBatchRequest,
+    current_user: dict = Depends(get_admin_user),
+    users: UserLoader = Depends(get_user_loader),
 ):
     """Send demographic information for multiple users in a single email."""
 
@@ -150,8 +153,7 @@ async def send_demographic_email_batch(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No user IDs provided")
 
     valid_users: List[Dict[str, Any]] = []
-    for uid in request.user_ids:
-        user = await get_user_by_id(uid)
+    for user in await users.load_many(request.user_ids):
         if user and user.get("demographic_info"):
             user["_id"] = str(user.get("_id"))
             valid_users.append(user)
@@ -210,7 +212,7 @@ async def approve_post(request: PostApprovalRequest, current_user: dict = Depend
     If reject is chosen, the post is deleted.
     """
     
-    post = get_post_from_db(request.post_id)
+    post = await get_post_from_db(request.post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -219,32 +221,42 @@ async def approve_post(request: PostApprovalRequest, current_user: dict = Depend
         if post.get("is_approved"):
             return {"message": "Post already approved"}
 
+        # Send notification to tester and dev (if testerId field present)
+        recipient_ids = [post.get("testerId"), post.get("user_id")]
+        message = "Your post has been approved by admin."
+        metadata = {"post_id": request.post_id}
+
         # Update in Sanity or Dynamo
         from backend.database import _sanity_client
         success = False
+        approved_at = datetime.datetime.utcnow().isoformat()
         if _sanity_client:
             try:
-                _sanity_client.patch_document(
-                    request.post_id,
-                    {
-                        "is_approved": True,
-                        "approved_at": datetime.datetime.utcnow().isoformat()
-                    },
-                )
+                # Approval and notifications commit together; the revision guard
+                # rejects the approval if the post changed since it was read
+                async with _sanity_client.transaction() as tx:
+                    tx.patch(
+                        request.post_id,
+                        set={
+                            "is_approved": True,
+                            "approved_at": approved_at
+                        },
+                        if_revision_id=post.get("_rev"),
+                    )
+                    add_notifications(tx, recipient_ids, message, metadata)
                 success = True
+            except SanityConflictError:
+                raise HTTPException(status_code=409, detail="Post was modified during approval; please retry")
             except Exception as e:
-                logging.error(f"[approve_post] Sanity patch failed: {e}")
+                logging.error(f"[approve_post] Sanity transaction failed: {e}")
         else:
             # DynamoDB update via user profile isn't appropriate; patch directly
             try:
-                from boto3.dynamodb.conditions import Attr
-                import boto3
-                dynamodb = boto3.resource("dynamodb", region_name="us-east-2")
-                posts_table = dynamodb.Table("Posts")
-                posts_table.update_item(
+                from backend.database import posts_table
+                await posts_table.update_item(
                     Key={"post_id": request.post_id},
                     UpdateExpression="SET is_approved = :t, approved_at = :a",
-                    ExpressionAttributeValues={":t": True, ":a": datetime.datetime.utcnow().isoformat()},
+                    ExpressionAttributeValues={":t": True, ":a": approved_at},
                 )
                 success = True
             except Exception as e:
@@ -253,14 +265,12 @@ async def approve_post(request: PostApprovalRequest, current_user: dict = Depend
         if not success:
             raise HTTPException(status_code=500, detail="Failed to approve post")
 
-        # Send notification to tester and dev (if testerId field present)
-        recipient_ids = [post.get("testerId"), post.get("user_id")]
-        for rid in filter(None, recipient_ids):
-            send_notification(
-                rid,
-                message="Your post has been approved by admin.",
-                metadata={"post_id": request.post_id},
-            )
+        await etag_cache.bump(post_dep(request.post_id))
+        await feed_index.index_post({**post, "is_approved": True, "approved_at": approved_at})
+        await search_index.index_post({**post, "is_approved": True})
+
+        if not _sanity_client:
+            await send_notifications(recipient_ids, message, metadata)
 
         return {"message": "Post approved"}
 
@@ -268,11 +278,11 @@ async def approve_post(request: PostApprovalRequest, current_user: dict = Depend
     from ..database import delete_post_in_db
 
     owner_id = post.get("testerId") or post.get("user_id")
-    if not delete_post_in_db(request.post_id, owner_id):
+    if not await delete_post_in_db(request.post_id, owner_id):
         raise HTTPException(status_code=500, detail="Failed to delete post")
 
     if owner_id:
-        send_notification(
+        await send_notification(
             owner_id,
             message="Your post has been rejected and removed by admin.",
             metadata={"post_id": request.post_id},
@@ -282,7 +292,40 @@ async def approve_post(request: PostApprovalRequest, current_user: dict = Depend
 
 # ------------------------------ Pending Posts ------------------------------
 
-@router.get("/pending-posts", response_model=List[Dict[str, Any]])
-async def list_pending_posts(current_user: dict = Depends(get_admin_user)):
-    """Return all posts that are awaiting admin approval."""
-    return get_pending_posts_from_db()
+@router.get("/pending-posts", response_model=Dict[str, Any])
+async def list_pending_posts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    current_user: dict = Depends(get_admin_user),
+):
+    """Return a page of posts that are awaiting admin approval."""
+    try:
+        page = await get_pending_posts_from_db(limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"posts": page.items, "next_cursor": page.next_cursor}
+
+@router.get("/pending-posts/stream")
+async def stream_pending_posts(current_user: dict = Depends(get_admin_user)):
+    """Every post awaiting approval, streamed as NDJSON (one post per line)."""
+    async def fetch(cursor: Optional[str]):
+        return await get_pending_posts_from_db(limit=STREAM_PAGE_SIZE, cursor=cursor)
+    return await stream_pages(fetch)
+
+# ------------------------------ Cache Stats ------------------------------
+
+@router.get("/cache-stats", response_model=Dict[str, Any])
+async def cache_stats(current_user: dict = Depends(get_admin_user)):
+    """Hit/miss counters for this worker's caches since startup."""
+    return {
+        "user_cache": user_cache.snapshot(),
+        "asset_cache": asset_cache.stats,
+        "sanity_queries": sanity_query_stats.snapshot(),
+        "post_replica": post_replica.snapshot(),
+        "dependencies": dependency_stats(),
+        "trending": trending.stats,
+        "registrant_exports": registrant_exporter.stats,
+        "etags": etag_cache.stats,
+        "search_index": search_index.stats,
+        "for_you": for_you.stats,
+    }
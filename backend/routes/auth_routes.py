@@ -92,10 +92,10 @@ async def register_user(user_data: UserRegistration):
         if user_data.user_type not in ("Dev", "Tester", "Admin"):
             raise HTTPException(status_code=400, detail="Invalid user_type. Must be 'Dev', 'Tester', or 'Admin'.")
 
-        if get_user_by_username(user_data.username):
+        if await get_user_by_username(user_data.username):
             logging.warning(f"Username already exists: {user_data.username}")
             raise HTTPException(status_code=400, detail="Username already exists")
-        if get_user_by_email(user_data.email):
+        if await get_user_by_email(user_data.email):
             logging.warning(f"Email already exists: {user_data.email}")
             raise HTTPException(status_code=400, detail="Email already exists")
 
@@ -107,7 +107,7 @@ async def register_user(user_data: UserRegistration):
         user_dict['two_factor_enabled'] = True  # 2FA is mandatory
         
         # create_user_in_db will hash password internally
-        user_id = create_user_in_db(user_dict)
+        user_id = await create_user_in_db(user_dict)
         if not user_id:
             logging.error("create_user_in_db returned None")
             raise HTTPException(status_code=500, detail="Error creating user")
@@ -158,7 +158,7 @@ async def register_user(user_data: UserRegistration):
 async def login(request: LoginRequest):
     try:
         logging.debug(f"Login attempt for user: {request.username}")
-        user = get_user_by_username(request.username)
+        user = await get_user_by_username(request.username)
         if not user or not verify_password(request.password, user["password"]):
             logging.warning(f"Invalid credentials for user: {request.username}")
             raise HTTPException(status_code=401, detail="Invalid credentials")
@@ -195,7 +195,7 @@ async def login(request: LoginRequest):
 @router.post("/recover-username")
 async def recover_username(data: UsernameRecoveryRequest):
     try:
-        user = get_user_from_db(data.user_id)
+        user = await get_user_from_db(data.user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         return {"username": user.get("username")}
@@ -209,7 +209,7 @@ async def recover_username(data: UsernameRecoveryRequest):
 @router.post("/verify-email")
 async def send_verification_email(data: EmailVerificationRequest):
     try:
-        user = get_user_by_email(data.email)
+        user = await get_user_by_email(data.email)
         if not user:
             raise HTTPException(status_code=404, detail="Email not registered")
 
@@ -228,7 +228,7 @@ async def confirm_email_verification(data: VerifyTokenRequest):
     try:
         payload = verify_access_token(data.token)
         email = payload.get("sub")
-        if not update_user_verification(email, True):
+        if not await update_user_verification(email, True):
             raise HTTPException(status_code=500, detail="Failed to verify email")
         logging.info(f"Email verified for: {email}")
         return {"message": "Email verified"}
@@ -242,12 +242,12 @@ async def confirm_email_verification(data: VerifyTokenRequest):
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest):
     try:
-        user = get_user_by_email(request.email)
+        user = await get_user_by_email(request.email)
         if not user:
             raise HTTPException(status_code=404, detail="Email not registered")
 
         reset_token = create_access_token({"sub": request.email}, timedelta(minutes=15))
-        if not update_reset_token(request.email, reset_token):
+        if not await update_reset_token(request.email, reset_token):
             raise HTTPException(status_code=500, detail="Error updating reset token")
 
         logging.debug(f"Password reset token created for: {request.email}")
@@ -265,11 +265,11 @@ async def reset_password(request: ResetPasswordRequest):
         payload = verify_access_token(request.token)
         email = payload.get("sub")
 
-        user = get_user_by_email(email)
+        user = await get_user_by_email(email)
         if not user or user.get("reset_token") != request.token:
             raise HTTPException(status_code=400, detail="Token mismatch or expired")
 
-        if not update_user_password(email, request.new_password):
+        if not await update_user_password(user["user_id"], request.new_password):
             raise HTTPException(status_code=500, detail="Error resetting password")
 
         logging.info(f"Password reset for: {email}")
@@ -285,7 +285,7 @@ async def setup_2fa(token: str = Depends(oauth2_scheme)):
     token_data = verify_access_token(token)
     try:
         user_id = token_data.get("sub")
-        user = get_user_from_db(user_id)
+        user = await get_user_from_db(user_id)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
@@ -311,7 +311,7 @@ async def setup_2fa(token: str = Depends(oauth2_scheme)):
         qr_code = base64.b64encode(buffered.getvalue()).decode()
 
         # Store secret in database (but don't enable 2FA yet)
-        if not update_user_2fa(user_id, secret, enabled=False):
+        if not await update_user_2fa(user_id, secret, enabled=False):
             raise HTTPException(status_code=500, detail="Failed to save 2FA secret")
 
         return TwoFactorSetupResponse(
@@ -330,16 +330,16 @@ async def verify_2fa(request: TwoFactorVerifyRequest, token: str = Depends(oauth
     token_data = verify_access_token(token)
     try:
         user_id = token_data.get("sub")
-        user = get_user_from_db(user_id)
+        user = await get_user_from_db(user_id, with_secrets=True)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Verify the code
-        if not verify_2fa_code(user_id, request.code):
+        if not await verify_2fa_code(user_id, request.code, user=user):
             raise HTTPException(status_code=400, detail="Invalid 2FA code")
 
         # Enable 2FA for the user after successful verification
-        if not update_user_2fa(user_id, user.get("two_factor_secret"), enabled=True):
+        if not await update_user_2fa(user_id, user.get("two_factor_secret"), enabled=True):
             raise HTTPException(status_code=500, detail="Failed to enable 2FA")
 
         return {"message": "2FA verification successful"}
@@ -365,13 +365,13 @@ async def verify_2fa_login(request: TwoFactorVerifyRequest, token: str = Depends
             logging.error("No user_id in token")
             raise HTTPException(status_code=400, detail="Invalid token")
 
-        user = get_user_from_db(user_id)
+        user = await get_user_from_db(user_id, with_secrets=True)
         if not user:
             logging.error(f"User not found: {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
 
         # Verify the code
-        if not verify_2fa_code(user_id, request.code):
+        if not await verify_2fa_code(user_id, request.code, user=user):
             logging.error(f"Invalid 2FA code for user: {user_id}")
             raise HTTPException(status_code=400, detail="Invalid 2FA code")
 
@@ -397,11 +397,11 @@ async def verify_2fa_login(request: TwoFactorVerifyRequest, token: str = Depends
         payload = verify_access_token(request.token)
         email = payload.get("sub")
 
-        user = get_user_by_email(email)
+        user = await get_user_by_email(email)
         if not user or user.get("reset_token") != request.token:
             raise HTTPException(status_code=400, detail="Token mismatch or expired")
 
-        if not update_user_password(email, request.new_password):
+        if not await update_user_password(user["user_id"], request.new_password):
             raise HTTPException(status_code=500, detail="Error resetting password")
 
         logging.info(f"Password reset for: {email}")
@@ -430,7 +430,7 @@ async def steam_callback(request: Request):
             raise HTTPException(status_code=400, detail="Could not fetch Steam profile")
             
         # Find or create user
-        user = get_user_by_steam_id(steam_id) or create_user_from_steam(steam_profile)
+        user = await get_user_by_steam_id(steam_id) or await create_user_from_steam(steam_profile)
         
         # Generate tokens
         access_token = create_access_token({"sub": user["user_id"]})
@@ -454,7 +454,7 @@ async def refresh_token(request: Request):
     
     try:
         payload = verify_access_token(refresh_token)
-        user = get_user_from_db(payload["sub"])
+        user = await get_user_from_db(payload["sub"])
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
             
@@ -1,30 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordBearer
-from pydantic import BaseModel, HttpUrl
+from pydantic import BaseModel, Field, HttpUrl
 from typing import List, Union, Optional, Any, Dict
-import json
-import uuid, logging
-from datetime import datetime
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
 
 from backend.database import (
     get_post_from_db,
     create_post_in_db,
     get_all_posts_from_db,
     filter_posts_from_db,
+    get_post_facets,
     delete_post_in_db,
-    posts_table,
-    _sanity_client,
-    get_user_from_db,
+    search_posts,
+    post_edits_tracked,
 )
+from backend.registrations import WAITLISTED, AlreadyRegistered, list_registrants, register, unregister
+from backend.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor
+from backend.services.etag_cache import etag_cache, post_dep
+from backend.services.for_you import for_you
+from backend.services.image_ingest import BannerImageError
+from backend.services.registrant_export import registrant_exporter, verify_download
+from backend.services.trending import trending
+from backend.services.user_loader import UserLoader, get_user_loader
+from backend.utils.resilience import DependencyUnavailable
+from backend.utils.responses import STREAM_PAGE_SIZE, FastJSONResponse, stream_pages
 from backend.utils.security import verify_access_token
 from fastapi_limiter.depends import RateLimiter
-from backend.config import get_settings
 
 # This will read the bearer token from the Authorization header for us
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+# Same, for endpoints that also serve anonymous visitors
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
 
 router = APIRouter(tags=["Posts"])
 
@@ -45,6 +51,7 @@ class GamingPost(BasePost):
     share_post_to_socials: bool = False
     type: str = "gaming"
     is_approved: bool = False  # Add is_approved field to GamingPost schema
+    capacity: Optional[int] = Field(None, ge=1)  # seats; later sign-ups are waitlisted
 
 class PostCreateRequest(BaseModel):
     genre: str  # Must be "gaming" (legacy anime removed)
@@ -89,11 +96,16 @@ async def create_post(
     # Ensure serializable payload before sending to DynamoDB
     serialized_post_data = post_data.post_data.model_dump()
 
-    post_id = create_post_in_db(serialized_post_data, user_id)
+    # Gallery images that fail to upload are skipped and reported per image
+    image_errors = []
+    try:
+        post_id = await create_post_in_db(serialized_post_data, user_id, image_errors=image_errors)
+    except BannerImageError as e:
+        raise HTTPException(status_code=400, detail=f"Banner image could not be uploaded: {e}")
     if not post_id:
         raise HTTPException(status_code=500, detail="Error creating post")
 
-    return {"message": "Post created", "post_id": post_id}
+    return {"message": "Post created", "post_id": post_id, "image_errors": image_errors}
 
 # Also expose the same handler at '/posts/' to accept trailing slash requests
 router.add_api_route(
@@ -105,13 +117,6 @@ router.add_api_route(
     include_in_schema=False,
 )
 
-@router.get("/{post_id}")
-async def get_post(post_id: str):
-    post = get_post_from_db(post_id)
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return post
-
 @router.get(
     "/filter",
     dependencies=[Depends(RateLimiter(times=30, seconds=60))]
@@ -120,25 +125,126 @@ async def get_filtered_posts(
     tab: str = Query("Trending", enum=["Trending", "Newest", "ForYou"]),
     main: Optional[str] = Query(None),
     subs: Optional[str] = Query(None),
+    studio: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    subs_list = subs.split(",") if subs else []
+    try:
+        page = None
+        # ForYou is personalised for signed-in users; anonymous visitors get Newest
+        if tab == "ForYou" and token:
+            post_type = main.lower() if main and main.lower() != "null" else None
+            page = await for_you.page(verify_access_token(token)["sub"], post_type, subs_list, studio,
+                                      limit, cursor)
+        if page is None:
+            page = await filter_posts_from_db(tab=tab, main=main or "", subs=subs_list, limit=limit,
+                                              cursor=cursor, studio=studio)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (DependencyUnavailable, HTTPException):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return FastJSONResponse({"posts": page.items, "next_cursor": page.next_cursor})
+
+@router.get(
+    "/facets",
+    dependencies=[Depends(RateLimiter(times=30, seconds=60))]
+)
+async def get_post_facet_counts(
+    main: Optional[str] = Query(None),
+    subs: Optional[str] = Query(None),
+    studio: Optional[str] = Query(None),
 ):
+    """Post counts per tag and per studio for the same selection as /posts/filter."""
     subs_list = subs.split(",") if subs else []
     try:
-        posts = filter_posts_from_db(tab=tab, main=main or "", subs=subs_list)
+        return await get_post_facets(main=main or "", subs=subs_list, studio=studio)
+    except DependencyUnavailable:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get(
+    "/search",
+    dependencies=[Depends(RateLimiter(times=60, seconds=60))]
+)
+async def search_all_posts(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text; the last word matches as a prefix"),
+    genre: Optional[str] = Query(None, description="Filter by genre/post_type"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+):
+    """Approved posts matching ``q`` in title, studio, tags or description, best match first."""
+    try:
+        page = await search_posts(q, post_type=genre, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except DependencyUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    return {"posts": posts}
+    return FastJSONResponse({"posts": page.items, "next_cursor": page.next_cursor})
+
+@router.get(
+    "/filter/stream",
+    dependencies=[Depends(RateLimiter(times=30, seconds=60))]
+)
+async def stream_filtered_posts(
+    tab: str = Query("Trending", enum=["Trending", "Newest", "ForYou"]),
+    main: Optional[str] = Query(None),
+    subs: Optional[str] = Query(None),
+    studio: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Resume from a /filter next_cursor"),
+):
+    """Same selection as /posts/filter, streamed as NDJSON (one post per line)."""
+    subs_list = subs.split(",") if subs else []
+
+    async def fetch(next_cursor: Optional[str]):
+        return await filter_posts_from_db(tab=tab, main=main or "", subs=subs_list, limit=STREAM_PAGE_SIZE,
+                                          cursor=next_cursor or cursor, studio=studio)
+    try:
+        return await stream_pages(fetch)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get(
+    "/stream",
+    dependencies=[Depends(RateLimiter(times=40, seconds=60))]
+)
+async def stream_all_posts(
+    genre: Optional[str] = Query(None, description="Filter by genre/post_type"),
+    tags: Optional[List[str]] = Query(None, description="List of tags"),
+    cursor: Optional[str] = Query(None, description="Resume from a /posts next_cursor"),
+):
+    """Same selection as /posts, streamed as NDJSON (one post per line)."""
+    async def fetch(next_cursor: Optional[str]):
+        return await get_all_posts_from_db(post_type=genre, tags=tags, limit=STREAM_PAGE_SIZE,
+                                           cursor=next_cursor or cursor)
+    try:
+        return await stream_pages(fetch)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("")
+@router.get(
+    "",
+    dependencies=[Depends(RateLimiter(times=40, seconds=60))]
+)
 async def get_all_posts_alias(
     genre: Optional[str] = Query(None, description="Filter by genre/post_type"),
     tags: Optional[str] = Query(None, description="Comma-separated list of tags"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
 ):
     tag_list = tags.split(",") if tags else []
-    posts = get_all_posts_from_db(post_type=genre, tags=tag_list if tags else None)
+    try:
+        page = await get_all_posts_from_db(post_type=genre, tags=tag_list if tags else None, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Ensure that all posts are serialized correctly before returning
-    serialized_posts = json.dumps(posts, default=str)
-    return {"posts": json.loads(serialized_posts)}
+    return FastJSONResponse({"posts": page.items, "next_cursor": page.next_cursor})
 
 @router.get(
     "/",
@@ -147,11 +253,48 @@ async def get_all_posts_alias(
 async def get_all_posts(
     genre: Optional[str] = Query(None, description="Filter by genre/post_type"),
     tags: Optional[List[str]] = Query(None, description="List of tags"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
 ):
     # tags will automatically be a list if passed multiple times
-    posts = get_all_posts_from_db(post_type=genre, tags=tags)
-    serialized_posts = json.dumps(posts, default=str)
-    return {"posts": json.loads(serialized_posts)}
+    try:
+        page = await get_all_posts_from_db(post_type=genre, tags=tags, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"posts": page.items, "next_cursor": page.next_cursor})
+
+def _viewer(request: Request, token: Optional[str]) -> str:
+    """Who is viewing, for Trending's view de-duplication: user ID, else client address."""
+    if token:
+        try:
+            return "u:" + verify_access_token(token)["sub"]
+        except HTTPException:
+            pass
+    # The last entry is the one our proxy appended; earlier ones are client-supplied
+    forwarded = request.headers.get("X-Forwarded-For")
+    if forwarded:
+        return "ip:" + forwarded.split(",")[-1].strip()
+    # Some ASGI servers and test clients provide no peer address
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+# Declared after the static paths above so "/filter" is not captured as a post_id
+@router.get(
+    "/{post_id}",
+    dependencies=[Depends(RateLimiter(times=120, seconds=60))]
+)
+async def get_post(post_id: str, request: Request, token: Optional[str] = Depends(optional_oauth2_scheme)):
+    async def load():
+        post = await get_post_from_db(post_id, use_cdn=True)
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return post
+
+    # A validator is only safe while every edit bumps it; otherwise just compare ETags
+    resource = post_dep(post_id) if post_edits_tracked() else None
+    response = await etag_cache.respond(request, load, resource=resource, dep=post_dep(post_id))
+    # A revalidated view is still a view, but each viewer counts once per window
+    await trending.record_view(post_id, _viewer(request, token))
+    return response
 
 # ----------------- Delete -----------------
 
@@ -160,7 +303,7 @@ async def delete_post(post_id: str, token: str = Depends(oauth2_scheme)):
     payload = verify_access_token(token)
     user_id = payload.get("sub")
     print(f"[delete_post] user {user_id} wants to delete {post_id}")
-    success = delete_post_in_db(post_id, user_id)
+    success = await delete_post_in_db(post_id, user_id)
     if not success:
         raise HTTPException(status_code=403, detail="Delete failed or not authorized")
     return {"message": "Post deleted"}
@@ -179,58 +322,80 @@ async def register_for_post(
     if user_type != "Tester":
         raise HTTPException(status_code=403, detail="Only Tester accounts can register for events")
 
-    post = get_post_from_db(post_id)
+    post = await get_post_from_db(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    # Prevent duplicate registration (same user id already in list)
-    existing_regs = post.get("registrants", [])
-    if any(r.get("user_id") == user_id for r in existing_regs):
+    try:
+        status = await register(
+            post_id,
+            user_id,
+            name=reg.name or payload.get("display_name") or payload.get("username"),
+            email=reg.email or payload.get("email"),
+        )
+    except AlreadyRegistered:
         raise HTTPException(status_code=400, detail="You have already registered for this event")
+    if not status:
+        raise HTTPException(status_code=500, detail="Failed to register for event")
 
-    registrant = {
-        "_key": str(uuid.uuid4()),
-        "user_id": user_id,
-        "name": reg.name or payload.get("display_name") or payload.get("username"),
-        "email": reg.email or payload.get("email"),
-        "registered_at": datetime.utcnow().isoformat(),
-    }
+    await trending.record(post_id, "registration")
+    if status == WAITLISTED:
+        return {"message": "This event is full; you have been added to the waitlist", "status": status}
+    return {"message": "Successfully registered", "status": status}
 
-    if _sanity_client:
-        try:
-            current_regs = post.get("registrants", [])
-            new_regs = current_regs + [registrant]
-            _sanity_client.patch_document(post_id, {"registrants": new_regs})
-        except Exception as e:
-            logging.error(f"[register_for_post] Sanity patch failed: {e}")
-            raise HTTPException(status_code=500, detail="Failed to register for event")
-    else:
-        try:
-            posts_table.update_item(
-                Key={"post_id": post_id},
-                UpdateExpression="SET registrants = list_append(if_not_exists(registrants, :empty), :r)",
-                ConditionExpression="attribute_not_exists(registrants) OR NOT contains(registrants[0].user_id, :uid)",
-                ExpressionAttributeValues={":r": [registrant], ":empty": [], ":uid": user_id},
-                ExpressionAttributeNames={"#reg": "registrants"},
-            )
-        except Exception as e:
-            logging.error(f"[register_for_post] Dynamo update failed: {e}")
-            raise HTTPException(status_code=500, detail="Failed to register for event")
-
-    return {"message": "Successfully registered"}
+@router.delete("/{post_id}/register")
+async def cancel_registration(post_id: str, token: str = Depends(oauth2_scheme)):
+    """Cancel the caller's registration; a freed seat goes to the waitlist."""
+    payload = verify_access_token(token)
+    if not await unregister(post_id, payload.get("sub")):
+        raise HTTPException(status_code=404, detail="You are not registered for this event")
+    return {"message": "Registration cancelled"}
+
+@router.get("/{post_id}/registrants")
+async def get_post_registrants(
+    post_id: str,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    token: str = Depends(oauth2_scheme),
+):
+    """Paginated registrations for a post; owner Dev or Admin only."""
+    payload = verify_access_token(token)
+    post = await get_post_from_db(post_id)
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    owner_id = post.get("testerId") or post.get("user_id")
+    if payload.get("sub") != owner_id and payload.get("user_type") != "Admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view registrants")
+
+    try:
+        page = await list_registrants(post_id, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "registrant_count": post.get("registrant_count", 0),
+        "registrants": page.items,
+        "next_cursor": page.next_cursor,
+    }
 
 # ----------------- Email Registrants -----------------
 
-@router.post("/{post_id}/email-registrants")
+@router.post("/{post_id}/email-registrants", status_code=202)
 async def email_registrants(
     post_id: str,
     token: str = Depends(oauth2_scheme),
+    users: UserLoader = Depends(get_user_loader),
 ):
+    """Start a background export of the registrants, emailed to the post owner.
+
+    Returns the job ID at once; poll ``GET /posts/{post_id}/email-registrants/{job_id}``
+    for progress (see services/registrant_export.py).
+    """
     payload = verify_access_token(token)
     current_user_id = payload.get("sub")
     user_type = payload.get("user_type")
 
-    post = get_post_from_db(post_id)
+    post = await get_post_from_db(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
 
@@ -240,12 +405,12 @@ async def email_registrants(
     if current_user_id != owner_id and user_type != "Admin":
         raise HTTPException(status_code=403, detail="Not authorized to email registrants")
 
+    initiator, owner_user = await users.load_many([current_user_id, owner_id])
+
     # Ensure the initiating user's email is verified
-    initiator = get_user_from_db(current_user_id)
     if not initiator or not initiator.get("is_email_verified", False):
         raise HTTPException(status_code=403, detail="Please verify your email before collecting registrations")
 
-    owner_user = get_user_from_db(owner_id)
     if not owner_user:
         raise HTTPException(status_code=404, detail="Developer account not found")
 
@@ -256,85 +421,49 @@ async def email_registrants(
     if not owner_user.get("is_email_verified", False):
         raise HTTPException(status_code=403, detail="Developer email not verified")
 
-    registrants = post.get("registrants", [])
-    if not registrants:
+    if not (await list_registrants(post_id, limit=1)).items:
         raise HTTPException(status_code=400, detail="No registrants to email")
 
-    settings = get_settings()
-    msg = MIMEMultipart()
-    msg["Subject"] = f"Registrants for {post.get('title')}"
-    msg["From"] = settings.email_sender
-    msg["To"] = recipient_email
-
-    # Helper to flatten nested dict keys
-    def _flatten(data: dict, parent_key: str = "", sep: str = "_"):
-        items = {}
-        for k, v in (data or {}).items():
-            new_key = f"{parent_key}{sep}{k}" if parent_key else k
-            if isinstance(v, dict):
-                items.update(_flatten(v, new_key, sep=sep))
-            else:
-                items[new_key] = v
-        return items
-
-    # Build CSV from registrant profiles
-    import csv, io, zipfile
-    output = io.StringIO()
-
-    rows = []
-    fieldnames_set = set()
-    for r in registrants:
-        uid = r.get("user_id")
-        profile = get_user_from_db(uid) or {}
-        flattened_profile = _flatten(profile)
-        row = {"user_id": uid, **flattened_profile}
-        rows.append(row)
-        fieldnames_set.update(row.keys())
-
-    fieldnames = sorted(fieldnames_set)
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for row in rows:
-        writer.writerow(row)
-
-    csv_bytes = output.getvalue().encode()
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr("registrants.csv", csv_bytes)
-    zip_buffer.seek(0)
-
-    from email.mime.base import MIMEBase
-    from email import encoders
-
-    attachment = MIMEBase('application', 'zip')
-    attachment.set_payload(zip_buffer.read())
-    encoders.encode_base64(attachment)
-    attachment.add_header('Content-Disposition', 'attachment', filename='registrants.zip')
-
-    body_html = f"""
-    <html><body>
-      <p>Hello {owner_user.get('display_name') or owner_user.get('username')},</p>
-      <p>Thanks for using Lost Gates! Here are the registrants for your event <strong>{post.get('title')}</strong>.</p>
-      <p>The attached ZIP contains an Excel-ready CSV with full details.</p>
-      <p>Good luck with your playtest!</p>
-      <hr>
-      <p style='font-size:12px'>Lost Gates Team</p>
-    </body></html>
-    """
-
-    msg.attach(MIMEText(body_html, "html"))
-    msg.attach(attachment)
-
-    try:
-        with smtplib.SMTP(settings.smtp_server, settings.smtp_port) as server:
-            if settings.smtp_use_tls:
-                server.starttls()
-            # Login only if credentials provided
-            if settings.smtp_username and settings.smtp_password:
-                server.login(settings.smtp_username, settings.smtp_password)
-            server.send_message(msg)
-    except Exception as e:
-        logging.error(f"[email_registrants] SMTP error: {e}")
-        raise HTTPException(status_code=500, detail="Email sending failed")
+    job_id = await registrant_exporter.enqueue({**post, "post_id": post_id}, owner_user, current_user_id)
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "recipient": recipient_email,
+        "status_url": f"/posts/{post_id}/email-registrants/{job_id}",
+    }
 
-    return {"success": True, "recipient": recipient_email}
+async def _authorized_export(post_id: str, job_id: str, token: str) -> Dict[str, Any]:
+    payload = verify_access_token(token)
+    job = await registrant_exporter.get(job_id)
+    if not job or job.get("post_id") != post_id:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if payload.get("sub") != job.get("requested_by") and payload.get("user_type") != "Admin":
+        raise HTTPException(status_code=403, detail="Not authorized to view this export")
+    return job
+
+@router.get("/{post_id}/email-registrants/{job_id}")
+async def get_registrant_export(post_id: str, job_id: str, token: str = Depends(oauth2_scheme)):
+    """Progress of an export job: status (queued, running, sending, done, failed),
+    processed/total registrants, and a fresh download link once the ZIP exists."""
+    job = await _authorized_export(post_id, job_id, token)
+    if registrant_exporter.available(job):
+        job["download_url"] = registrant_exporter.download_path(post_id, job_id)
+    return job
+
+@router.get("/{post_id}/email-registrants/{job_id}/download")
+async def download_registrant_export(
+    post_id: str,
+    job_id: str,
+    expires: int = Query(...),
+    signature: str = Query(...),
+):
+    """Signed, time-limited link (no bearer token) so it can be sent by email."""
+    if not verify_download(job_id, expires, signature):
+        raise HTTPException(status_code=403, detail="Download link is invalid or has expired")
+    job = await registrant_exporter.get(job_id)
+    if not job or not registrant_exporter.available(job):
+        raise HTTPException(status_code=404, detail="Export no longer available")
+    if job.get("storage") == "s3":
+        return RedirectResponse(await registrant_exporter.presigned_url(job), status_code=307)
+    return FileResponse(registrant_exporter.archive_path(job_id), media_type="application/zip",
+                        filename="registrants.zip")
@@ -111,7 +111,7 @@ async def link_steam_account(request: SteamLinkRequest, token: str = Depends(oau
     
     # Update user's Steam data in database
     try:
-        success = update_user_steam_data(user_id, {
+        success = await update_user_steam_data(user_id, {
             "steam_id": steam_id,
             "steam_profile": profile_data,
             "linked_at": "now()"  # This will be handled by the database function
@@ -155,7 +155,7 @@ async def unlink_steam_account(request: SteamUnlinkRequest, token: str = Depends
     
     # Remove Steam data from user profile
     try:
-        success = update_user_steam_data(user_id, {
+        success = await update_user_steam_data(user_id, {
             "steam_id": None,
             "steam_profile": None,
             "linked_at": None
@@ -186,7 +186,7 @@ async def get_my_steam_profile(token: str = Depends(oauth2_scheme)):
     user_id = payload["sub"]
     
     # Get user data from database
-    user = get_user_from_db(user_id)
+    user = await get_user_from_db(user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
@@ -209,7 +209,7 @@ async def get_my_steam_profile(token: str = Depends(oauth2_scheme)):
     
     # Update cached data in database
     try:
-        update_user_steam_data(user_id, {
+        await update_user_steam_data(user_id, {
             "steam_profile": profile_data
         })
     except Exception:
@@ -27,7 +27,7 @@ async def upload_image(
     try:
         content_type = file.content_type or "application/octet-stream"
         file_bytes = await file.read()
-        img_ref = _sanity_client.upload_image_bytes(file_bytes, content_type)
+        img_ref = await _sanity_client.upload_image_bytes(file_bytes, content_type)
         return {"image": img_ref}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -24,6 +24,7 @@ from backend.database import (
 from backend.utils.security import verify_access_token
 from backend.config import get_settings
 from backend.services.background_tasks import sync_steam_profiles
+from backend.services.etag_cache import etag_cache, user_dep
 from backend.services.steam_utils import fetch_steam_profile
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
@@ -119,14 +120,18 @@ def fetch_steam_profile(steam_input: str) -> Optional[Dict[str, Any]]:
         return None
 
 @router.get("/profile")
-async def get_profile(token: str = Depends(oauth2_scheme)):
+async def get_profile(request: Request, token: str = Depends(oauth2_scheme)):
     payload = verify_access_token(token)
     user_id = payload.get("sub")
     logging.debug(f"Fetching profile for user_id: {user_id}")
-    user = get_user_from_db(user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+
+    async def load():
+        user = await get_user_from_db(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+    return await etag_cache.respond(request, load, resource=user_dep(user_id), dep=user_dep(user_id), public=False)
 
 @router.put("/profile")
 async def update_profile(
@@ -140,7 +145,7 @@ async def update_profile(
         raise HTTPException(status_code=401, detail="Invalid token")
         
     # Fetch user to verify existence
-    user = get_user_from_db(user_id)
+    user = await get_user_from_db(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -196,13 +201,9 @@ async def update_profile(
     # Handle email change
     if "email" in updates:
         new_email = updates["email"].lower()
-        current_user = get_user_from_db(user_id)
-        if not current_user:
-            raise HTTPException(status_code=404, detail="User not found")
-
-        if new_email != current_user.get("email", "").lower():
+        if new_email != user.get("email", "").lower():
             # Email uniqueness check
-            if get_user_by_email(new_email):
+            if await get_user_by_email(new_email):
                 raise HTTPException(status_code=400, detail="Email already in use")
 
             # Reset verification status and codes
@@ -212,14 +213,21 @@ async def update_profile(
 
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
-    success = update_user_profile(user_id, updates)
+    success = await update_user_profile(user_id, updates)
     if not success:
         raise HTTPException(status_code=500, detail="Error updating profile")
 
     # Sync to Sanity (best-effort)
     if _sanity_client:
         try:
-            _sanity_client.patch_document(user_id, updates)
+            # Mirror in one request; creates the profile doc if it was never mirrored
+            async with _sanity_client.transaction() as tx:
+                tx.create_if_not_exists({"_id": user_id, "_type": "user"})
+                tx.patch(
+                    user_id,
+                    set={k: v for k, v in updates.items() if v is not None},
+                    unset=[k for k, v in updates.items() if v is None],
+                )
         except Exception as e:
             logger.warning(f"Failed to patch Sanity user doc: {e}")
 
@@ -244,7 +252,7 @@ async def get_user_posts(
     if payload.get("sub") != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    return get_posts_by_user(user_id)
+    return await get_posts_by_user(user_id)
 
 # ---------------------------------------------------------------------
 # PUBLIC profile routes (username-based)
@@ -255,7 +263,7 @@ async def get_username_by_id(user_id: str):
     """PUBLIC: Return a user's username when only their ID is known.
     This is used for navigation to developer profiles.
     """
-    user = get_user_from_db(user_id)
+    user = await get_user_from_db(user_id)
     if not user or "username" not in user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -263,36 +271,44 @@ async def get_username_by_id(user_id: str):
 
 
 @router.get("/profile/by-username/{username}", tags=["Public Profiles"])
-async def get_user_profile_by_username(username: str):
+async def get_user_profile_by_username(username: str, request: Request):
     """PUBLIC: Return a developer profile when only the username is known.
 
     Only safe, non-sensitive fields are returned so this endpoint can be
     consumed by the public website without authentication.
     """
-    user = get_user_by_username(username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    async def load():
+        user = await get_user_by_username(username)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    for key in [
-        "password",
-        "email_verification_code",
-        "email_verification_expiry",
-        "two_factor_secret",
-        "two_factor_enabled",
-    ]:
-        user.pop(key, None)
+        for key in [
+            "password",
+            "email_verification_code",
+            "email_verification_expiry",
+            "two_factor_secret",
+            "two_factor_enabled",
+        ]:
+            user.pop(key, None)
+        return user
 
-    return user
+    # The user_id behind a username is only known once the profile is loaded
+    return await etag_cache.respond(request, load, resource=f"user-public:{username}",
+                                    dep=lambda user: user_dep(user["user_id"]))
 
 
 @router.get("/by-username/{username}/posts", tags=["Public Profiles"])
-async def get_posts_by_username(username: str):
+async def get_posts_by_username(username: str, request: Request):
     """PUBLIC: Return all posts authored by the given username."""
-    user = get_user_by_username(username)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    async def load():
+        user = await get_user_by_username(username)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return await get_posts_by_user(user["user_id"], use_cdn=True)
 
-    return get_posts_by_user(user["user_id"])
+    # Registrations on any of the posts change this list, so it is compared
+    # by ETag only; no validator is kept
+    return await etag_cache.respond(request, load)
 
 # ---------------------------------------------------------------------
 # Upload avatar endpoint
@@ -315,7 +331,7 @@ async def send_verification_email(token: str = Depends(oauth2_scheme)):
             logger.warning("[/profile/send-verification-email] Missing user_id in token")
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = get_user_from_db(user_id)
+        user = await get_user_from_db(user_id)
         if not user:
             logger.warning(f"[/profile/send-verification-email] User not found: {user_id}")
             raise HTTPException(status_code=404, detail="User not found")
@@ -338,7 +354,7 @@ async def send_verification_email(token: str = Depends(oauth2_scheme)):
         }
 
         try:
-            if not update_user_profile(user_id, verification_data):
+            if not await update_user_profile(user_id, verification_data):
                 raise RuntimeError("DynamoDB update returned False")
         except Exception as e:
             logger.exception("[/profile/send-verification-email] Failed to store code")
@@ -407,7 +423,7 @@ async def verify_email_code(
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = get_user_from_db(user_id)
+    user = await get_user_from_db(user_id, with_secrets=True)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -437,7 +453,7 @@ async def verify_email_code(
         "email_verification_expiry": None
     }
     
-    success = update_user_profile(user_id, verification_data)
+    success = await update_user_profile(user_id, verification_data)
     if not success:
         raise HTTPException(status_code=500, detail="Error updating verification status")
     
@@ -454,7 +470,7 @@ async def refresh_steam_profile(
         user_id = payload["sub"]
         
         # Get user from DB
-        user = get_user_from_db(user_id)
+        user = await get_user_from_db(user_id)
         if not user or "steam_profile" not in user:
             raise HTTPException(status_code=400, detail="No Steam profile linked")
             
@@ -474,7 +490,7 @@ async def refresh_steam_profile(
             "demographic_info": demo,
             "updated_at": str(datetime.utcnow())
         }
-        update_user_profile(user_id, updates)
+        await update_user_profile(user_id, updates)
         
         return steam_profile
         
@@ -502,14 +518,14 @@ async def upload_avatar(
     try:
         if _sanity_client:
             # Upload raw bytes to Sanity and store the returned image reference dict
-            image_ref = _sanity_client.upload_image_bytes(content, file.content_type)
+            image_ref = await _sanity_client.upload_image_bytes(content, file.content_type)
             stored_val = image_ref  # can be stored as-is; front-end will send back the dict
         else:
             # Basic fallback – embed as data URL (not ideal for production)
             b64 = base64.b64encode(content).decode()
             stored_val = f"data:{file.content_type};base64,{b64}"
 
-        if not update_user_profile(user_id, {"profile_picture": stored_val}):
+        if not await update_user_profile(user_id, {"profile_picture": stored_val}):
             raise HTTPException(status_code=500, detail="Failed to update profile picture")
 
         return {"profile_picture": stored_val}
@@ -1,12 +1,242 @@
 import os
-import requests
+import json
+import asyncio
+import hashlib
+import logging
+import time
+import httpx
 from dotenv import load_dotenv
-from typing import List, Any
+from typing import AsyncIterator, Collection, List, Any, Optional, Union
+
+from backend.groq import GroqQuery, by_id, by_ids
+from backend.services.asset_cache import asset_cache
+from backend.utils.resilience import Dependency, clamp_timeout
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Connection pool shared by every SanityClient in the process (see _http_client)
+MAX_CONNECTIONS = int(os.getenv("SANITY_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SANITY_MAX_KEEPALIVE_CONNECTIONS", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("SANITY_KEEPALIVE_EXPIRY", "30"))
+# HTTP/2 multiplexes requests over one connection; needs the optional `h2` package
+HTTP2 = os.getenv("SANITY_HTTP2", "false").lower() in ("1", "true", "yes")
+
+# Per-operation timeouts (seconds)
+CONNECT_TIMEOUT = float(os.getenv("SANITY_CONNECT_TIMEOUT", "5"))
+QUERY_TIMEOUT = float(os.getenv("SANITY_QUERY_TIMEOUT", "10"))
+MUTATE_TIMEOUT = float(os.getenv("SANITY_MUTATE_TIMEOUT", "10"))
+UPLOAD_TIMEOUT = float(os.getenv("SANITY_UPLOAD_TIMEOUT", "30"))
+
+# Public reads may be routed to the API CDN (apicdn.sanity.io); set to false to force live reads
+USE_CDN = os.getenv("SANITY_USE_CDN", "true").lower() in ("1", "true", "yes")
+
+# Larger transactions are committed as several requests (each one atomic)
+MAX_TRANSACTION_MUTATIONS = int(os.getenv("SANITY_MAX_TRANSACTION_MUTATIONS", "100"))
+
+_http: Optional[httpx.AsyncClient] = None
+_http_lock = asyncio.Lock()
+
+
+async def _http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled AsyncClient, creating it on first use."""
+    global _http
+    if _http is None:
+        async with _http_lock:
+            if _http is None:
+                limits = httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                )
+                timeout = httpx.Timeout(QUERY_TIMEOUT, connect=CONNECT_TIMEOUT)
+                try:
+                    _http = httpx.AsyncClient(http2=HTTP2, limits=limits, timeout=timeout)
+                except ImportError:
+                    logger.warning("[SanityClient] SANITY_HTTP2 set but h2 is not installed; using HTTP/1.1")
+                    _http = httpx.AsyncClient(limits=limits, timeout=timeout)
+    return _http
+
+
+async def close_http_client() -> None:
+    """Close the shared connection pool (application shutdown)."""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
+def _timeout(seconds: float) -> httpx.Timeout:
+    # Never wait past the incoming request's deadline
+    return httpx.Timeout(clamp_timeout(seconds), connect=clamp_timeout(CONNECT_TIMEOUT))
+
+
+class SanityConflictError(RuntimeError):
+    """A mutation was rejected with 409, e.g. ``create`` of an existing document ID."""
+
+
+class ImageRejectedError(ValueError):
+    """A source image failed the size/type limits before or while streaming."""
+
+
+class SanityServerError(RuntimeError):
+    """429 or 5xx from Sanity; retried by the resilience layer."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Sanity returned {status_code}: {text}")
+        self.status_code = status_code
+
+
+def _is_failure(exc: BaseException) -> bool:
+    return isinstance(exc, (httpx.TransportError, SanityServerError))
+
+
+def _is_unsent(exc: BaseException) -> bool:
+    # The request never reached Sanity (or was rejected before processing)
+    if isinstance(exc, SanityServerError):
+        return exc.status_code == 429
+    return isinstance(exc, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+
+# Live API and CDN fail independently, so each has its own breaker
+sanity_dependency = Dependency("sanity", _is_failure, _is_unsent)
+sanity_cdn_dependency = Dependency("sanity_cdn", _is_failure, _is_unsent)
+
+
+async def _send(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """One HTTP exchange on the shared pool; 429/5xx raise ``SanityServerError``."""
+    http = await _http_client()
+    resp = await http.request(method, url, **kwargs)
+    if resp.status_code == 429 or resp.status_code >= 500:
+        raise SanityServerError(resp.status_code, resp.text)
+    return resp
+
+
+class QueryStats:
+    """Query latency per route: ``live``, ``cdn_hit`` and ``cdn_miss``."""
+
+    def __init__(self):
+        self._stats: dict[str, dict[str, float]] = {}
+
+    def record(self, route: str, seconds: float) -> None:
+        entry = self._stats.setdefault(route, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = seconds * 1000
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        return {
+            route: {
+                "count": int(e["count"]),
+                "avg_ms": round(e["total_ms"] / e["count"], 2),
+                "max_ms": round(e["max_ms"], 2),
+            }
+            for route, e in self._stats.items()
+        }
+
+
+query_stats = QueryStats()
+
+
+def _is_cdn_hit(resp: httpx.Response) -> bool:
+    cache = resp.headers.get("X-Cache", "") or resp.headers.get("X-Sanity-Cache", "")
+    if cache:
+        return "HIT" in cache.upper()
+    return int(resp.headers.get("Age", "0") or 0) > 0
+
+
+class SanityTransaction:
+    """Collects mutations and commits them through ``/data/mutate`` in one request.
+
+    Example::
+
+        async with client.transaction() as tx:
+            tx.patch(post_id, set={"is_approved": True}, if_revision_id=post["_rev"])
+            tx.create("notification", {...})
+
+    Up to ``MAX_TRANSACTION_MUTATIONS`` mutations commit atomically. Larger
+    batches are split into consecutive chunks, and each chunk is atomic on its
+    own. A failed ``if_revision_id`` guard raises ``SanityConflictError``.
+    """
+
+    def __init__(self, client: "SanityClient", max_mutations: int = MAX_TRANSACTION_MUTATIONS):
+        self._client = client
+        self._max_mutations = max_mutations
+        self.mutations: List[dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.mutations)
+
+    def create(self, doc_type: str, data: dict) -> "SanityTransaction":
+        self.mutations.append({"create": {"_type": doc_type, **data}})
+        return self
+
+    def create_or_replace(self, doc: dict) -> "SanityTransaction":
+        """``doc`` must include ``_id`` and ``_type``."""
+        self.mutations.append({"createOrReplace": doc})
+        return self
+
+    def create_if_not_exists(self, doc: dict) -> "SanityTransaction":
+        """``doc`` must include ``_id`` and ``_type``."""
+        self.mutations.append({"createIfNotExists": doc})
+        return self
+
+    def patch(
+        self,
+        doc_id: str,
+        set: Optional[dict] = None,
+        unset: Optional[List[str]] = None,
+        inc: Optional[dict] = None,
+        set_if_missing: Optional[dict] = None,
+        if_revision_id: Optional[str] = None,
+    ) -> "SanityTransaction":
+        patch: dict[str, Any] = {"id": doc_id}
+        if set_if_missing:
+            patch["setIfMissing"] = set_if_missing
+        if set:
+            patch["set"] = set
+        if unset:
+            patch["unset"] = unset
+        if inc:
+            patch["inc"] = inc
+        if if_revision_id:
+            patch["ifRevisionID"] = if_revision_id
+        self.mutations.append({"patch": patch})
+        return self
+
+    def delete(self, doc_id: str) -> "SanityTransaction":
+        self.mutations.append({"delete": {"id": doc_id}})
+        return self
+
+    async def commit(self) -> List[Any]:
+        """Send the collected mutations and return the per-mutation results."""
+        results: List[Any] = []
+        for start in range(0, len(self.mutations), self._max_mutations):
+            results.extend(await self._client.mutate(self.mutations[start:start + self._max_mutations]))
+        self.mutations = []
+        return results
+
+    async def __aenter__(self) -> "SanityTransaction":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None and self.mutations:
+            await self.commit()
+
+
 class SanityClient:
-    """Light-weight wrapper around the Sanity HTTP API (v2021-10-21)."""
+    """Light-weight async wrapper around the Sanity HTTP API (v2021-10-21).
+
+    All instances share one keep-alive ``httpx.AsyncClient`` pool, so repeated
+    calls reuse TCP/TLS connections to ``*.api.sanity.io``.
+
+    Reads choose their consistency per call: ``use_cdn=True`` sends the query to
+    the cached API CDN (``*.apicdn.sanity.io``), which is fine for public,
+    approved content that may be a few seconds stale. The default goes to the
+    live API, as needed for admin, authenticated and read-after-write paths.
+    """
 
     def __init__(self):
         self.project_id: str | None = os.getenv("SANITY_PROJECT_ID")
@@ -20,6 +250,7 @@ class SanityClient:
 
         # Use the latest stable Sanity API version that supports mutations & queries
         self.base_url = f"https://{self.project_id}.api.sanity.io/v2021-10-21"
+        self.cdn_url = f"https://{self.project_id}.apicdn.sanity.io/v2021-10-21"
 
     # ---------------------------------------------------------------------
     # Internal helpers
@@ -30,52 +261,125 @@ class SanityClient:
             "Content-Type": "application/json",
         }
 
+    async def _post_mutations(self, mutations: List[dict[str, Any]], query: str) -> httpx.Response:
+        url = f"{self.base_url}/data/mutate/{self.dataset}?{query}"
+        # Not idempotent: only retried when the request provably never arrived
+        return await sanity_dependency.call(
+            lambda: _send("POST", url, json={"mutations": mutations}, headers=self._headers(),
+                          timeout=_timeout(MUTATE_TIMEOUT)),
+            idempotent=False,
+        )
+
     # ---------------------------------------------------------------------
     # Asset upload helpers
     # ---------------------------------------------------------------------
-    def _upload_image(self, image_bytes: bytes, content_type: str = "application/octet-stream") -> str:
-        """Upload raw image bytes to Sanity and return the asset ID."""
+    async def _upload_image(
+        self,
+        content: Union[bytes, AsyncIterator[bytes]],
+        content_type: str = "application/octet-stream",
+        content_length: Optional[str] = None,
+    ) -> str:
+        """Upload image bytes (or an async byte stream) to Sanity and return the asset ID."""
         url = f"{self.base_url}/assets/images/{self.dataset}"
         headers = {**self._headers(), "Content-Type": content_type}
-        resp = requests.post(url, data=image_bytes, headers=headers, timeout=20)
+        if content_length:
+            headers["Content-Length"] = content_length
+        # Sanity deduplicates assets by content, so buffered bytes can be resent;
+        # a consumed stream cannot
+        resp = await sanity_dependency.call(
+            lambda: _send("POST", url, content=content, headers=headers, timeout=_timeout(UPLOAD_TIMEOUT)),
+            idempotent=isinstance(content, bytes),
+        )
         if resp.status_code == 200:
             return resp.json().get("document", {}).get("_id")
         raise RuntimeError(f"Sanity image upload failed: {resp.text}")
 
-    def upload_image_from_url(self, image_url: str) -> dict[str, Any]:
-        """Download an image from a URL, upload to Sanity, and return an image reference dict."""
-        dl_resp = requests.get(image_url, timeout=20)
-        if dl_resp.status_code != 200:
-            raise RuntimeError(f"Failed to download image from {image_url}: {dl_resp.status_code}")
-        asset_id = self._upload_image(
-            dl_resp.content,
-            dl_resp.headers.get("Content-Type", "application/octet-stream"),
-        )
-        return {"_type": "image", "asset": {"_type": "reference", "_ref": asset_id}}
+    async def upload_image_from_url(
+        self,
+        image_url: str,
+        max_bytes: Optional[int] = None,
+        allowed_types: Optional[Collection[str]] = None,
+    ) -> dict[str, Any]:
+        """Stream an image from a URL into Sanity and return an image reference dict.
+
+        The body is piped chunk by chunk from the source to the asset endpoint
+        without being buffered. ``allowed_types`` and a declared Content-Length
+        above ``max_bytes`` are checked before the upload starts; the byte count
+        is also enforced while streaming. Violations raise ``ImageRejectedError``.
+
+        A URL seen before is revalidated with its ETag/Last-Modified; on 304 the
+        cached asset reference is returned without any transfer.
+        """
+        cached = await asset_cache.get_url(image_url)
+        conditional = {}
+        if cached:
+            if cached.get("etag"):
+                conditional["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                conditional["If-Modified-Since"] = cached["last_modified"]
+
+        http = await _http_client()
+        hasher = hashlib.sha256()
+        async with http.stream("GET", image_url, headers=conditional, timeout=_timeout(UPLOAD_TIMEOUT),
+                               follow_redirects=True) as dl_resp:
+            if dl_resp.status_code == 304 and cached:
+                asset_cache.record_revalidated()
+                return cached["ref"]
+            if dl_resp.status_code != 200:
+                raise RuntimeError(f"Failed to download image from {image_url}: {dl_resp.status_code}")
+
+            content_type = dl_resp.headers.get("Content-Type", "application/octet-stream").split(";")[0].strip().lower()
+            if allowed_types is not None and content_type not in allowed_types:
+                raise ImageRejectedError(f"Unsupported image type {content_type!r}")
+
+            # Forward the length only when the body is not re-encoded in transit
+            content_length = None
+            if "Content-Encoding" not in dl_resp.headers:
+                content_length = dl_resp.headers.get("Content-Length")
+            if max_bytes and content_length and int(content_length) > max_bytes:
+                raise ImageRejectedError(f"Image is {content_length} bytes (limit {max_bytes})")
 
-    def upload_image_bytes(self, image_bytes: bytes, content_type: str = "application/octet-stream") -> dict[str, Any]:
-        """Upload raw image bytes and return a Sanity image reference dict."""
-        asset_id = self._upload_image(image_bytes, content_type)
-        return {"_type": "image", "asset": {"_type": "reference", "_ref": asset_id}}
+            async def body() -> AsyncIterator[bytes]:
+                received = 0
+                async for chunk in dl_resp.aiter_bytes():
+                    received += len(chunk)
+                    if max_bytes and received > max_bytes:
+                        raise ImageRejectedError(f"Image exceeds {max_bytes} bytes")
+                    hasher.update(chunk)
+                    yield chunk
+
+            asset_id = await self._upload_image(body(), content_type, content_length)
+            ref = {"_type": "image", "asset": {"_type": "reference", "_ref": asset_id}}
+            await asset_cache.remember(
+                hasher.hexdigest(), ref, url=image_url,
+                etag=dl_resp.headers.get("ETag"), last_modified=dl_resp.headers.get("Last-Modified"),
+            )
+        return ref
+
+    async def upload_image_bytes(self, image_bytes: bytes, content_type: str = "application/octet-stream") -> dict[str, Any]:
+        """Upload raw image bytes and return a Sanity image reference dict.
+
+        Bytes already uploaded (same SHA-256) return the cached reference without a transfer.
+        """
+        sha256 = hashlib.sha256(image_bytes).hexdigest()
+        cached = await asset_cache.get_by_hash(sha256)
+        if cached:
+            return cached
+        asset_id = await self._upload_image(image_bytes, content_type)
+        ref = {"_type": "image", "asset": {"_type": "reference", "_ref": asset_id}}
+        await asset_cache.remember(sha256, ref)
+        return ref
 
     # ---------------------------------------------------------------------
     # Public CRUD helpers
     # ---------------------------------------------------------------------
-    def create_document(self, doc_type: str, data: dict) -> str:
+    async def create_document(self, doc_type: str, data: dict) -> str:
         """Create and return the Sanity document ID."""
         # Ask Sanity to return the generated IDs so we can forward them back to callers
-        url = f"{self.base_url}/data/mutate/{self.dataset}?returnIds=true&returnDocuments=false"
-        payload = {
-            "mutations": [
-                {
-                    "create": {
-                        "_type": doc_type,
-                        **data,
-                    }
-                }
-            ]
-        }
-        resp = requests.post(url, json=payload, headers=self._headers(), timeout=10)
+        resp = await self._post_mutations(
+            [{"create": {"_type": doc_type, **data}}],
+            "returnIds=true&returnDocuments=false",
+        )
         if resp.status_code == 200:
             res = resp.json()["results"][0]
             doc_id = res.get("id") or res.get("documentId")
@@ -83,44 +387,113 @@ class SanityClient:
                 return doc_id
         raise RuntimeError(f"Sanity create_document failed: {resp.text}")
 
-    def get_document(self, doc_id: str) -> Any:
-        query = f'*[_id == "{doc_id}"][0]'
-        results = self.query_documents(query)
+    async def get_document(self, doc_id: str, projection: Optional[str] = None, use_cdn: bool = False) -> Any:
+        results = await self.fetch(by_id(doc_id, projection), use_cdn=use_cdn)
         return results if results else None
 
-    def query_documents(self, query: str) -> List[Any]:
-        url = f"{self.base_url}/data/query/{self.dataset}"
-        resp = requests.get(url, params={"query": query}, headers=self._headers(), timeout=10)
+    async def get_documents(self, doc_ids: List[str], projection: Optional[str] = None,
+                            use_cdn: bool = False) -> List[Any]:
+        """Fetch many documents in one query; missing IDs are simply absent."""
+        if not doc_ids:
+            return []
+        return await self.fetch(by_ids(doc_ids, projection), use_cdn=use_cdn)
+
+    async def fetch(self, query: GroqQuery, use_cdn: bool = False) -> Any:
+        """Run a query assembled with ``backend.groq``."""
+        return await self.query_documents(*query.build(), use_cdn=use_cdn)
+
+    async def query_documents(self, query: str, params: Optional[dict[str, Any]] = None,
+                              use_cdn: bool = False) -> List[Any]:
+        """Run a GROQ query. ``params`` are bound as ``$name`` variables (JSON-encoded).
+
+        ``use_cdn`` reads through the API CDN (eventually consistent).
+        """
+        use_cdn = use_cdn and USE_CDN
+        url = f"{self.cdn_url if use_cdn else self.base_url}/data/query/{self.dataset}"
+        query_params = {"query": query}
+        for name, value in (params or {}).items():
+            query_params[f"${name}"] = json.dumps(value)
+        dependency = sanity_cdn_dependency if use_cdn else sanity_dependency
+        start = time.perf_counter()
+        resp = await dependency.call(
+            lambda: _send("GET", url, params=query_params, headers=self._headers(),
+                          timeout=_timeout(QUERY_TIMEOUT)),
+            hedge=True,
+        )
+        route = ("cdn_hit" if _is_cdn_hit(resp) else "cdn_miss") if use_cdn else "live"
+        query_stats.record(route, time.perf_counter() - start)
         if resp.status_code == 200:
             return resp.json().get("result", [])
         raise RuntimeError(f"Sanity query failed: {resp.text}")
 
+    async def listen(self, query: str, params: Optional[dict[str, Any]] = None,
+                     include_result: bool = True) -> AsyncIterator[dict[str, Any]]:
+        """Stream ``/data/listen`` events for documents matching ``query``.
+
+        Yields ``{"event": name, "data": payload}`` for each server-sent event
+        (``welcome``, ``mutation``, ``reconnect``, ``channelError``...). The
+        stream stays open until the server or the caller closes it.
+        """
+        url = f"{self.base_url}/data/listen/{self.dataset}"
+        query_params = {
+            "query": query,
+            "includeResult": "true" if include_result else "false",
+            "visibility": "query",
+        }
+        for name, value in (params or {}).items():
+            query_params[f"${name}"] = json.dumps(value)
+        headers = {**self._headers(), "Accept": "text/event-stream"}
+        http = await _http_client()
+        # No read timeout: the stream is idle between mutations
+        timeout = httpx.Timeout(None, connect=CONNECT_TIMEOUT)
+        async with http.stream("GET", url, params=query_params, headers=headers, timeout=timeout) as resp:
+            if resp.status_code != 200:
+                await resp.aread()
+                raise RuntimeError(f"Sanity listen failed: {resp.text}")
+            event, data = "message", []
+            async for line in resp.aiter_lines():
+                if not line:
+                    if data:
+                        yield {"event": event, "data": json.loads("\n".join(data))}
+                    event, data = "message", []
+                elif line.startswith(":"):
+                    continue  # keep-alive comment
+                elif line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+
+    def transaction(self) -> SanityTransaction:
+        """Start a multi-mutation transaction (see ``SanityTransaction``)."""
+        return SanityTransaction(self)
+
+    async def mutate(self, mutations: List[dict[str, Any]]) -> List[Any]:
+        """Apply several mutations as one atomic transaction and return their results.
+
+        Raises ``SanityConflictError`` if Sanity rejects the transaction with 409.
+        """
+        resp = await self._post_mutations(mutations, "returnIds=true&returnDocuments=false")
+        if resp.status_code == 200:
+            return resp.json().get("results", [])
+        if resp.status_code == 409:
+            raise SanityConflictError(f"Sanity mutation conflict: {resp.text}")
+        raise RuntimeError(f"Sanity mutate failed: {resp.text}")
+
     # ------------------------------------------------------------------
     # Patch helpers
     # ------------------------------------------------------------------
-    def patch_document(self, doc_id: str, patch: dict) -> bool:
+    async def patch_document(self, doc_id: str, patch: dict) -> bool:
         """Apply a partial update (set) to a document.
 
         Example::
-            client.patch_document("myDocId", {"is_approved": True})
+            await client.patch_document("myDocId", {"is_approved": True})
 
         Internally this uses the `/data/mutate` endpoint with a `patch` mutation.
         """
         if not patch:
             raise ValueError("patch cannot be empty")
 
-        url = f"{self.base_url}/data/mutate/{self.dataset}?returnIds=false"
-        payload = {
-            "mutations": [
-                {
-                    "patch": {
-                        "id": doc_id,
-                        "set": patch,
-                    }
-                }
-            ]
-        }
-        resp = requests.post(url, json=payload, headers=self._headers(), timeout=10)
+        resp = await self._post_mutations([{"patch": {"id": doc_id, "set": patch}}], "returnIds=false")
         if resp.status_code == 200:
             return True
         raise RuntimeError(f"Sanity patch_document failed: {resp.text}")
@@ -128,11 +501,9 @@ class SanityClient:
     # ------------------------------------------------------------------
     # Delete helpers
     # ------------------------------------------------------------------
-    def delete_document(self, doc_id: str) -> bool:
+    async def delete_document(self, doc_id: str) -> bool:
         """Delete a document by ID. Returns True if successful."""
-        url = f"{self.base_url}/data/mutate/{self.dataset}?returnIds=false"
-        payload = {"mutations": [{"delete": {"id": doc_id}}]}
-        resp = requests.post(url, json=payload, headers=self._headers(), timeout=10)
+        resp = await self._post_mutations([{"delete": {"id": doc_id}}], "returnIds=false")
         if resp.status_code == 200:
             return True
         raise RuntimeError(f"Sanity delete_document failed: {resp.text}")
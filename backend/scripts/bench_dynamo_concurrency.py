@@ -0,0 +1,66 @@
+"""Compare event-loop throughput of blocking boto3 vs the shared aioboto3 resource.
+
+Simulates N concurrent request handlers that each perform one ``GetItem`` on
+the Users table, first with the synchronous boto3 ``Table`` called from inside
+coroutines (the old behaviour) and then with ``backend.dynamo``.
+
+Usage::
+
+    python -m backend.scripts.bench_dynamo_concurrency --user-id <id> --requests 500 --concurrency 50
+
+Point ``DYNAMODB_ENDPOINT_URL`` at DynamoDB Local to avoid hitting AWS.
+"""
+import argparse
+import asyncio
+import time
+
+import boto3
+
+from backend.dynamo import AsyncTable, DYNAMODB_REGION, ENDPOINT_URL, dynamo
+
+
+async def _run(label: str, handler, requests: int, concurrency: int) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await handler()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<8} {requests / elapsed:8.1f} req/s  p50={p50:7.1f}ms  p99={p99:7.1f}ms")
+
+
+async def main(user_id: str, requests: int, concurrency: int) -> None:
+    sync_table = boto3.resource("dynamodb", region_name=DYNAMODB_REGION, endpoint_url=ENDPOINT_URL).Table("Users")
+    async_table = AsyncTable("Users")
+
+    async def blocking():
+        sync_table.get_item(Key={"user_id": user_id})
+
+    async def non_blocking():
+        await async_table.get_item(Key={"user_id": user_id})
+
+    # Warm both connection pools so handshakes are not part of the measurement
+    await blocking()
+    await non_blocking()
+
+    await _run("boto3", blocking, requests, concurrency)
+    await _run("aioboto3", non_blocking, requests, concurrency)
+    await dynamo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.user_id, args.requests, args.concurrency))
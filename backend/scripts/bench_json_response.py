@@ -0,0 +1,80 @@
+"""Compare the old feed serialization path against FastJSONResponse.
+
+Builds a synthetic 1,000-post feed shaped like DynamoDB items (Decimal
+numbers, tag lists, image URLs) and measures CPU time per response for:
+
+* ``legacy``: ``json.loads(json.dumps(posts, default=str))``, then FastAPI's
+  ``jsonable_encoder`` and the stdlib ``JSONResponse.render``, i.e. what
+  ``GET /posts`` did before;
+* ``fast``: ``FastJSONResponse(payload)`` returned directly from the route.
+
+Usage::
+
+    python -m backend.scripts.bench_json_response --posts 1000 --iterations 200
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.utils.responses import FastJSONResponse
+
+
+def _post(i: int) -> dict:
+    return {
+        "post_id": str(uuid.uuid4()),
+        "title": f"Playtest #{i}",
+        "description": "Looking for testers to try our new co-op level. " * 4,
+        "studio": f"Studio {i % 40}",
+        "post_type": random.choice(["gaming", "tabletop", "mobile"]),
+        "tags": random.sample(["rpg", "fps", "coop", "indie", "puzzle", "strategy", "horror"], 3),
+        "date": "2025-06-01",
+        "created_at": "2025-05-20T12:00:00",
+        "bannerImage": f"https://cdn.example.com/banners/{i}.png",
+        "images": [f"https://cdn.example.com/shots/{i}-{n}.png" for n in range(3)],
+        "is_approved": True,
+        "registrant_count": Decimal(random.randint(0, 500)),
+        "rating": Decimal("4.25"),
+    }
+
+
+def _legacy(posts: list) -> bytes:
+    serialized = json.dumps(posts, default=str)
+    content = jsonable_encoder({"posts": json.loads(serialized), "next_cursor": None})
+    return JSONResponse(content).body
+
+
+def _fast(posts: list) -> bytes:
+    return FastJSONResponse({"posts": posts, "next_cursor": None}).body
+
+
+def _cpu_ms(fn, posts: list, iterations: int) -> float:
+    fn(posts)  # warm up
+    start = time.process_time()
+    for _ in range(iterations):
+        fn(posts)
+    return (time.process_time() - start) * 1000 / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    posts = [_post(i) for i in range(args.posts)]
+    legacy = _cpu_ms(_legacy, posts, args.iterations)
+    fast = _cpu_ms(_fast, posts, args.iterations)
+    size = len(_fast(posts))
+    print(f"{args.posts} posts, {size / 1024:.0f} KiB body, {args.iterations} iterations")
+    print(f"legacy: {legacy:8.2f} ms CPU per response")
+    print(f"fast:   {fast:8.2f} ms CPU per response  ({legacy / fast:.1f}x less CPU)")
+
+
+if __name__ == "__main__":
+    main()
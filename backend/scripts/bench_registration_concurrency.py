@@ -0,0 +1,157 @@
+"""Hammer one capped post with concurrent sign-ups and check the seat invariants.
+
+Creates a throwaway post with ``--capacity`` seats, then fires ``--users``
+concurrent registrations (plus ``--duplicates`` repeated sign-ups from users
+already in the run) through ``backend.registrations.register``. Afterwards it
+cancels ``--cancel`` confirmed registrations and checks that the waitlist is
+promoted into the freed seats. It fails loudly if:
+
+* more than ``capacity`` registrations are confirmed, or a seat is left empty
+  while people wait;
+* ``registrant_count`` / ``waitlist_count`` on the post disagree with the
+  registration records;
+* a user ends up registered twice, or a duplicate sign-up is not rejected.
+
+Runs against whichever backend is configured (Sanity, or DynamoDB; point
+``DYNAMODB_ENDPOINT_URL`` at DynamoDB Local to avoid hitting AWS). Run it
+from several shells at once to include cross-worker conflicts.
+
+Usage::
+
+    python -m backend.scripts.bench_registration_concurrency --users 500 --capacity 100 --cancel 20
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+from backend.database import posts_table
+from backend.dynamo import dynamo
+from backend.groq import SEATS
+from backend.registrations import (
+    COUNT_FIELD,
+    CONFIRMED,
+    WAITLIST_FIELD,
+    WAITLISTED,
+    AlreadyRegistered,
+    _sanity_client,
+    list_registrants,
+    register,
+    unregister,
+    delete_registrations_for_post,
+)
+from backend.sanity_client import close_http_client
+from backend.utils.resilience import DependencyUnavailable
+
+
+async def _create_post(capacity: int) -> str:
+    if _sanity_client:
+        return await _sanity_client.create_document("post", {
+            "title": "Registration load test",
+            "postType": "gaming",
+            "is_approved": False,
+            "capacity": capacity,
+            "registrant_count": 0,
+        })
+    post_id = f"loadtest-{uuid.uuid4()}"
+    await posts_table.put_item(Item={
+        "post_id": post_id,
+        "user_id": "loadtest",
+        "title": "Registration load test",
+        "post_type": "gaming",
+        "is_approved": False,
+        "capacity": capacity,
+        "registrant_count": 0,
+    })
+    return post_id
+
+
+async def _counters(post_id: str) -> tuple:
+    if _sanity_client:
+        post = await _sanity_client.get_document(post_id, SEATS)
+    else:
+        post = (await posts_table.get_item(Key={"post_id": post_id}, ConsistentRead=True))["Item"]
+    return int(post.get(COUNT_FIELD) or 0), int(post.get(WAITLIST_FIELD) or 0)
+
+
+async def _delete_post(post_id: str) -> None:
+    await delete_registrations_for_post(post_id)
+    if _sanity_client:
+        await _sanity_client.delete_document(post_id)
+    else:
+        await posts_table.delete_item(Key={"post_id": post_id})
+
+
+async def _statuses(post_id: str) -> Counter:
+    statuses: Counter = Counter()
+    seen = set()
+    cursor = None
+    while True:
+        page = await list_registrants(post_id, limit=500, cursor=cursor)
+        for r in page.items:
+            assert r["user_id"] not in seen, f"{r['user_id']} registered twice"
+            seen.add(r["user_id"])
+            statuses[r["status"]] += 1
+        cursor = page.next_cursor
+        if not cursor:
+            return statuses
+
+
+def _check(label: str, statuses: Counter, counters: tuple, capacity: int, total: int) -> None:
+    confirmed, waitlisted = statuses[CONFIRMED], statuses[WAITLISTED]
+    print(f"{label:<10} confirmed={confirmed} waitlisted={waitlisted} counters={counters}")
+    assert confirmed + waitlisted == total, f"expected {total} registrations"
+    assert confirmed == min(capacity, total), f"{confirmed} confirmed for {capacity} seats"
+    assert counters == (confirmed, waitlisted), "post counters disagree with registrations"
+
+
+async def main(users: int, capacity: int, duplicates: int, cancel: int, keep: bool) -> None:
+    post_id = await _create_post(capacity)
+    user_ids = [f"loadtest-user-{i}" for i in range(users)]
+    outcomes: Counter = Counter()
+    latencies = []
+
+    async def sign_up(user_id: str) -> None:
+        start = time.perf_counter()
+        try:
+            outcomes[await register(post_id, user_id, name=user_id)] += 1
+        except AlreadyRegistered:
+            outcomes["duplicate"] += 1
+        except DependencyUnavailable:
+            outcomes["gave_up"] += 1
+        latencies.append(time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(sign_up(uid) for uid in user_ids + user_ids[:duplicates]))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+        print(f"{len(latencies)} sign-ups in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s) "
+              f"p50={p50:.1f}ms p99={p99:.1f}ms outcomes={dict(outcomes)}")
+        assert outcomes["duplicate"] == duplicates, "duplicate sign-ups were not all rejected"
+        registered = users - outcomes["gave_up"] - outcomes[None]
+        _check("signup", await _statuses(post_id), await _counters(post_id), capacity, registered)
+
+        confirmed = [r["user_id"] for r in (await list_registrants(post_id)).items if r["status"] == CONFIRMED]
+        cancelled = await asyncio.gather(*(unregister(post_id, uid) for uid in confirmed[:cancel]))
+        assert all(cancelled), "a cancellation failed"
+        _check("cancel", await _statuses(post_id), await _counters(post_id), capacity, registered - cancel)
+    finally:
+        if not keep:
+            await _delete_post(post_id)
+        await dynamo.close()
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--duplicates", type=int, default=20, help="repeat sign-ups to include")
+    parser.add_argument("--cancel", type=int, default=20, help="confirmed registrations to cancel afterwards")
+    parser.add_argument("--keep", action="store_true", help="leave the test post in place")
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.capacity, args.duplicates, args.cancel, args.keep))
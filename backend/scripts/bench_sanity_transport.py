@@ -0,0 +1,104 @@
+"""Compare per-call connections against the pooled async SanityClient.
+
+Starts a local HTTP/1.1 stub of the Sanity query endpoint (with an artificial
+handshake-like delay per new connection) and issues N GROQ queries, first with
+module-level ``requests.get`` calls (a new connection each time, the old
+behaviour) and then through ``SanityClient.query_documents`` on the shared
+keep-alive ``httpx.AsyncClient``.
+
+Usage::
+
+    python -m backend.scripts.bench_sanity_transport --requests 500 --concurrency 20 --connect-delay-ms 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+os.environ.setdefault("SANITY_PROJECT_ID", "bench")
+os.environ.setdefault("SANITY_TOKEN", "bench")
+
+from backend.sanity_client import SanityClient, close_http_client  # noqa: E402
+
+
+def _stub_server(connect_delay: float) -> ThreadingHTTPServer:
+    body = json.dumps({"result": [{"_id": "post-1", "title": "stub"}]}).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep connections open between requests
+
+        def setup(self):
+            # Stand-in for the TCP + TLS handshake paid on every new connection
+            time.sleep(connect_delay)
+            super().setup()
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _run(label: str, handler, total: int, concurrency: int) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with sem:
+            start = time.perf_counter()
+            await handler()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{label:<9} {total / elapsed:8.1f} req/s  p50={p50:7.1f}ms  p99={p99:7.1f}ms")
+
+
+async def main(total: int, concurrency: int, connect_delay_ms: float) -> None:
+    server = _stub_server(connect_delay_ms / 1000)
+    client = SanityClient()
+    client.base_url = f"http://127.0.0.1:{server.server_address[1]}/v2021-10-21"
+    url = f"{client.base_url}/data/query/{client.dataset}"
+    params = {"query": '*[_type == "post"][0...10]'}
+
+    async def blocking():
+        # Old transport: synchronous, fresh connection per call, inside the event loop
+        requests.get(url, params=params, headers=client._headers(), timeout=10).json()
+
+    async def pooled():
+        await client.query_documents(params["query"])
+
+    try:
+        await _run("requests", blocking, total, concurrency)
+        await _run("httpx", pooled, total, concurrency)
+    finally:
+        await close_http_client()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--connect-delay-ms", type=float, default=20.0,
+                        help="Simulated handshake cost per new connection")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.connect_delay_ms))
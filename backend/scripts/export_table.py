@@ -0,0 +1,35 @@
+"""Export a DynamoDB table to gzip NDJSON using a parallel segmented scan.
+
+Usage::
+
+    python -m backend.scripts.export_table Users --out users.ndjson.gz --segments 16
+    python -m backend.scripts.export_table Posts --out posts.ndjson.gz
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from backend.dynamo import dynamo
+from backend.services.table_scan import DEFAULT_SEGMENTS, export_ndjson_gz
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def main(table: str, out: str, segments: int) -> None:
+    start = time.perf_counter()
+    try:
+        count = await export_ndjson_gz(table, out, total_segments=segments)
+    finally:
+        await dynamo.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} items in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} items/s, {segments} segments)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("table", help="DynamoDB table name, e.g. Users or Posts")
+    parser.add_argument("--out", required=True, help="Destination .ndjson.gz path")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="Parallel scan segments")
+    args = parser.parse_args()
+    asyncio.run(main(args.table, args.out, args.segments))
@@ -0,0 +1,42 @@
+"""Rebuild the Redis feed index from the primary store.
+
+Reads every approved post (bypassing the index) and re-creates the sorted sets
+behind ``/posts`` and ``/posts/filter``. Feed reads fall back to Sanity/DynamoDB
+until the rebuild completes, and keep doing so if a read fails part way.
+Requires ``REDIS_URL``.
+
+Usage::
+
+    python -m backend.scripts.rebuild_feed_index
+"""
+import asyncio
+import logging
+import os
+import time
+
+import redis.asyncio as aioredis
+
+from backend.database import iter_approved_posts
+from backend.dynamo import dynamo
+from backend.redis_client import set_redis
+from backend.sanity_client import close_http_client
+from backend.services.feed_index import feed_index
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def main() -> None:
+    client = aioredis.from_url(os.environ["REDIS_URL"], encoding="utf-8", decode_responses=True)
+    set_redis(client)
+    start = time.perf_counter()
+    try:
+        count = await feed_index.rebuild(iter_approved_posts())
+    finally:
+        await client.aclose()
+        await dynamo.close()
+        await close_http_client()
+    print(f"Indexed {count} posts in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
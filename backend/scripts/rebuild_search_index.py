@@ -0,0 +1,37 @@
+"""Rebuild the local SQLite full-text index behind ``/posts/search``.
+
+Reads every approved post from the primary store and replaces the contents of
+``SEARCH_INDEX_PATH`` in one transaction; searches keep using the old contents
+until it commits, and a failed read leaves them untouched. The index is a
+per-host file: API workers build it on startup when it is empty and keep it
+current from broadcast changes, so this is only needed to force a full
+refresh of one host.
+
+Usage::
+
+    python -m backend.scripts.rebuild_search_index
+"""
+import asyncio
+import logging
+import time
+
+from backend.database import iter_approved_posts
+from backend.dynamo import dynamo
+from backend.sanity_client import close_http_client
+from backend.services.search_index import search_index
+
+logging.basicConfig(level=logging.INFO)
+
+async def main() -> None:
+    start = time.perf_counter()
+    try:
+        count = await search_index.rebuild(iter_approved_posts())
+    finally:
+        search_index.close()
+        await dynamo.close()
+        await close_http_client()
+    print(f"Indexed {count} posts into {search_index.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
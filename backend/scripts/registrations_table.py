@@ -0,0 +1,134 @@
+"""Create the Registrations table and migrate embedded post registrants into it.
+
+Registrations are stored one item per (post_id, user_id) with a reverse
+``user_id-index`` GSI; each post keeps only a ``registrant_count``::
+
+    Registrations   HASH post_id, RANGE user_id
+    user_id-index   HASH user_id, RANGE registered_at
+
+Usage::
+
+    python -m backend.scripts.registrations_table create    # DynamoDB only
+    python -m backend.scripts.registrations_table migrate   # move posts' registrants arrays out
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from boto3.dynamodb.conditions import Attr
+
+from backend.dynamo import dynamo
+from backend.groq import GroqQuery
+from backend.registrations import (COUNT_FIELD, USER_INDEX, _sanity_client, _sanity_id,
+                                   registrations_table)
+from backend.sanity_client import close_http_client
+from backend.services.table_scan import parallel_scan
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def create_table() -> None:
+    client = await dynamo.client()
+    existing = (await client.list_tables())["TableNames"]
+    if registrations_table.name in existing:
+        logger.info(f"{registrations_table.name} already exists")
+        return
+    await client.create_table(
+        TableName=registrations_table.name,
+        BillingMode="PAY_PER_REQUEST",
+        AttributeDefinitions=[
+            {"AttributeName": "post_id", "AttributeType": "S"},
+            {"AttributeName": "user_id", "AttributeType": "S"},
+            {"AttributeName": "registered_at", "AttributeType": "S"},
+        ],
+        KeySchema=[
+            {"AttributeName": "post_id", "KeyType": "HASH"},
+            {"AttributeName": "user_id", "KeyType": "RANGE"},
+        ],
+        GlobalSecondaryIndexes=[{
+            "IndexName": USER_INDEX,
+            "KeySchema": [
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "registered_at", "KeyType": "RANGE"},
+            ],
+            "Projection": {"ProjectionType": "ALL"},
+        }],
+    )
+    logger.info(f"Creating {registrations_table.name}")
+    waiter = client.get_waiter("table_exists")
+    await waiter.wait(TableName=registrations_table.name)
+
+
+async def _migrate_sanity() -> int:
+    posts = await _sanity_client.fetch(
+        GroqQuery('_type == "post"', 'defined(registrants)').project("{_id, registrants}")
+    )
+    for post in posts:
+        registrants = {r["user_id"]: r for r in post["registrants"] if r.get("user_id")}
+        mutations = [
+            {
+                "createIfNotExists": {
+                    "_id": _sanity_id(post["_id"], user_id),
+                    "_type": "registration",
+                    "postId": post["_id"],
+                    "userId": user_id,
+                    "name": r.get("name"),
+                    "email": r.get("email"),
+                    "registeredAt": r.get("registered_at") or datetime.utcnow().isoformat(),
+                }
+            }
+            for user_id, r in registrants.items()
+        ]
+        mutations.append({
+            "patch": {"id": post["_id"], "set": {COUNT_FIELD: len(registrants)}, "unset": ["registrants"]}
+        })
+        await _sanity_client.mutate(mutations)
+    return len(posts)
+
+
+async def _migrate_dynamo() -> int:
+    from backend.database import posts_table
+
+    migrated = 0
+    async for post in parallel_scan(
+        "Posts",
+        FilterExpression=Attr("registrants").exists(),
+        ProjectionExpression="post_id, registrants",
+    ):
+        registrants = {r["user_id"]: r for r in post["registrants"] if r.get("user_id")}
+        for user_id, r in registrants.items():
+            item = {
+                "post_id": post["post_id"],
+                "user_id": user_id,
+                "registered_at": r.get("registered_at") or datetime.utcnow().isoformat(),
+            }
+            item.update({k: r[k] for k in ("name", "email") if r.get(k)})
+            await registrations_table.put_item(Item=item)
+        await posts_table.update_item(
+            Key={"post_id": post["post_id"]},
+            UpdateExpression=f"SET {COUNT_FIELD} = :n REMOVE registrants",
+            ExpressionAttributeValues={":n": len(registrants)},
+        )
+        migrated += 1
+    return migrated
+
+
+async def main(command: str) -> None:
+    try:
+        if command == "create":
+            await create_table()
+        elif _sanity_client:
+            logger.info(f"Migrated registrants on {await _migrate_sanity()} Sanity posts")
+        else:
+            logger.info(f"Migrated registrants on {await _migrate_dynamo()} DynamoDB posts")
+    finally:
+        await dynamo.close()
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["create", "migrate"])
+    asyncio.run(main(parser.parse_args().command))
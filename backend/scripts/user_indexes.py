@@ -0,0 +1,108 @@
+"""Create and backfill the Users table lookup indexes.
+
+``get_user_by_username``, ``get_user_by_email`` and ``get_user_by_steam_id``
+query these GSIs instead of scanning the table::
+
+    username-index   HASH username
+    email-index      HASH email
+    steam_id-index   HASH steam_id   (sparse: only Steam-linked users)
+
+Usage::
+
+    python -m backend.scripts.user_indexes create     # add any missing GSI and wait for ACTIVE
+    python -m backend.scripts.user_indexes backfill   # copy external_ids.steam -> steam_id
+"""
+import argparse
+import asyncio
+import logging
+
+from boto3.dynamodb.conditions import Attr
+
+from backend.database import EMAIL_INDEX, STEAM_ID_INDEX, USERNAME_INDEX, users_table
+from backend.dynamo import dynamo
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+INDEXES = {
+    USERNAME_INDEX: "username",
+    EMAIL_INDEX: "email",
+    STEAM_ID_INDEX: "steam_id",
+}
+
+
+async def _wait_until_active(client, index_name: str) -> None:
+    while True:
+        table = (await client.describe_table(TableName="Users"))["Table"]
+        status = next(
+            (g["IndexStatus"] for g in table.get("GlobalSecondaryIndexes", []) if g["IndexName"] == index_name),
+            None,
+        )
+        if status == "ACTIVE":
+            return
+        logger.info(f"{index_name}: {status}")
+        await asyncio.sleep(15)
+
+
+async def create_indexes() -> None:
+    client = await dynamo.client()
+    table = (await client.describe_table(TableName="Users"))["Table"]
+    existing = {g["IndexName"] for g in table.get("GlobalSecondaryIndexes", [])}
+    on_demand = table.get("BillingModeSummary", {}).get("BillingMode") == "PAY_PER_REQUEST"
+
+    # DynamoDB only accepts one GSI creation per UpdateTable call
+    for index_name, attr in INDEXES.items():
+        if index_name in existing:
+            logger.info(f"{index_name} already exists")
+            continue
+        create = {
+            "IndexName": index_name,
+            "KeySchema": [{"AttributeName": attr, "KeyType": "HASH"}],
+            "Projection": {"ProjectionType": "ALL"},
+        }
+        if not on_demand:
+            create["ProvisionedThroughput"] = {"ReadCapacityUnits": 5, "WriteCapacityUnits": 5}
+        await client.update_table(
+            TableName="Users",
+            AttributeDefinitions=[{"AttributeName": attr, "AttributeType": "S"}],
+            GlobalSecondaryIndexUpdates=[{"Create": create}],
+        )
+        logger.info(f"Creating {index_name}")
+        await _wait_until_active(client, index_name)
+
+
+async def backfill_steam_ids() -> None:
+    scan_kwargs = {
+        "FilterExpression": Attr("external_ids.steam").exists() & Attr("steam_id").not_exists(),
+        "ProjectionExpression": "user_id, external_ids",
+    }
+    updated = 0
+    while True:
+        response = await users_table.scan(**scan_kwargs)
+        for item in response.get("Items", []):
+            await users_table.update_item(
+                Key={"user_id": item["user_id"]},
+                UpdateExpression="SET steam_id = :s",
+                ExpressionAttributeValues={":s": item["external_ids"]["steam"]},
+            )
+            updated += 1
+        if "LastEvaluatedKey" not in response:
+            break
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    logger.info(f"Backfilled steam_id on {updated} users")
+
+
+async def main(command: str) -> None:
+    try:
+        if command == "create":
+            await create_indexes()
+        else:
+            await backfill_steam_ids()
+    finally:
+        await dynamo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["create", "backfill"])
+    asyncio.run(main(parser.parse_args().command))
@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from backend.redis_client import get_redis
+from backend.utils.cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TTL = float(os.getenv("ASSET_CACHE_LOCAL_TTL", "3600"))
+LOCAL_MAXSIZE = int(os.getenv("ASSET_CACHE_LOCAL_MAXSIZE", "5000"))
+# Sanity assets are immutable, so hash -> asset entries can live long
+HASH_TTL = int(os.getenv("ASSET_CACHE_HASH_TTL", str(30 * 24 * 3600)))
+URL_TTL = int(os.getenv("ASSET_CACHE_URL_TTL", str(7 * 24 * 3600)))
+
+HASH_PREFIX = "asset:sha256:"
+URL_PREFIX = "asset:url:"
+
+
+class AssetCache:
+    """Content-addressed cache of uploaded Sanity image assets.
+
+    ``sha256 -> image reference`` lets identical bytes skip the upload, and
+    ``source URL -> {sha256, etag, last_modified}`` lets a repeated URL be
+    revalidated with a conditional GET instead of being downloaded again.
+    Both maps live in Redis with a per-process LRU in front.
+    """
+
+    def __init__(self):
+        self._local = TTLCache(LOCAL_MAXSIZE, LOCAL_TTL)
+        self.stats: Dict[str, int] = {"hash_hits": 0, "url_revalidated": 0, "misses": 0}
+
+    async def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        raw = self._local.get(key)
+        if raw is MISSING:
+            redis = get_redis()
+            if redis is None:
+                return None
+            try:
+                raw = await redis.get(key)
+            except RedisError as e:
+                logger.warning(f"[AssetCache] Redis unavailable: {e}")
+                return None
+            if raw is None:
+                return None
+            self._local.set(key, raw)
+        return json.loads(raw)
+
+    async def _set(self, key: str, value: Dict[str, Any], ttl: int) -> None:
+        raw = json.dumps(value, separators=(",", ":"))
+        self._local.set(key, raw)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                await redis.set(key, raw, ex=ttl)
+            except RedisError as e:
+                logger.warning(f"[AssetCache] Redis unavailable: {e}")
+
+    async def get_by_hash(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Return the image reference previously uploaded for these bytes."""
+        ref = await self._get(HASH_PREFIX + sha256)
+        if ref is not None:
+            self.stats["hash_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+        return ref
+
+    async def get_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return ``{"sha256", "etag", "last_modified", "ref"}`` for a known source URL."""
+        entry = await self._get(URL_PREFIX + url)
+        if entry is None:
+            return None
+        ref = await self._get(HASH_PREFIX + entry["sha256"])
+        if ref is None:
+            return None
+        return {**entry, "ref": ref}
+
+    def record_revalidated(self) -> None:
+        self.stats["url_revalidated"] += 1
+
+    async def remember(
+        self,
+        sha256: str,
+        ref: Dict[str, Any],
+        url: Optional[str] = None,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        await self._set(HASH_PREFIX + sha256, ref, HASH_TTL)
+        if url and (etag or last_modified):
+            # Without validators a URL cannot be revalidated, so it is not mapped
+            await self._set(
+                URL_PREFIX + url,
+                {"sha256": sha256, "etag": etag, "last_modified": last_modified},
+                URL_TTL,
+            )
+
+
+asset_cache = AssetCache()
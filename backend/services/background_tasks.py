@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
@@ -6,8 +7,9 @@ from boto3.dynamodb.conditions import Attr
 from botocore.exceptions import ClientError
 
 # Import these functions later after implementation
-from backend.database import get_users_with_steam, update_user_profile
+from backend.database import update_user_profile
 from backend.services.steam_utils import fetch_steam_profile
+from backend.services.table_scan import parallel_scan
 
 logger = logging.getLogger(__name__)
 
@@ -19,19 +21,25 @@ async def sync_steam_profiles(background_tasks: BackgroundTasks):
 async def _sync_all_steam_profiles():
     """Sync Steam profile data for all users with Steam linked"""
     try:
-        users = get_users_with_steam()
-        logger.info(f"Starting Steam profile sync for {len(users)} users")
+        logger.info("Starting Steam profile sync")
         
         sync_count = 0
         error_count = 0
         
-        for user in users:
+        # Parallel segmented scan streams users in as segments are read
+        users = parallel_scan(
+            "Users",
+            FilterExpression=Attr("steam_profile").exists(),
+            ProjectionExpression="user_id, steam_profile.steam_id",
+        )
+        async for user in users:
             try:
                 user_id = user["user_id"]
                 steam_id = user["steam_profile"]["steam_id"]
                 
                 logger.debug(f"Syncing Steam profile for user {user_id}")
-                steam_profile = fetch_steam_profile(steam_id)
+                # fetch_steam_profile uses blocking HTTP; keep it off the event loop
+                steam_profile = await asyncio.to_thread(fetch_steam_profile, steam_id)
                 
                 if steam_profile:
                     updates = {
@@ -39,7 +47,7 @@ async def _sync_all_steam_profiles():
                         "updated_at": str(datetime.utcnow()),
                         "last_steam_sync": str(datetime.utcnow())
                     }
-                    update_user_profile(user_id, updates)
+                    await update_user_profile(user_id, updates)
                     sync_count += 1
                     logger.debug(f"Successfully synced Steam profile for user {user_id}")
                 else:
@@ -0,0 +1,180 @@
+import os
+import time
+import hashlib
+import logging
+import secrets
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Union
+
+from fastapi import Request, Response
+from redis.exceptions import RedisError
+
+from backend.redis_client import get_redis
+from backend.utils.responses import FastJSONResponse, RawJSON, dumps
+
+logger = logging.getLogger(__name__)
+
+VALIDATOR_PREFIX = "etag:v:"       # resource -> "dep|generation|etag"
+GENERATION_PREFIX = "etag:gen:"    # dep -> "token@bumped_at", replaced on every write
+VALIDATOR_TTL = int(os.getenv("ETAG_VALIDATOR_TTL", "300"))
+# After a write, reads may still come from the Sanity CDN, the post replica or a
+# DynamoDB index that has not caught up; no validator is remembered until then
+SETTLE_SECONDS = float(os.getenv("ETAG_SETTLE_SECONDS", "30"))
+# 0 makes browsers and proxies revalidate public resources on every use
+PUBLIC_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", "0"))
+
+Dep = Union[str, Callable[[Any], str]]
+
+
+def post_dep(post_id: str) -> str:
+    return f"post:{post_id}"
+
+
+def user_dep(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def etag_for(content: Any, body: bytes) -> str:
+    """Strong ETag: the Sanity revision when the document has one, else a digest of the body."""
+    rev = content.get("_rev") if isinstance(content, dict) else None
+    if rev:
+        return f'"r-{rev}"'
+    return f'"h-{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """``If-None-Match`` uses the weak comparison, so a ``W/`` prefix is ignored."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class _Validator(NamedTuple):
+    dep: str
+    generation: str
+    etag: str
+
+
+def _parse(raw: Optional[str]) -> Optional[_Validator]:
+    parts = (raw or "").rsplit("|", 2)
+    return _Validator(*parts) if len(parts) == 3 else None
+
+
+def _settled(generation: str) -> bool:
+    _, _, bumped_at = generation.partition("@")
+    return not bumped_at or time.time() - float(bumped_at) >= SETTLE_SECONDS
+
+
+class EtagCache:
+    """ETags and ``304 Not Modified`` for single-resource GETs.
+
+    Every response carries a strong ETag (see ``etag_for``). When the
+    client's ``If-None-Match`` matches, only headers go back.
+
+    With Redis, the ETag of each resource is also remembered as a
+    validator, so a matching request is answered without loading the
+    document at all. A validator records the *generation* of the entity it
+    depends on (``post:<id>``, ``user:<id>``). Writers call ``bump``, which
+    replaces the generation with a fresh random token, so every validator
+    taken before the write stops matching. Readers note the generation
+    before loading, so a write racing with a load leaves a validator that
+    never matches rather than one that is wrong. Validators live
+    VALIDATOR_TTL seconds, generations twice that, and a generation that
+    expires can never come back with an old value.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, int] = {"validator_hits": 0, "not_modified": 0, "full": 0, "bumps": 0}
+
+    async def bump(self, dep: str) -> None:
+        """Invalidate every validator that depends on ``dep``; call after each write."""
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.set(GENERATION_PREFIX + dep, f"{secrets.token_hex(6)}@{int(time.time())}",
+                            ex=2 * VALIDATOR_TTL)
+            self.stats["bumps"] += 1
+        except RedisError as e:
+            # Validators taken before this write keep matching until they expire
+            logger.warning(f"[EtagCache.bump] Failed to bump {dep}: {e}")
+
+    @staticmethod
+    def _headers(etag: str, public: bool) -> Dict[str, str]:
+        if not public:
+            return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+        cache_control = f"public, max-age={PUBLIC_MAX_AGE}" if PUBLIC_MAX_AGE else "public, no-cache"
+        return {"ETag": etag, "Cache-Control": cache_control}
+
+    async def respond(self, request: Request, load: Callable[[], Awaitable[Any]],
+                      resource: Optional[str] = None, dep: Optional[Dep] = None,
+                      public: bool = True) -> Response:
+        """Answer a GET with ``load()``'s result as JSON, or 304.
+
+        ``resource`` names the response for the validator cache and ``dep`` is
+        the entity whose writes change it. ``dep`` may be a function of the
+        loaded content when it is only known afterwards (e.g. a user looked up
+        by username); the generation is then read after the load. Without a
+        ``resource`` only the ETag comparison is done; pass one only when
+        every write to ``dep`` calls ``bump``. ``load`` raises
+        HTTPException for a missing resource as usual. ``public=False`` marks
+        a per-user response.
+        """
+        redis = get_redis() if resource and dep else None
+        stored: Optional[_Validator] = None
+        generation: Optional[str] = None
+        if redis is not None:
+            try:
+                if isinstance(dep, str):
+                    raw, generation = await redis.mget([VALIDATOR_PREFIX + resource, GENERATION_PREFIX + dep])
+                    generation = generation or "0"
+                    stored = _parse(raw)
+                else:
+                    stored = _parse(await redis.get(VALIDATOR_PREFIX + resource))
+                    if stored:
+                        generation = await redis.get(GENERATION_PREFIX + stored.dep) or "0"
+            except RedisError as e:
+                logger.warning(f"[EtagCache.respond] Validator lookup failed for {resource}: {e}")
+                redis = None
+            if (stored and stored.generation == generation
+                    and (not isinstance(dep, str) or stored.dep == dep)
+                    and if_none_match(request, stored.etag)):
+                self.stats["validator_hits"] += 1
+                self.stats["not_modified"] += 1
+                return Response(status_code=304, headers=self._headers(stored.etag, public))
+
+        content = await load()
+        body = dumps(content)
+        etag = etag_for(content, body)
+        if redis is not None:
+            await self._remember(redis, resource, dep, content, stored, generation, etag)
+
+        headers = self._headers(etag, public)
+        if if_none_match(request, etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        self.stats["full"] += 1
+        return FastJSONResponse(RawJSON(body), headers=headers)
+
+    async def _remember(self, redis, resource: str, dep: Dep, content: Any,
+                        stored: Optional[_Validator], generation: Optional[str], etag: str) -> None:
+        try:
+            if not isinstance(dep, str):
+                dep = dep(content)
+                if not stored or stored.dep != dep:
+                    generation = await redis.get(GENERATION_PREFIX + dep) or "0"
+            if _settled(generation):
+                await redis.set(VALIDATOR_PREFIX + resource, f"{dep}|{generation}|{etag}", ex=VALIDATOR_TTL)
+        except RedisError as e:
+            logger.warning(f"[EtagCache] Failed to store validator for {resource}: {e}")
+
+
+etag_cache = EtagCache()
@@ -0,0 +1,281 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from backend.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "feed:"
+NEWEST_KEY = PREFIX + "newest"      # approved post IDs scored by post date
+TRENDING_KEY = PREFIX + "trending"  # approved post IDs scored by decayed engagement (services/trending.py)
+READY_KEY = PREFIX + "ready"        # set once a full rebuild has completed
+TAGS_KEY = PREFIX + "tags"          # every tag that has (or had) a posting list
+STUDIOS_KEY = PREFIX + "studios"    # every studio that has (or had) a posting list
+# Computed selections are kept briefly so consecutive pages read the same snapshot
+SELECTION_TTL = 15
+
+
+def _tag_key(tag: str) -> str:
+    return f"{PREFIX}tag:{tag}"
+
+
+def _type_key(post_type: str) -> str:
+    return f"{PREFIX}type:{post_type}"
+
+
+def _studio_key(studio: str) -> str:
+    return f"{PREFIX}studio:{studio}"
+
+
+def _meta_key(post_id: str) -> str:
+    return f"{PREFIX}meta:{post_id}"
+
+
+def post_id_of(post: Dict[str, Any]) -> Optional[str]:
+    return post.get("_id") or post.get("post_id")
+
+
+def _is_approved(post: Dict[str, Any]) -> bool:
+    # Posts created before the approval flag existed count as approved
+    return post.get("is_approved", True) is True
+
+
+def _timestamp(post: Dict[str, Any], fields: Tuple[str, ...] = ("date", "created_at", "_createdAt")) -> float:
+    for field in fields:
+        value = post.get(field)
+        if value:
+            try:
+                return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue
+    return 0.0
+
+
+def _fields(post: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "post_type": post.get("postType") or post.get("post_type"),
+        "tags": sorted(set(post.get("tags") or [])),
+        "studio": post.get("studio"),
+        "date": _timestamp(post),
+    }
+
+
+class FeedIndex:
+    """Materialised feed of approved posts held in Redis sorted sets.
+
+    ``feed:newest`` and ``feed:trending`` hold every approved post ID, scored
+    by date and trending score. ``feed:tag:<tag>``, ``feed:studio:<studio>``
+    and ``feed:type:<postType>`` are inverted indexes (posting lists scored by
+    date). Feed reads turn into ZUNIONSTORE/ZINTERSTORE + ZREVRANGE followed by
+    a multi-get of the posts, and facet counts into ZINTERCARD, instead of a
+    GROQ filter or a table scan.
+
+    The index is an optimisation. Every method returns None (or swallows the
+    error on writes) when Redis is unavailable or the index has not been built
+    yet, and callers fall back to querying the primary store.
+    """
+
+    async def ready(self) -> bool:
+        redis = get_redis()
+        if redis is None:
+            return False
+        try:
+            return bool(await redis.exists(READY_KEY))
+        except RedisError as e:
+            logger.warning(f"[FeedIndex.ready] Redis unavailable: {e}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    async def index_post(self, post: Dict[str, Any]) -> bool:
+        """Add or refresh an approved post. Unapproved posts are removed instead.
+
+        Returns False if Redis rejected the write.
+        """
+        post_id = post_id_of(post)
+        if not post_id:
+            return True
+        if not _is_approved(post):
+            await self.remove_post(post_id)
+            return True
+        redis = get_redis()
+        if redis is None:
+            return False
+        fields = _fields(post)
+        try:
+            # Drop memberships from a previous version of the post first
+            previous = await redis.get(_meta_key(post_id))
+            async with redis.pipeline(transaction=True) as pipe:
+                if previous:
+                    self._unlink(pipe, post_id, json.loads(previous))
+                pipe.zadd(NEWEST_KEY, {post_id: fields["date"]})
+                if fields["post_type"]:
+                    pipe.zadd(_type_key(fields["post_type"]), {post_id: fields["date"]})
+                if fields["studio"]:
+                    pipe.zadd(_studio_key(fields["studio"]), {post_id: fields["date"]})
+                    pipe.sadd(STUDIOS_KEY, fields["studio"])
+                for tag in fields["tags"]:
+                    pipe.zadd(_tag_key(tag), {post_id: fields["date"]})
+                if fields["tags"]:
+                    pipe.sadd(TAGS_KEY, *fields["tags"])
+                pipe.set(_meta_key(post_id), json.dumps(fields))
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"[FeedIndex.index_post] Failed to index {post_id}: {e}")
+            return False
+        # Imported here: the trending engine depends on this module's keys
+        from backend.services.trending import trending
+        # The publish boost decays from when the post entered the feed
+        await trending.seed(post_id, _timestamp(post, ("approved_at", "created_at", "_createdAt")))
+        return True
+
+    async def remove_post(self, post_id: str) -> None:
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            previous = await redis.get(_meta_key(post_id))
+            async with redis.pipeline(transaction=True) as pipe:
+                self._unlink(pipe, post_id, json.loads(previous) if previous else {})
+                pipe.zrem(NEWEST_KEY, post_id)
+                pipe.zrem(TRENDING_KEY, post_id)
+                pipe.delete(_meta_key(post_id))
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"[FeedIndex.remove_post] Failed to remove {post_id}: {e}")
+
+    def _unlink(self, pipe, post_id: str, fields: Dict[str, Any]) -> None:
+        if fields.get("post_type"):
+            pipe.zrem(_type_key(fields["post_type"]), post_id)
+        if fields.get("studio"):
+            pipe.zrem(_studio_key(fields["studio"]), post_id)
+        for tag in fields.get("tags", []):
+            pipe.zrem(_tag_key(tag), post_id)
+
+    async def rebuild(self, posts: AsyncIterator[Dict[str, Any]]) -> int:
+        """Drop the index and re-index every post yielded by ``posts``.
+
+        Reads fall back to the primary store while the rebuild runs. The
+        index is only marked ready once every post is in it: if ``posts``
+        raises (a failed primary read) or a write fails, the error propagates
+        and reads keep falling back until the next successful rebuild.
+        """
+        redis = get_redis()
+        if redis is None:
+            raise RuntimeError("Redis is not configured")
+        await redis.delete(READY_KEY)
+        async for key in redis.scan_iter(match=PREFIX + "*", count=500):
+            await redis.delete(key)
+        count = 0
+        async for post in posts:
+            if not await self.index_post(post):
+                raise RuntimeError(f"Failed to index post {post_id_of(post)}; index left unready")
+            count += 1
+        await redis.set(READY_KEY, datetime.utcnow().isoformat())
+        logger.info(f"[FeedIndex.rebuild] Indexed {count} posts")
+        return count
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    async def _selection_key(self, redis, order: str, post_type: Optional[str], tags: List[str],
+                             studio: Optional[str] = None) -> str:
+        """Return a sorted set holding the selected post IDs with the ordering's scores.
+
+        Tags are OR-ed together; post type and studio narrow the result.
+        """
+        order_key = TRENDING_KEY if order == "trending" else NEWEST_KEY
+        if not post_type and not tags and not studio:
+            return order_key
+
+        key = PREFIX + "q:" + json.dumps([order, post_type, sorted(tags), studio], separators=(",", ":"))
+        if await redis.exists(key):
+            return key
+
+        # Sources contribute weight 0 so the result carries the ordering's score
+        sources = {order_key: 1}
+        if post_type:
+            sources[_type_key(post_type)] = 0
+        if studio:
+            sources[_studio_key(studio)] = 0
+        async with redis.pipeline(transaction=True) as pipe:
+            if tags:
+                union_key = key + ":tags"
+                pipe.zunionstore(union_key, [_tag_key(t) for t in tags], aggregate="MAX")
+                sources[union_key] = 0
+                pipe.zinterstore(key, sources)
+                pipe.delete(union_key)
+            else:
+                pipe.zinterstore(key, sources)
+            pipe.expire(key, SELECTION_TTL)
+            await pipe.execute()
+        return key
+
+    async def query(
+        self,
+        order: str = "newest",
+        post_type: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        studio: Optional[str] = None,
+    ) -> Optional[Tuple[List[str], bool]]:
+        """Return ``(post_ids, has_more)`` for a feed selection, or None if the
+        index cannot answer (not built / Redis unavailable)."""
+        if not await self.ready():
+            return None
+        redis = get_redis()
+        try:
+            key = await self._selection_key(redis, order, post_type, tags or [], studio)
+            stop = offset + limit if limit else -1  # fetch one extra to detect another page
+            ids = await redis.zrevrange(key, offset, stop)
+        except RedisError as e:
+            logger.warning(f"[FeedIndex.query] Falling back to primary store: {e}")
+            return None
+        if limit and len(ids) > limit:
+            return ids[:limit], True
+        return ids, False
+
+    async def facets(
+        self,
+        post_type: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        studio: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Count the selected posts per tag and per studio.
+
+        Returns ``{"total": n, "tags": {tag: n}, "studios": {studio: n}}`` with
+        zero counts omitted, or None if the index cannot answer.
+        """
+        if not await self.ready():
+            return None
+        redis = get_redis()
+        try:
+            key = await self._selection_key(redis, "newest", post_type, tags or [], studio)
+            all_tags = sorted(await redis.smembers(TAGS_KEY))
+            all_studios = sorted(await redis.smembers(STUDIOS_KEY))
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.zcard(key)
+                for tag in all_tags:
+                    pipe.zintercard(2, [key, _tag_key(tag)])
+                for name in all_studios:
+                    pipe.zintercard(2, [key, _studio_key(name)])
+                counts = await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"[FeedIndex.facets] Falling back to primary store: {e}")
+            return None
+        tag_counts = counts[1:1 + len(all_tags)]
+        studio_counts = counts[1 + len(all_tags):]
+        return {
+            "total": counts[0],
+            "tags": {t: n for t, n in zip(all_tags, tag_counts) if n},
+            "studios": {s: n for s, n in zip(all_studios, studio_counts) if n},
+        }
+
+
+feed_index = FeedIndex()
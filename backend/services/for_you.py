@@ -0,0 +1,249 @@
+import os
+import re
+import math
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.database import get_all_posts_from_db, get_posts_by_ids, get_user_from_db
+from backend.pagination import Page, InvalidCursor, encode_cursor, decode_cursor
+from backend.registrations import list_user_registrations
+from backend.utils.cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+# The post-feature matrix is rebuilt from the feed at most this often
+MATRIX_TTL = float(os.getenv("FOR_YOU_MATRIX_TTL", "300"))
+# Per-user ranked lists: short-lived so new registrations show up quickly
+LIST_TTL = float(os.getenv("FOR_YOU_LIST_TTL", "60"))
+LIST_MAXSIZE = int(os.getenv("FOR_YOU_LIST_MAXSIZE", "10000"))
+TOP_N = int(os.getenv("FOR_YOU_TOP_N", "200"))
+# Signal weights for the preference vector
+REGISTRATION_WEIGHT = float(os.getenv("FOR_YOU_REGISTRATION_WEIGHT", "3"))
+RECENT_PLAYTIME_WEIGHT = float(os.getenv("FOR_YOU_RECENT_PLAYTIME_WEIGHT", "2"))
+# Small prior toward recent posts; also orders the list for users with no signal
+RECENCY_WEIGHT = float(os.getenv("FOR_YOU_RECENCY_WEIGHT", "0.1"))
+RECENCY_DAYS = float(os.getenv("FOR_YOU_RECENCY_DAYS", "14"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _post_id(post: Dict[str, Any]) -> Optional[str]:
+    return post.get("_id") or post.get("post_id")
+
+
+def _created(post: Dict[str, Any]) -> float:
+    for field in ("_createdAt", "created_at", "date"):
+        value = post.get(field)
+        if value:
+            try:
+                return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+            except ValueError:
+                continue
+    return 0.0
+
+
+class _Corpus:
+    """Row-normalised post x feature matrix over ``tag:<t>`` and ``studio:<s>`` columns."""
+
+    def __init__(self, posts: List[Dict[str, Any]]):
+        self.post_ids: List[str] = []
+        self.vocab: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        post_types: List[Optional[str]] = []
+        created: List[float] = []
+        for post in posts:
+            post_id = _post_id(post)
+            if not post_id:
+                continue
+            row = len(self.post_ids)
+            self.post_ids.append(post_id)
+            post_types.append(post.get("postType") or post.get("post_type"))
+            created.append(_created(post))
+            features = [f"tag:{t.lower()}" for t in set(post.get("tags") or [])]
+            if post.get("studio"):
+                features.append(f"studio:{post['studio'].lower()}")
+            for feature in features:
+                rows.append(row)
+                cols.append(self.vocab.setdefault(feature, len(self.vocab)))
+
+        self.row_of = {post_id: i for i, post_id in enumerate(self.post_ids)}
+        self.matrix = np.zeros((len(self.post_ids), max(1, len(self.vocab))), dtype=np.float32)
+        self.matrix[rows, cols] = 1.0
+        norms = np.linalg.norm(self.matrix, axis=1)
+        norms[norms == 0] = 1.0
+        self.matrix /= norms[:, None]
+        self.post_types = np.array(post_types, dtype=object)
+        age_days = (time.time() - np.array(created, dtype=np.float64)) / 86400
+        self.recency = np.exp(-np.clip(age_days, 0, None) / RECENCY_DAYS).astype(np.float32)
+        # Single-word features match game-name tokens; multi-word ones match as substrings
+        self.terms: Dict[str, int] = {}
+        self.phrases: Dict[str, int] = {}
+        for feature, col in self.vocab.items():
+            term = feature.split(":", 1)[1]
+            (self.terms if _TOKEN.fullmatch(term) else self.phrases)[term] = col
+        self.built_at = time.monotonic()
+
+    def mask(self, post_type: Optional[str], tags: List[str], studio: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(self.post_ids), dtype=bool)
+        if post_type:
+            mask &= self.post_types == post_type
+        if tags:
+            cols = [self.vocab[f"tag:{t.lower()}"] for t in tags if f"tag:{t.lower()}" in self.vocab]
+            mask &= (self.matrix[:, cols] > 0).any(axis=1) if cols else False
+        if studio:
+            col = self.vocab.get(f"studio:{studio.lower()}")
+            mask &= (self.matrix[:, col] > 0) if col is not None else False
+        return mask
+
+
+class ForYouRanker:
+    """Personalised ordering for ``/posts/filter?tab=ForYou``.
+
+    A user's preference vector over the corpus features is built from:
+
+    * the posts they registered for (the sum of those posts' rows);
+    * owned Steam games stored on their user item (``steam_profile.owned_games``),
+      weighted by ``log1p`` of total and recent playtime in hours. The Steam
+      owned-games API carries no genre data, so a game contributes to the
+      tags/studios whose names appear in its title.
+
+    Candidates are scored with one matrix-vector product (cosine similarity
+    plus a small recency prior). Posts the user already registered for are
+    skipped, and the top ``TOP_N`` IDs are cached per user and selection for
+    ``LIST_TTL`` seconds, so later pages are slices of a cached list.
+
+    The matrix is rebuilt every ``MATRIX_TTL`` seconds in a background task;
+    requests only ever wait for the very first build.
+    """
+
+    def __init__(self):
+        self._corpus: Optional[_Corpus] = None
+        self._lock = asyncio.Lock()
+        self._refresh: Optional[asyncio.Task] = None
+        self._lists = TTLCache(LIST_MAXSIZE, LIST_TTL)
+        self.stats: Dict[str, Any] = {"hits": 0, "misses": 0, "corpus_builds": 0, "last_build_ms": None}
+
+    async def _load_corpus(self) -> _Corpus:
+        """The current matrix. Once one exists, an expired matrix keeps being
+        served while a background task builds its replacement."""
+        corpus = self._corpus
+        if corpus is None:
+            async with self._lock:
+                if self._corpus is None:
+                    await self._build()
+                return self._corpus
+        if time.monotonic() - corpus.built_at >= MATRIX_TTL and self._refresh is None:
+            self._refresh = asyncio.create_task(self._background_build())
+        return corpus
+
+    async def _background_build(self) -> None:
+        try:
+            async with self._lock:
+                await self._build()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Keep serving the old matrix; the next request past MATRIX_TTL retries
+            logger.warning(f"[ForYouRanker] Corpus rebuild failed: {e}")
+        finally:
+            self._refresh = None
+
+    async def _build(self) -> None:
+        start = time.perf_counter()
+        posts: List[Dict[str, Any]] = []
+        cursor = None
+        while True:
+            page = await get_all_posts_from_db(limit=500, cursor=cursor)
+            posts.extend(page.items)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        # Built off the event loop: NumPy work over the whole feed
+        self._corpus = await asyncio.to_thread(_Corpus, posts)
+        self.stats["corpus_builds"] += 1
+        self.stats["last_build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(f"[ForYouRanker] Built {self._corpus.matrix.shape} feature matrix")
+
+    async def stop(self) -> None:
+        if self._refresh is not None:
+            self._refresh.cancel()
+            await asyncio.gather(self._refresh, return_exceptions=True)
+            self._refresh = None
+
+    def _game_vector(self, corpus: _Corpus, user: Dict[str, Any]) -> np.ndarray:
+        vector = np.zeros(corpus.matrix.shape[1], dtype=np.float32)
+        games = ((user.get("steam_profile") or {}).get("owned_games")) or []
+        for game in games:
+            name = str(game.get("name") or "").lower()
+            cols = {corpus.terms[t] for t in _TOKEN.findall(name) if t in corpus.terms}
+            cols.update(col for phrase, col in corpus.phrases.items() if phrase in name)
+            if not cols:
+                continue
+            hours = float(game.get("playtime_minutes") or 0) / 60
+            recent_hours = float(game.get("playtime_2weeks") or 0) / 60
+            weight = math.log1p(hours) + RECENT_PLAYTIME_WEIGHT * math.log1p(recent_hours)
+            vector[list(cols)] += weight
+        return vector
+
+    async def _rank(self, user_id: str, post_type: Optional[str], tags: List[str],
+                    studio: Optional[str]) -> List[str]:
+        corpus = await self._load_corpus()
+        if not corpus.post_ids:
+            return []
+        user, registered = await asyncio.gather(get_user_from_db(user_id), list_user_registrations(user_id))
+        registered_rows = [corpus.row_of[pid] for pid in registered if pid in corpus.row_of]
+
+        preference = self._game_vector(corpus, user or {})
+        if registered_rows:
+            preference += REGISTRATION_WEIGHT * corpus.matrix[registered_rows].sum(axis=0)
+        norm = np.linalg.norm(preference)
+        if norm > 0:
+            preference /= norm
+
+        scores = corpus.matrix @ preference + RECENCY_WEIGHT * corpus.recency
+        mask = corpus.mask(post_type, tags, studio)
+        mask[registered_rows] = False
+        candidates = np.flatnonzero(mask)
+        if candidates.size == 0:
+            return []
+        k = min(TOP_N, candidates.size)
+        top = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [corpus.post_ids[i] for i in top]
+
+    async def ranked_ids(self, user_id: str, post_type: Optional[str] = None,
+                         tags: Optional[List[str]] = None, studio: Optional[str] = None) -> List[str]:
+        key: Tuple = (user_id, post_type, tuple(sorted(tags or [])), studio)
+        ids = self._lists.get(key)
+        if ids is not MISSING:
+            self.stats["hits"] += 1
+            return ids
+        self.stats["misses"] += 1
+        ids = await self._rank(user_id, post_type, tags or [], studio)
+        self._lists.set(key, ids)
+        return ids
+
+    async def page(self, user_id: str, post_type: Optional[str], tags: Optional[List[str]],
+                   studio: Optional[str], limit: Optional[int], cursor: Optional[str]) -> Optional[Page]:
+        """A page of ranked posts, or None if ``cursor`` belongs to another listing."""
+        state = decode_cursor(cursor)
+        if state is not None and "for_you_offset" not in state:
+            return None
+        offset = state["for_you_offset"] if state else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise InvalidCursor("Malformed cursor")
+        ids = await self.ranked_ids(user_id, post_type, tags, studio)
+        end = offset + limit if limit else len(ids)
+        next_cursor = encode_cursor({"for_you_offset": end}) if end < len(ids) else None
+        page_ids = ids[offset:end]
+        posts = await get_posts_by_ids(page_ids)
+        return Page([posts[pid] for pid in page_ids if pid in posts], next_cursor)
+
+
+for_you = ForYouRanker()
@@ -0,0 +1,59 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from backend.sanity_client import SanityClient
+
+logger = logging.getLogger(__name__)
+
+# Images fetched/uploaded at the same time for one post
+INGEST_CONCURRENCY = int(os.getenv("IMAGE_INGEST_CONCURRENCY", "4"))
+MAX_IMAGE_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+ALLOWED_IMAGE_TYPES = frozenset(
+    t.strip() for t in os.getenv(
+        "IMAGE_ALLOWED_TYPES", "image/jpeg,image/png,image/gif,image/webp,image/avif"
+    ).split(",") if t.strip()
+)
+
+ImageSource = Union[str, Dict[str, Any]]
+
+
+class BannerImageError(ValueError):
+    """The banner image, which every post needs, could not be ingested."""
+
+
+class IngestResult(NamedTuple):
+    source: ImageSource
+    ref: Optional[Dict[str, Any]] = None  # Sanity image reference on success
+    error: Optional[str] = None
+
+
+def is_image_ref(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("_type") == "image"
+
+
+async def ingest_images(client: SanityClient, sources: List[ImageSource]) -> List[IngestResult]:
+    """Upload image URLs to Sanity concurrently; results are in input order.
+
+    Sources that are already Sanity image references pass through untouched.
+    At most ``INGEST_CONCURRENCY`` images stream at once, each limited to
+    ``MAX_IMAGE_BYTES`` and ``ALLOWED_IMAGE_TYPES``. A failing image does not
+    affect the others; its ``error`` says why.
+    """
+    semaphore = asyncio.Semaphore(INGEST_CONCURRENCY)
+
+    async def ingest(source: ImageSource) -> IngestResult:
+        if is_image_ref(source):
+            return IngestResult(source, ref=source)
+        async with semaphore:
+            try:
+                ref = await client.upload_image_from_url(
+                    str(source), max_bytes=MAX_IMAGE_BYTES, allowed_types=ALLOWED_IMAGE_TYPES
+                )
+                return IngestResult(source, ref=ref)
+            except Exception as e:
+                logger.warning(f"[ingest_images] Failed to ingest {source}: {e}")
+                return IngestResult(source, error=str(e))
+
+    return list(await asyncio.gather(*(ingest(source) for source in sources)))
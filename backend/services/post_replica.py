@@ -0,0 +1,399 @@
+import os
+import time
+import asyncio
+import bisect
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from backend.groq import GroqQuery, POST_DETAIL
+from backend.pagination import Page, InvalidCursor, encode_cursor
+from backend.services.etag_cache import etag_cache, post_dep
+from backend.utils.cache import MISSING
+
+logger = logging.getLogger(__name__)
+
+# Opt-in per deployment: every worker holds a full copy of the posts dataset
+ENABLED = os.getenv("POST_REPLICA_ENABLED", "false").lower() in ("1", "true", "yes")
+# After the listen stream drops, reads keep using the replica for this long
+MAX_STALENESS = float(os.getenv("POST_REPLICA_MAX_STALENESS", "30"))
+LOAD_PAGE_SIZE = int(os.getenv("POST_REPLICA_LOAD_PAGE_SIZE", "1000"))
+MAX_RECONNECT_DELAY = float(os.getenv("POST_REPLICA_MAX_RECONNECT_DELAY", "60"))
+
+POST_FILTER = ('_type == "post"', '!(_id in path("drafts.**"))')
+LISTEN_QUERY = f'*[{" && ".join(POST_FILTER)}]'
+
+# Field sets mirroring the GROQ projections in backend/groq.py
+DETAIL_FIELDS = (
+    "_id", "_rev", "_createdAt", "_updatedAt", "title", "description", "studio", "tags",
+    "postType", "date", "advertisingTags", "bannerImage", "images", "testerId", "createdBy",
+    "status", "is_approved", "approved_at", "access_instructions", "has_nda", "rewards",
+    "capacity", "registrant_count", "waitlist_count",
+)
+CARD_FIELDS = (
+    "_id", "_createdAt", "title", "description", "studio", "tags", "postType", "date",
+    "advertisingTags", "bannerImage", "images", "testerId", "capacity", "registrant_count",
+)
+OWNER_FIELDS = (
+    "_id", "_createdAt", "title", "description", "studio", "tags", "postType", "date",
+    "bannerImage", "images", "testerId", "status", "is_approved", "registrant_count",
+)
+
+_EMPTY: frozenset = frozenset()
+
+
+def _detail(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Trim a raw listen result to the POST_DETAIL shape."""
+    post = {field: doc.get(field) for field in DETAIL_FIELDS}
+    for counter in ("registrant_count", "waitlist_count"):
+        if post[counter] is None:
+            post[counter] = 0
+    return post
+
+
+def _view(post: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    view = {field: post.get(field) for field in fields}
+    if fields is not DETAIL_FIELDS and view.get("images"):
+        view["images"] = view["images"][:1]
+    return view
+
+
+def _is_approved(post: Dict[str, Any]) -> bool:
+    # Posts created before the approval flag existed count as approved
+    return post.get("is_approved") is None or post.get("is_approved") is True
+
+
+def _date_key(post: Dict[str, Any]) -> Tuple[str, str]:
+    return (post.get("_createdAt") or "", post["_id"])
+
+
+class PostReplica:
+    """In-process copy of every Sanity ``post`` document.
+
+    On start the replica opens a ``/listen`` stream. After each ``welcome`` it
+    loads a full snapshot with paged queries and then applies mutation events
+    in order. Secondary indexes (tag, postType, studio, testerId and
+    ``_createdAt`` order) let feed pages, profile lists and point reads be
+    answered without a network round trip.
+
+    Reads return ``MISSING`` / ``None`` when the replica is not usable, i.e.
+    before the first load or once the stream has been down for more than
+    ``MAX_STALENESS`` seconds; callers then query Sanity directly. Returned
+    dicts are fresh at the top level, but nested values are shared with the
+    replica and must not be mutated.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._ready = False
+        self._connected = False
+        self._disconnected_at = 0.0
+        self._reset()
+        self.stats: Dict[str, Any] = {
+            "hits": 0,
+            "fallbacks": 0,
+            "events": 0,
+            "loads": 0,
+            "reconnects": 0,
+            "last_loaded_at": None,
+            "last_event_at": None,
+            "last_event_lag_ms": None,
+            "max_event_lag_ms": 0.0,
+        }
+
+    def _reset(self) -> None:
+        self._posts: Dict[str, Dict[str, Any]] = {}
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._by_type: Dict[str, Set[str]] = {}
+        self._by_studio: Dict[str, Set[str]] = {}
+        self._by_owner: Dict[str, Set[str]] = {}
+        self._by_date: List[Tuple[str, str]] = []  # sorted (_createdAt, _id)
+
+    # ------------------------------------------------------------------
+    # Index maintenance
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _add(index: Dict[str, Set[str]], key: Any, post_id: str) -> None:
+        if key:
+            index.setdefault(key, set()).add(post_id)
+
+    @staticmethod
+    def _discard(index: Dict[str, Set[str]], key: Any, post_id: str) -> None:
+        members = index.get(key) if key else None
+        if members is not None:
+            members.discard(post_id)
+            if not members:
+                del index[key]
+
+    def _link(self, post: Dict[str, Any]) -> None:
+        post_id = post["_id"]
+        self._posts[post_id] = post
+        for tag in set(post.get("tags") or []):
+            self._add(self._by_tag, tag, post_id)
+        self._add(self._by_type, post.get("postType"), post_id)
+        self._add(self._by_studio, post.get("studio"), post_id)
+        self._add(self._by_owner, post.get("testerId"), post_id)
+        bisect.insort(self._by_date, _date_key(post))
+
+    def _unlink(self, post_id: str) -> None:
+        post = self._posts.pop(post_id, None)
+        if post is None:
+            return
+        for tag in set(post.get("tags") or []):
+            self._discard(self._by_tag, tag, post_id)
+        self._discard(self._by_type, post.get("postType"), post_id)
+        self._discard(self._by_studio, post.get("studio"), post_id)
+        self._discard(self._by_owner, post.get("testerId"), post_id)
+        key = _date_key(post)
+        i = bisect.bisect_left(self._by_date, key)
+        if i < len(self._by_date) and self._by_date[i] == key:
+            del self._by_date[i]
+
+    def _upsert(self, post: Dict[str, Any]) -> None:
+        self._unlink(post["_id"])
+        self._link(post)
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if not ENABLED or self._task is not None:
+            return
+        try:
+            from backend.sanity_client import SanityClient
+            client = SanityClient()
+        except Exception as e:
+            logger.warning(f"[PostReplica] Not started, Sanity is not configured: {e}")
+            return
+        self._task = asyncio.create_task(self._run(client))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._connected = False
+        self._ready = False
+
+    async def _load(self, client) -> List[str]:
+        """Replace the store with a fresh snapshot; returns the IDs of posts
+        that changed or disappeared since the previous one."""
+        docs: List[Dict[str, Any]] = []
+        after = ""
+        while True:
+            query = (GroqQuery(*POST_FILTER, '_id > $after', after=after)
+                     .order('_id asc')
+                     .slice(0, LOAD_PAGE_SIZE)
+                     .project(POST_DETAIL))
+            batch = await client.fetch(query)
+            docs.extend(batch)
+            if len(batch) < LOAD_PAGE_SIZE:
+                break
+            after = batch[-1]["_id"]
+        # No awaits from here on: readers never see a half-built store
+        previous = {post_id: post.get("_rev") for post_id, post in self._posts.items()}
+        self._reset()
+        for doc in docs:
+            self._link(_detail(doc))
+        self._ready = True
+        self.stats["loads"] += 1
+        self.stats["last_loaded_at"] = datetime.utcnow().isoformat()
+        logger.info(f"[PostReplica] Loaded {len(docs)} posts")
+        return [post_id for post_id, rev in previous.items()
+                if post_id not in self._posts or self._posts[post_id].get("_rev") != rev]
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        doc_id = event.get("documentId") or ""
+        if doc_id.startswith("drafts."):
+            return
+        result = event.get("result")
+        if event.get("transition") == "disappear" or not result:
+            self._unlink(doc_id)
+        else:
+            self._upsert(_detail(result))
+
+        self.stats["events"] += 1
+        now = datetime.utcnow()
+        self.stats["last_event_at"] = now.isoformat()
+        try:
+            mutated_at = datetime.fromisoformat(event["timestamp"].replace("Z", "+00:00")).replace(tzinfo=None)
+        except (KeyError, AttributeError, ValueError):
+            return
+        lag_ms = round((now - mutated_at).total_seconds() * 1000, 1)
+        self.stats["last_event_lag_ms"] = lag_ms
+        self.stats["max_event_lag_ms"] = max(self.stats["max_event_lag_ms"], lag_ms)
+
+    async def _run(self, client) -> None:
+        delay = 1.0
+        while True:
+            try:
+                async for message in client.listen(LISTEN_QUERY):
+                    event, data = message["event"], message["data"]
+                    if event == "welcome":
+                        # Events that arrive while loading wait in the stream and
+                        # are applied afterwards, so nothing is missed
+                        changed = await self._load(client)
+                        self._connected = True
+                        delay = 1.0
+                        # Mutations missed while the stream was down never bumped their posts
+                        for post_id in changed:
+                            await etag_cache.bump(post_dep(post_id))
+                    elif event == "mutation":
+                        self._apply(data)
+                        # Also covers edits made outside the API, e.g. in the Studio
+                        await etag_cache.bump(post_dep(data.get("documentId") or ""))
+                    elif event in ("reconnect", "channelError", "disconnect"):
+                        logger.warning(f"[PostReplica] Listen stream ended with {event}: {data}")
+                        break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[PostReplica] Listen stream dropped: {e}")
+            if self._connected:
+                self._connected = False
+                self._disconnected_at = time.monotonic()
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    def staleness(self) -> Optional[float]:
+        """Seconds the replica may be behind Sanity: 0 while the stream is up."""
+        if not self._ready:
+            return None
+        if self._connected:
+            return 0.0
+        return time.monotonic() - self._disconnected_at
+
+    def tracks_edits(self) -> bool:
+        """True while the stream is up, so every post mutation (including
+        edits made in the Studio) bumps the post's ETag generation."""
+        return self._connected
+
+    def usable(self) -> bool:
+        staleness = self.staleness()
+        ok = staleness is not None and staleness <= MAX_STALENESS
+        self.stats["hits" if ok else "fallbacks"] += 1
+        return ok
+
+    def get(self, post_id: str) -> Any:
+        """POST_DETAIL view of one post, ``None`` if it does not exist, or ``MISSING``."""
+        if not self.usable():
+            return MISSING
+        post = self._posts.get(post_id)
+        return _view(post, DETAIL_FIELDS) if post else None
+
+    def get_many(self, post_ids: Iterable[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """FEED_CARD views keyed by ``_id``; unknown IDs are omitted."""
+        if not self.usable():
+            return None
+        return {pid: _view(self._posts[pid], CARD_FIELDS) for pid in post_ids if pid in self._posts}
+
+    def by_owner(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """OWNER_VIEW of a user's posts (approved or not), ``date`` descending."""
+        if not self.usable():
+            return None
+        posts = [self._posts[pid] for pid in self._by_owner.get(user_id, _EMPTY)]
+        posts.sort(key=lambda p: p.get("date") or "", reverse=True)
+        return [_view(post, OWNER_FIELDS) for post in posts]
+
+    def _candidates(self, post_type: Optional[str], tags: Optional[List[str]],
+                    studio: Optional[str]) -> Optional[Set[str]]:
+        selections: List[Set[str]] = []
+        if post_type:
+            selections.append(self._by_type.get(post_type, _EMPTY))
+        if tags:
+            selections.append(set().union(*(self._by_tag.get(tag, _EMPTY) for tag in tags)))
+        if studio:
+            selections.append(self._by_studio.get(studio, _EMPTY))
+        if not selections:
+            return None
+        selections.sort(key=len)
+        return set(selections[0]).intersection(*selections[1:])
+
+    def page(self, order: str, post_type: Optional[str], tags: Optional[List[str]],
+             limit: Optional[int], state: Optional[Dict[str, Any]],
+             studio: Optional[str] = None) -> Optional[Page]:
+        """Approved posts as FEED_CARD views, paginated like ``database._sanity_page``.
+
+        ``newest`` uses the same (``_createdAt``, ``_id``) keyset cursor and
+        ``trending`` the same offset cursor, so a listing can move between the
+        replica and live queries mid-way.
+        """
+        if not self.usable():
+            return None
+        candidates = self._candidates(post_type, tags, studio)
+        try:
+            if order == "newest":
+                return self._newest_page(candidates, limit, state)
+            return self._trending_page(candidates, limit, state)
+        except (KeyError, TypeError, ValueError):
+            raise InvalidCursor("Cursor does not match this listing")
+
+    def _newest_page(self, candidates: Optional[Set[str]], limit: Optional[int],
+                     state: Optional[Dict[str, Any]]) -> Page:
+        if candidates is None:
+            keys = self._by_date
+        else:
+            keys = sorted(_date_key(self._posts[pid]) for pid in candidates)
+        end = len(keys)
+        if state:
+            end = bisect.bisect_left(keys, (str(state["created_at"]), str(state["id"])))
+
+        items: List[Dict[str, Any]] = []
+        for i in range(end - 1, -1, -1):
+            post = self._posts[keys[i][1]]
+            if not _is_approved(post):
+                continue
+            if limit and len(items) == limit:
+                last = items[-1]
+                return Page(items, encode_cursor({"created_at": last["_createdAt"], "id": last["_id"]}))
+            items.append(_view(post, CARD_FIELDS))
+        return Page(items)
+
+    def _trending_page(self, candidates: Optional[Set[str]], limit: Optional[int],
+                       state: Optional[Dict[str, Any]]) -> Page:
+        offset = int((state or {}).get("offset", 0))
+        if offset < 0:
+            raise ValueError(offset)
+        pool = self._posts.values() if candidates is None else (self._posts[pid] for pid in candidates)
+        posts = sorted(
+            (post for post in pool if _is_approved(post)),
+            key=lambda p: (len(p.get("advertisingTags") or []), p.get("_createdAt") or "", p["_id"]),
+            reverse=True,
+        )
+        end = offset + limit if limit else len(posts)
+        items = [_view(post, CARD_FIELDS) for post in posts[offset:end]]
+        if limit and len(posts) > end:
+            return Page(items, encode_cursor({"offset": end}))
+        return Page(items)
+
+    def selection(self, post_type: Optional[str], tags: Optional[List[str]],
+                  studio: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+        """Every approved post in a /posts/filter selection, or None if unusable.
+
+        Returns the replica's own dicts, for counting; callers must not mutate them.
+        """
+        if not self.usable():
+            return None
+        candidates = self._candidates(post_type, tags, studio)
+        pool = self._posts.values() if candidates is None else (self._posts[pid] for pid in candidates)
+        return [post for post in pool if _is_approved(post)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        staleness = self.staleness()
+        return {
+            **self.stats,
+            "enabled": ENABLED,
+            "ready": self._ready,
+            "connected": self._connected,
+            "staleness_seconds": round(staleness, 3) if staleness is not None else None,
+            "posts": len(self._posts),
+            "tags": len(self._by_tag),
+            "studios": len(self._by_studio),
+        }
+
+
+post_replica = PostReplica()
@@ -0,0 +1,378 @@
+import os
+import io
+import csv
+import hmac
+import json
+import time
+import uuid
+import asyncio
+import socket
+import hashlib
+import logging
+import zipfile
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Set
+
+import aioboto3
+import aiosmtplib
+from botocore.exceptions import BotoCoreError, ClientError
+from redis.exceptions import RedisError
+
+from backend.config import get_settings
+from backend.redis_client import get_redis
+from backend.registrations import list_registrants
+from backend.services.user_loader import batch_get_users
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "export:"
+JOB_TTL = int(os.getenv("EXPORT_JOB_TTL", str(24 * 3600)))
+EXPORT_DIR = os.getenv("EXPORT_DIR", os.path.join("data", "exports"))
+# Registrants fetched (and profiles batch-loaded) per step
+BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "100"))
+# Exports running at once in this process; further jobs wait their turn
+CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", "2"))
+# Archives up to this size are attached to the email; larger ones are sent as a link
+ATTACH_MAX_BYTES = int(os.getenv("EXPORT_ATTACH_MAX_BYTES", str(10 * 1024 * 1024)))
+LINK_TTL = int(os.getenv("EXPORT_LINK_TTL", str(24 * 3600)))
+# Absolute base for emailed download links; without it, large exports fail
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "").rstrip("/")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Shared home for finished archives, so any worker can serve the download.
+# Expire the EXPORT_S3_PREFIX objects with a bucket lifecycle rule (> LINK_TTL).
+# Unset, archives stay on the disk of the host that built them.
+EXPORT_S3_BUCKET = os.getenv("EXPORT_S3_BUCKET", "")
+EXPORT_S3_PREFIX = os.getenv("EXPORT_S3_PREFIX", "exports/")
+EXPORT_S3_REGION = os.getenv("EXPORT_S3_REGION") or os.getenv("AWS_REGION") or None
+HOST = socket.gethostname()
+
+# Never leave the platform in an export
+PRIVATE_FIELDS = {
+    "password",
+    "reset_token",
+    "email_verification_code",
+    "email_verification_expiry",
+    "two_factor_secret",
+    "two_factor_enabled",
+}
+
+
+def _flatten(data: dict, parent_key: str = "", sep: str = "_") -> Dict[str, Any]:
+    items: Dict[str, Any] = {}
+    for k, v in (data or {}).items():
+        new_key = f"{parent_key}{sep}{k}" if parent_key else k
+        if isinstance(v, dict):
+            items.update(_flatten(v, new_key, sep=sep))
+        else:
+            items[new_key] = v
+    return items
+
+
+def _profile_row(user_id: str, profile: Optional[dict]) -> Dict[str, Any]:
+    public = {k: v for k, v in (profile or {}).items() if k not in PRIVATE_FIELDS}
+    return {"user_id": user_id, **_flatten(public)}
+
+
+def _signature(job_id: str, expires: int) -> str:
+    key = get_settings().secret_key.encode()
+    return hmac.new(key, f"{job_id}:{expires}".encode(), hashlib.sha256).hexdigest()
+
+
+def verify_download(job_id: str, expires: int, signature: str) -> bool:
+    """Check a download link produced by ``download_path``."""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_signature(job_id, expires), signature)
+
+
+class RegistrantExporter:
+    """Background "email me the registrants" jobs.
+
+    ``enqueue`` records a job and returns its ID immediately. A worker task
+    then pages through the post's registrations and batch-loads BATCH_SIZE
+    profiles at a time. Flattened rows are spooled to a JSON-lines file,
+    since the CSV header is the union of every profile's fields. A second
+    pass streams the rows into ``registrants.csv`` inside a ZIP on disk, so
+    memory stays flat however many people registered.
+
+    The archive is emailed with aiosmtplib: attached when it is small, or
+    as a signed link (valid LINK_TTL seconds) to the download endpoint
+    otherwise. Job state (status, progress, error, link) is a Redis hash, so
+    any worker can answer the status endpoint. Without Redis it is kept in
+    this process.
+
+    With EXPORT_S3_BUCKET set, the finished archive is uploaded there and
+    the job records its key; downloads redirect to a presigned URL from any
+    worker. Otherwise the job records the host that holds the file, and
+    only that host can serve it: put sticky routing in front of the download
+    endpoint or set the bucket when running more than one host.
+    """
+
+    def __init__(self):
+        self._local: Dict[str, Dict[str, str]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.stats: Dict[str, int] = {"queued": 0, "completed": 0, "failed": 0}
+
+    # ------------------------------------------------------------------
+    # Job state
+    # ------------------------------------------------------------------
+    async def _save(self, job_id: str, fields: Dict[str, Any]) -> None:
+        values = {k: "" if v is None else str(v) for k, v in fields.items()}
+        redis = get_redis()
+        if redis is not None:
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.hset(PREFIX + job_id, mapping=values)
+                    pipe.expire(PREFIX + job_id, JOB_TTL)
+                    await pipe.execute()
+                return
+            except RedisError as e:
+                logger.warning(f"[RegistrantExporter] Job {job_id} state kept locally: {e}")
+        self._local.setdefault(job_id, {}).update(values)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job: Optional[Dict[str, str]] = None
+        redis = get_redis()
+        if redis is not None:
+            try:
+                job = await redis.hgetall(PREFIX + job_id) or None
+            except RedisError as e:
+                logger.warning(f"[RegistrantExporter.get] Redis read failed: {e}")
+        job = job or self._local.get(job_id)
+        if not job:
+            return None
+        result: Dict[str, Any] = dict(job)
+        for field in ("total", "processed", "size_bytes", "created_at", "started_at", "finished_at"):
+            if result.get(field):
+                result[field] = int(result[field])
+        return result
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    async def enqueue(self, post: Dict[str, Any], owner: Dict[str, Any], requested_by: str) -> str:
+        job_id = uuid.uuid4().hex
+        post_id = post.get("_id") or post.get("post_id")
+        await self._save(job_id, {
+            "job_id": job_id,
+            "post_id": post_id,
+            "requested_by": requested_by,
+            "recipient": owner.get("email"),
+            "status": "queued",
+            "total": post.get("registrant_count") or 0,
+            "processed": 0,
+            "created_at": int(time.time()),
+        })
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(CONCURRENCY)
+        task = asyncio.create_task(self._run(job_id, post, owner))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self.stats["queued"] += 1
+        return job_id
+
+    def archive_path(self, job_id: str) -> str:
+        return os.path.join(EXPORT_DIR, f"{job_id}.zip")
+
+    def available(self, job: Dict[str, Any]) -> bool:
+        """Whether this worker can serve the job's archive."""
+        if job.get("status") != "done":
+            return False
+        if job.get("storage") == "s3":
+            return True
+        return job.get("host") == HOST and os.path.exists(self.archive_path(job["job_id"]))
+
+    async def presigned_url(self, job: Dict[str, Any]) -> str:
+        """Short-lived S3 URL for a job whose archive was uploaded."""
+        async with aioboto3.Session().client("s3", region_name=EXPORT_S3_REGION) as s3:
+            return await s3.generate_presigned_url(
+                "get_object",
+                Params={
+                    "Bucket": job["bucket"],
+                    "Key": job["archive_key"],
+                    "ResponseContentDisposition": 'attachment; filename="registrants.zip"',
+                },
+                ExpiresIn=300,
+            )
+
+    async def _store(self, job_id: str, archive: str) -> None:
+        """Upload the archive to EXPORT_S3_BUCKET, or record this host as its holder."""
+        if not EXPORT_S3_BUCKET:
+            await self._save(job_id, {"storage": "local", "host": HOST})
+            return
+        key = f"{EXPORT_S3_PREFIX}{job_id}.zip"
+        async with aioboto3.Session().client("s3", region_name=EXPORT_S3_REGION) as s3:
+            await s3.upload_file(archive, EXPORT_S3_BUCKET, key,
+                                 ExtraArgs={"ContentType": "application/zip"})
+        await self._save(job_id, {"storage": "s3", "bucket": EXPORT_S3_BUCKET, "archive_key": key})
+
+    def download_path(self, post_id: str, job_id: str) -> str:
+        expires = int(time.time()) + LINK_TTL
+        return (f"/posts/{post_id}/email-registrants/{job_id}/download"
+                f"?expires={expires}&signature={_signature(job_id, expires)}")
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # ------------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------------
+    async def _run(self, job_id: str, post: Dict[str, Any], owner: Dict[str, Any]) -> None:
+        post_id = post.get("_id") or post.get("post_id")
+        spool = os.path.join(EXPORT_DIR, f"{job_id}.jsonl")
+        archive = self.archive_path(job_id)
+        try:
+            async with self._slots:
+                await self._save(job_id, {"status": "running", "started_at": int(time.time())})
+                await asyncio.to_thread(self._sweep)
+                fieldnames, count = await self._spool(job_id, post_id, spool)
+                if not count:
+                    raise ValueError("No registrants to email")
+                await asyncio.to_thread(self._write_archive, spool, archive, fieldnames)
+                size = os.path.getsize(archive)
+                await self._store(job_id, archive)
+                await self._save(job_id, {"status": "sending", "size_bytes": size})
+                link = await self._deliver(job_id, post, owner, archive, size)
+                if EXPORT_S3_BUCKET:
+                    os.remove(archive)
+                await self._save(job_id, {
+                    "status": "done",
+                    "delivery": "link" if link else "attachment",
+                    "finished_at": int(time.time()),
+                })
+                self.stats["completed"] += 1
+                logger.info(f"[RegistrantExporter] Job {job_id}: {count} registrants for post {post_id} sent")
+        except asyncio.CancelledError:
+            await self._save(job_id, {"status": "failed", "error": "Export interrupted by shutdown"})
+            raise
+        except (BotoCoreError, ClientError) as e:
+            self.stats["failed"] += 1
+            logger.error(f"[RegistrantExporter] Job {job_id}: archive upload failed: {e}")
+            await self._save(job_id, {"status": "failed", "error": "Could not store the export",
+                                      "finished_at": int(time.time())})
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.exception(f"[RegistrantExporter] Job {job_id} failed")
+            await self._save(job_id, {"status": "failed", "error": str(e), "finished_at": int(time.time())})
+        finally:
+            if os.path.exists(spool):
+                os.remove(spool)
+
+    async def _spool(self, job_id: str, post_id: str, spool: str) -> tuple:
+        """Write one flattened row per registrant; return (sorted fieldnames, row count)."""
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        fieldnames: Set[str] = set()
+        count = 0
+        cursor = None
+        with open(spool, "w", encoding="utf-8") as out:
+            while True:
+                page = await list_registrants(post_id, limit=BATCH_SIZE, cursor=cursor)
+                user_ids = [r["user_id"] for r in page.items]
+                profiles = await batch_get_users(user_ids)
+                lines = []
+                for registration in page.items:
+                    uid = registration["user_id"]
+                    row = {**_profile_row(uid, profiles.get(uid)), "registration_status": registration.get("status")}
+                    fieldnames.update(row)
+                    lines.append(json.dumps(row, default=str))
+                if lines:
+                    await asyncio.to_thread(out.write, "\n".join(lines) + "\n")
+                count += len(user_ids)
+                await self._save(job_id, {"processed": count})
+                cursor = page.next_cursor
+                if not cursor:
+                    break
+        await self._save(job_id, {"total": count})
+        return sorted(fieldnames), count
+
+    @staticmethod
+    def _write_archive(spool: str, archive: str, fieldnames: List[str]) -> None:
+        partial = archive + ".part"
+        with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as zf:
+            with zf.open("registrants.csv", "w", force_zip64=True) as raw:
+                text = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+                writer = csv.DictWriter(text, fieldnames=fieldnames)
+                writer.writeheader()
+                with open(spool, encoding="utf-8") as rows:
+                    for line in rows:
+                        writer.writerow(json.loads(line))
+                text.flush()
+                text.detach()
+        os.replace(partial, archive)
+
+    @staticmethod
+    def _sweep() -> None:
+        """Delete archives whose download links have expired."""
+        if not os.path.isdir(EXPORT_DIR):
+            return
+        cutoff = time.time() - LINK_TTL
+        for name in os.listdir(EXPORT_DIR):
+            path = os.path.join(EXPORT_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    async def _deliver(self, job_id: str, post: Dict[str, Any], owner: Dict[str, Any],
+                       archive: str, size: int) -> Optional[str]:
+        """Email the archive; returns the download link when it was too big to attach."""
+        settings = get_settings()
+        post_id = post.get("_id") or post.get("post_id")
+        link = None
+        if size > ATTACH_MAX_BYTES:
+            if not PUBLIC_API_URL:
+                # A relative link would be useless in a mail client
+                raise ValueError("Export is too large to attach and PUBLIC_API_URL is not set for a download link")
+            link = PUBLIC_API_URL + self.download_path(post_id, job_id)
+            await self._save(job_id, {"download_url": link})
+
+        name = owner.get("display_name") or owner.get("username")
+        if link:
+            details = (f"<p>The list is too large to attach, so you can "
+                       f"<a href='{link}'>download the ZIP here</a> for the next "
+                       f"{LINK_TTL // 3600} hours. It contains an Excel-ready CSV with full details.</p>")
+        else:
+            details = "<p>The attached ZIP contains an Excel-ready CSV with full details.</p>"
+        body_html = f"""
+    <html><body>
+      <p>Hello {name},</p>
+      <p>Thanks for using Lost Gates! Here are the registrants for your event <strong>{post.get('title')}</strong>.</p>
+      {details}
+      <p>Good luck with your playtest!</p>
+      <hr>
+      <p style='font-size:12px'>Lost Gates Team</p>
+    </body></html>
+    """
+
+        msg = EmailMessage()
+        msg["Subject"] = f"Registrants for {post.get('title')}"
+        msg["From"] = settings.email_sender
+        msg["To"] = owner["email"]
+        msg.set_content(body_html, subtype="html")
+        if not link:
+            data = await asyncio.to_thread(_read_bytes, archive)
+            msg.add_attachment(data, maintype="application", subtype="zip", filename="registrants.zip")
+
+        await aiosmtplib.send(
+            msg,
+            hostname=settings.smtp_server,
+            port=settings.smtp_port,
+            start_tls=settings.smtp_use_tls,
+            # Login only if credentials provided
+            username=settings.smtp_username or None,
+            password=settings.smtp_password or None,
+            timeout=SMTP_TIMEOUT,
+        )
+        return link
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+registrant_exporter = RegistrantExporter()
@@ -0,0 +1,347 @@
+import os
+import re
+import json
+import fcntl
+import asyncio
+import logging
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from backend.redis_client import get_redis
+from backend.services.feed_index import post_id_of
+
+logger = logging.getLogger(__name__)
+
+# One file per host; every worker on the host shares it (WAL mode)
+INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join("data", "search.db"))
+# Index changes are broadcast here so every host's file follows every write
+CHANGES_CHANNEL = "search-index:changes"
+LISTEN_POLL_SECONDS = float(os.getenv("SEARCH_INDEX_LISTEN_POLL_SECONDS", "1"))
+# Fields a broadcast carries (everything ``_row`` and ``_is_approved`` read)
+_BROADCAST_FIELDS = ("_id", "post_id", "title", "description", "studio", "tags",
+                     "postType", "post_type", "is_approved")
+
+# BM25 column weights, in table column order:
+# post_id (unindexed), title, description, studio, tags, post_type (unindexed)
+BM25_WEIGHTS = (0.0, 10.0, 2.0, 5.0, 4.0, 0.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_posts (
+    rowid INTEGER PRIMARY KEY,
+    post_id TEXT NOT NULL UNIQUE
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+    post_id UNINDEXED, title, description, studio, tags, post_type UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+_WORD = re.compile(r"\w+\*?", re.UNICODE)
+
+
+def _is_approved(post: Dict[str, Any]) -> bool:
+    return post.get("is_approved", True) is True
+
+
+def match_expression(text: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 MATCH expression.
+
+    Every word must match (implicit AND). Words are quoted so FTS5 operators
+    in user input are inert. A trailing ``*`` asks for a prefix match, and the
+    last word is always a prefix so results update as the user types.
+    """
+    words = _WORD.findall(text or "")
+    if not words:
+        return None
+    terms = []
+    for i, word in enumerate(words):
+        prefix = word.endswith("*") or i == len(words) - 1
+        terms.append(f'"{word.rstrip("*")}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """Full-text index of approved posts in a local SQLite FTS5 database.
+
+    Writers (post create/approve/delete) keep it current, and
+    ``scripts/rebuild_search_index.py`` rebuilds it from the primary store.
+    Queries return post IDs ranked by BM25, weighted toward title, studio
+    and tags over description. Posts are then loaded through the usual
+    multi-get.
+
+    With Redis, every change is also published on ``CHANGES_CHANNEL`` and
+    applied by every worker, so the files on other hosts follow writes made
+    anywhere. ``start`` builds an empty index in the background (a fresh
+    host), and a listener that lost its connection, and so may have missed
+    changes, rebuilds once it is back.
+
+    SQLite calls are short and run in a worker thread so the event loop
+    never blocks on the file lock.
+    """
+
+    def __init__(self, path: str = INDEX_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._load_posts: Optional[Callable[[], AsyncIterator[Dict[str, Any]]]] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._builder: Optional[asyncio.Task] = None
+        self.stats: Dict[str, int] = {"applied": 0, "builds": 0, "build_failures": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(self._connect(), *args)
+        return await asyncio.to_thread(locked)
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _row(post: Dict[str, Any]) -> Tuple[str, ...]:
+        return (
+            post.get("title") or "",
+            post.get("description") or "",
+            post.get("studio") or "",
+            " ".join(post.get("tags") or []),
+            post.get("postType") or post.get("post_type") or "",
+        )
+
+    @staticmethod
+    def _upsert(conn: sqlite3.Connection, post_id: str, row: Tuple[str, ...]) -> None:
+        conn.execute("INSERT OR IGNORE INTO search_posts (post_id) VALUES (?)", (post_id,))
+        rowid = conn.execute("SELECT rowid FROM search_posts WHERE post_id = ?", (post_id,)).fetchone()[0]
+        conn.execute("DELETE FROM search_fts WHERE rowid = ?", (rowid,))
+        conn.execute(
+            "INSERT INTO search_fts (rowid, post_id, title, description, studio, tags, post_type) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (rowid, post_id, *row),
+        )
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, post_id: str) -> None:
+        found = conn.execute("SELECT rowid FROM search_posts WHERE post_id = ?", (post_id,)).fetchone()
+        if found:
+            conn.execute("DELETE FROM search_fts WHERE rowid = ?", (found[0],))
+            conn.execute("DELETE FROM search_posts WHERE rowid = ?", (found[0],))
+
+    async def index_post(self, post: Dict[str, Any]) -> None:
+        """Add or refresh an approved post. Unapproved posts are removed instead."""
+        post_id = post_id_of(post)
+        if not post_id:
+            return
+        if not _is_approved(post):
+            await self.remove_post(post_id)
+            return
+        await self._index_local(post_id, post)
+        await self._publish({"op": "index", "post": {k: post[k] for k in _BROADCAST_FIELDS if k in post}})
+
+    async def remove_post(self, post_id: str) -> None:
+        await self._remove_local(post_id)
+        await self._publish({"op": "remove", "post_id": post_id})
+
+    async def _index_local(self, post_id: str, post: Dict[str, Any]) -> None:
+        row = self._row(post)
+
+        def write(conn):
+            with conn:
+                self._upsert(conn, post_id, row)
+        try:
+            await self._run(write)
+        except sqlite3.Error as e:
+            logger.warning(f"[SearchIndex.index_post] Failed to index {post_id}: {e}")
+
+    async def _remove_local(self, post_id: str) -> None:
+        def write(conn):
+            with conn:
+                self._delete(conn, post_id)
+        try:
+            await self._run(write)
+        except sqlite3.Error as e:
+            logger.warning(f"[SearchIndex.remove_post] Failed to remove {post_id}: {e}")
+
+    async def rebuild(self, posts: AsyncIterator[Dict[str, Any]], batch_size: int = 500) -> int:
+        """Replace the index contents with the approved posts yielded by ``posts``.
+
+        The new contents are built inside one transaction, so searches keep
+        seeing the old index until it commits.
+        """
+        batch: List[Tuple[str, Tuple[str, ...]]] = []
+        async for post in posts:
+            post_id = post_id_of(post)
+            if post_id and _is_approved(post):
+                batch.append((post_id, self._row(post)))
+
+        def write(conn):
+            with conn:
+                conn.execute("DELETE FROM search_fts")
+                conn.execute("DELETE FROM search_posts")
+                for start in range(0, len(batch), batch_size):
+                    for post_id, row in batch[start:start + batch_size]:
+                        self._upsert(conn, post_id, row)
+            with conn:
+                conn.execute("INSERT INTO search_fts (search_fts) VALUES ('optimize')")
+        await self._run(write)
+        logger.info(f"[SearchIndex.rebuild] Indexed {len(batch)} posts")
+        return len(batch)
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+    async def search(self, text: str, post_type: Optional[str] = None, offset: int = 0,
+                     limit: int = 20) -> Tuple[List[Dict[str, Any]], bool]:
+        """Return ``([{"post_id", "score"}], has_more)``; a lower BM25 score ranks higher."""
+        expression = match_expression(text)
+        if not expression:
+            return [], False
+        sql = (
+            f"SELECT post_id, bm25(search_fts, {', '.join(map(str, BM25_WEIGHTS))}) AS score "
+            "FROM search_fts WHERE search_fts MATCH ?"
+        )
+        params: List[Any] = [expression]
+        if post_type:
+            sql += " AND post_type = ?"
+            params.append(post_type)
+        sql += " ORDER BY score LIMIT ? OFFSET ?"
+        params += [limit + 1, offset]
+
+        def read(conn):
+            return conn.execute(sql, params).fetchall()
+        rows = await self._run(read)
+        hits = [{"post_id": post_id, "score": round(score, 4)} for post_id, score in rows[:limit]]
+        return hits, len(rows) > limit
+
+    # ------------------------------------------------------------------
+    # Keeping every host's file current
+    # ------------------------------------------------------------------
+    async def _publish(self, change: Dict[str, Any]) -> None:
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.publish(CHANGES_CHANNEL, json.dumps(change, default=str))
+        except RedisError as e:
+            logger.warning(f"[SearchIndex] Change not broadcast, other hosts will miss it: {e}")
+
+    async def _apply(self, raw: str) -> None:
+        change = json.loads(raw)
+        if change.get("op") == "index":
+            post = change["post"]
+            post_id = post_id_of(post)
+            if post_id and _is_approved(post):
+                await self._index_local(post_id, post)
+        elif change.get("op") == "remove":
+            await self._remove_local(change["post_id"])
+        self.stats["applied"] += 1
+
+    def start(self, load_posts: Callable[[], AsyncIterator[Dict[str, Any]]]) -> None:
+        """Follow changes from other workers and build the index if it is empty.
+
+        ``load_posts()`` yields every approved post and must raise on read
+        errors (see ``database.iter_approved_posts``).
+        """
+        self._load_posts = load_posts
+        if get_redis() is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        self._schedule_build(only_if_empty=True)
+
+    async def stop(self) -> None:
+        for task in (self._listener, self._builder):
+            if task is not None:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        self._listener = self._builder = None
+        self.close()
+
+    def _schedule_build(self, only_if_empty: bool = False) -> None:
+        if self._load_posts is None or self._builder is not None:
+            return
+        self._builder = asyncio.create_task(self._build(only_if_empty))
+
+    async def _build(self, only_if_empty: bool) -> None:
+        try:
+            # One worker per host builds; the others skip (the file is shared)
+            lock = await asyncio.to_thread(self._try_build_lock)
+            if lock is not None:
+                try:
+                    await self._build_locked(only_if_empty)
+                finally:
+                    lock.close()
+        finally:
+            self._builder = None
+
+    async def _build_locked(self, only_if_empty: bool) -> None:
+        try:
+            if only_if_empty:
+                count = await self._run(lambda conn: conn.execute("SELECT count(*) FROM search_posts").fetchone()[0])
+                if count:
+                    return
+            await self.rebuild(self._load_posts())
+            self.stats["builds"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The previous contents (if any) stay in place
+            self.stats["build_failures"] += 1
+            logger.error(f"[SearchIndex] Background build failed: {e}")
+
+    def _try_build_lock(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        handle = open(self.path + ".build-lock", "w")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+        return handle
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(CHANGES_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                       timeout=LISTEN_POLL_SECONDS)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    try:
+                        await self._apply(message["data"])
+                    except (ValueError, KeyError, sqlite3.Error) as e:
+                        logger.warning(f"[SearchIndex] Could not apply change: {e}")
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                # Changes may have been missed meanwhile; rebuild once resubscribed
+                logger.warning(f"[SearchIndex] Change listener dropped: {e}")
+                await asyncio.sleep(1)
+                self._schedule_build()
+            finally:
+                await pubsub.aclose()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+search_index = SearchIndex()
@@ -0,0 +1,93 @@
+import asyncio
+import gzip
+import logging
+from typing import Any, AsyncIterator, Dict
+
+from backend.dynamo import AsyncTable
+from backend.utils.cache import dumps_item
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENTS = 8
+# Items buffered between the segment workers and the consumer; bounds memory
+DEFAULT_QUEUE_SIZE = 1000
+
+_SEGMENT_DONE = object()
+
+
+async def parallel_scan(
+    table_name: str,
+    total_segments: int = DEFAULT_SEGMENTS,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    **scan_kwargs: Any,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield every item of a DynamoDB table using a parallel scan.
+
+    Each of ``total_segments`` workers scans its own segment (``Segment`` /
+    ``TotalSegments``) and follows ``LastEvaluatedKey`` independently, pushing
+    items into a bounded queue. Workers block once the queue is full, so a slow
+    consumer applies backpressure instead of growing memory. Extra keyword
+    arguments (``FilterExpression``, ``ProjectionExpression``, ...) are passed to
+    every scan call.
+
+    Items arrive in no particular order. A worker failure is re-raised in the
+    consumer; closing the iterator early cancels the remaining workers.
+    """
+    table = AsyncTable(table_name)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def scan_segment(segment: int) -> None:
+        kwargs = {**scan_kwargs, "Segment": segment, "TotalSegments": total_segments}
+        try:
+            while True:
+                response = await table.scan(**kwargs)
+                for item in response.get("Items", []):
+                    await queue.put(item)
+                last_key = response.get("LastEvaluatedKey")
+                if not last_key:
+                    break
+                kwargs["ExclusiveStartKey"] = last_key
+            await queue.put(_SEGMENT_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[parallel_scan] {table_name} segment {segment} failed: {e}")
+            await queue.put(e)
+
+    workers = [asyncio.create_task(scan_segment(seg)) for seg in range(total_segments)]
+    remaining = total_segments
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is _SEGMENT_DONE:
+                remaining -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+async def export_ndjson_gz(
+    table_name: str,
+    path: str,
+    total_segments: int = DEFAULT_SEGMENTS,
+    **scan_kwargs: Any,
+) -> int:
+    """Stream a full-table parallel scan to ``path`` as gzip-compressed NDJSON.
+
+    Returns the number of items written.
+    """
+    count = 0
+    with gzip.open(path, "wt", encoding="utf-8") as out:
+        async for item in parallel_scan(table_name, total_segments, **scan_kwargs):
+            out.write(dumps_item(item))
+            out.write("\n")
+            count += 1
+            if count % 10000 == 0:
+                logger.info(f"[export_ndjson_gz] {table_name}: {count} items written")
+    logger.info(f"[export_ndjson_gz] Exported {count} items from {table_name} to {path}")
+    return count
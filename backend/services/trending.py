@@ -0,0 +1,227 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from backend.redis_client import get_redis
+from backend.services.feed_index import TRENDING_KEY
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "trending:"
+SCORES_KEY = PREFIX + "scores"        # post_id -> decayed engagement (every post with events)
+LANDMARK_KEY = PREFIX + "landmark"    # epoch seconds the stored scores are relative to
+LOCK_KEY = PREFIX + "renormalize-lock"
+SEEN_PREFIX = PREFIX + "seen:"        # seen:<post_id>:<viewer>, one counted view per window
+
+HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "48"))
+DECAY_RATE = math.log(2) / (HALF_LIFE_HOURS * 3600)
+RENORMALIZE_INTERVAL = float(os.getenv("TRENDING_RENORMALIZE_INTERVAL", "3600"))
+# Decayed engagement below this is dropped from SCORES_KEY on renormalization
+PRUNE_BELOW = float(os.getenv("TRENDING_PRUNE_BELOW", "1e-4"))
+# Repeat views of a post by the same viewer within this window count once
+VIEW_DEDUPE_SECONDS = int(os.getenv("TRENDING_VIEW_DEDUPE_SECONDS", "3600"))
+# Members rescaled per script call during renormalization
+RESCALE_BATCH = 500
+
+# A new post starts with PUBLISH weight so it can surface before any engagement
+WEIGHTS: Dict[str, float] = {
+    "publish": float(os.getenv("TRENDING_WEIGHT_PUBLISH", "10")),
+    "registration": float(os.getenv("TRENDING_WEIGHT_REGISTRATION", "5")),
+    "star": float(os.getenv("TRENDING_WEIGHT_STAR", "3")),
+    "view": float(os.getenv("TRENDING_WEIGHT_VIEW", "1")),
+}
+
+# Both scripts read the landmark and write the scores atomically, so a
+# concurrent renormalization never sees an event scaled against the wrong landmark.
+_LANDMARK_LUA = """
+local landmark = tonumber(redis.call('GET', KEYS[3]))
+if not landmark then
+  landmark = tonumber(ARGV[5])
+  redis.call('SET', KEYS[3], ARGV[5])
+end
+"""
+
+# KEYS: scores, feed trending, landmark. ARGV: post_id, weight, event_ts, rate, now
+_RECORD_LUA = _LANDMARK_LUA + """
+local value = tonumber(ARGV[2]) * math.exp(tonumber(ARGV[4]) * (tonumber(ARGV[3]) - landmark))
+redis.call('ZINCRBY', KEYS[1], value, ARGV[1])
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+  redis.call('ZINCRBY', KEYS[2], value, ARGV[1])
+end
+return tostring(value)
+"""
+
+# KEYS: one sorted set. ARGV: member, delta, member, delta, ...
+# Members removed since the snapshot (e.g. by FeedIndex.remove_post) stay removed.
+_RESCALE_LUA = """
+for i = 1, #ARGV, 2 do
+  if redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+    redis.call('ZINCRBY', KEYS[1], ARGV[i + 1], ARGV[i])
+  end
+end
+return 0
+"""
+
+# Same KEYS/ARGV as _RECORD_LUA; seeds the feed entry from the publish weight plus stored engagement
+_SEED_LUA = """
+if redis.call('ZSCORE', KEYS[2], ARGV[1]) then
+  return 0
+end
+""" + _LANDMARK_LUA + """
+local base = tonumber(ARGV[2]) * math.exp(tonumber(ARGV[4]) * (tonumber(ARGV[3]) - landmark))
+local engagement = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]) or '0')
+redis.call('ZADD', KEYS[2], base + engagement, ARGV[1])
+return 1
+"""
+
+
+class TrendingEngine:
+    """Forward-decayed engagement scores kept in Redis sorted sets.
+
+    An event of weight ``w`` at time ``t`` adds ``w * exp(rate * (t - L))``
+    for a shared landmark ``L``. Relative to "now" each contribution then
+    decays with a half-life of ``TRENDING_HALF_LIFE_HOURS``. Because the
+    factor is the same for every post, ordering the stored values is
+    ordering by decayed score. No per-read decay pass is needed:
+    ``feed:trending`` (approved posts, see FeedIndex) is read top-K with
+    ZREVRANGE.
+
+    Stored values grow as ``exp(rate * (now - L))``. ``renormalize`` moves
+    the landmark to now and rescales every score with one NumPy pass.
+    Engagement for posts that are not (yet) approved is kept in
+    ``trending:scores`` and joins the feed when the post is indexed.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._record = None
+        self._seed = None
+        self._rescale = None
+        self.stats: Dict[str, int] = {"events": 0, "renormalizations": 0, "pruned": 0, "repeat_views": 0}
+
+    def _scripts(self, redis):
+        if self._record is None:
+            self._record = redis.register_script(_RECORD_LUA)
+            self._seed = redis.register_script(_SEED_LUA)
+            self._rescale = redis.register_script(_RESCALE_LUA)
+        return self._record, self._seed
+
+    async def record(self, post_id: str, event: str, at: Optional[float] = None) -> None:
+        """Add one engagement event (``registration``, ``view``, ``star``)."""
+        redis = get_redis()
+        if redis is None or not post_id:
+            return
+        now = time.time()
+        record, _ = self._scripts(redis)
+        try:
+            await record(
+                keys=[SCORES_KEY, TRENDING_KEY, LANDMARK_KEY],
+                args=[post_id, WEIGHTS[event], at or now, DECAY_RATE, now],
+            )
+            self.stats["events"] += 1
+        except RedisError as e:
+            logger.warning(f"[TrendingEngine.record] Dropped {event} for {post_id}: {e}")
+
+    async def record_view(self, post_id: str, viewer: str) -> None:
+        """Count a view, at most once per ``viewer`` (user ID or client address) per window."""
+        redis = get_redis()
+        if redis is None or not post_id:
+            return
+        try:
+            first = await redis.set(f"{SEEN_PREFIX}{post_id}:{viewer}", "1", nx=True, ex=VIEW_DEDUPE_SECONDS)
+        except RedisError as e:
+            logger.warning(f"[TrendingEngine.record_view] Dropped view for {post_id}: {e}")
+            return
+        if not first:
+            self.stats["repeat_views"] += 1
+            return
+        await self.record(post_id, "view")
+
+    async def seed(self, post_id: str, published_at: float) -> None:
+        """Put a newly indexed post into ``feed:trending`` (no-op if already there)."""
+        redis = get_redis()
+        if redis is None:
+            return
+        _, seed = self._scripts(redis)
+        try:
+            await seed(
+                keys=[SCORES_KEY, TRENDING_KEY, LANDMARK_KEY],
+                args=[post_id, WEIGHTS["publish"], published_at or time.time(), DECAY_RATE, time.time()],
+            )
+        except RedisError as e:
+            logger.warning(f"[TrendingEngine.seed] Failed to seed {post_id}: {e}")
+
+    async def renormalize(self) -> Optional[int]:
+        """Move the landmark to now and rescale every stored score.
+
+        The landmark switch and the snapshot happen in one MULTI, and the
+        rescale is applied as ZINCRBY deltas. Events recorded meanwhile are
+        already relative to the new landmark and are kept exactly. The
+        deltas go through a script that skips members no longer in the set,
+        so a post removed from the feed meanwhile is not re-added.
+        """
+        redis = get_redis()
+        if redis is None:
+            return None
+        now = time.time()
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.get(LANDMARK_KEY)
+            pipe.set(LANDMARK_KEY, now)
+            pipe.zrange(SCORES_KEY, 0, -1, withscores=True)
+            pipe.zrange(TRENDING_KEY, 0, -1, withscores=True)
+            landmark, _, engagement, feed = await pipe.execute()
+        if landmark is None:
+            return 0
+
+        factor = math.exp(-DECAY_RATE * (now - float(landmark)))
+        self._scripts(redis)
+        count = 0
+        for key, entries in ((SCORES_KEY, engagement), (TRENDING_KEY, feed)):
+            if not entries:
+                continue
+            members = [member for member, _ in entries]
+            deltas = np.fromiter((score for _, score in entries), dtype=np.float64, count=len(entries))
+            deltas *= factor - 1.0
+            pairs = [value for pair in zip(members, deltas.tolist()) for value in pair]
+            async with redis.pipeline(transaction=False) as pipe:
+                for start in range(0, len(pairs), 2 * RESCALE_BATCH):
+                    await self._rescale(keys=[key], args=pairs[start:start + 2 * RESCALE_BATCH], client=pipe)
+                await pipe.execute()
+            count += len(members)
+        self.stats["pruned"] += await redis.zremrangebyscore(SCORES_KEY, "-inf", PRUNE_BELOW)
+        self.stats["renormalizations"] += 1
+        logger.info(f"[TrendingEngine.renormalize] Rescaled {count} scores by {factor:.3e}")
+        return count
+
+    # ------------------------------------------------------------------
+    # Periodic renormalization (one worker at a time)
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        if get_redis() is not None and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(RENORMALIZE_INTERVAL)
+            try:
+                if await get_redis().set(LOCK_KEY, "1", nx=True, ex=int(RENORMALIZE_INTERVAL / 2) or 1):
+                    await self.renormalize()
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                logger.warning(f"[TrendingEngine] Renormalization skipped: {e}")
+
+
+trending = TrendingEngine()
@@ -0,0 +1,219 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from redis.exceptions import RedisError
+
+from backend.redis_client import get_redis
+from backend.services.etag_cache import etag_cache, user_dep
+from backend.utils.cache import MISSING, TTLCache, dumps_item, loads_item
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TTL = float(os.getenv("USER_CACHE_LOCAL_TTL", "30"))
+LOCAL_MAXSIZE = int(os.getenv("USER_CACHE_LOCAL_MAXSIZE", "10000"))
+REDIS_TTL = int(os.getenv("USER_CACHE_REDIS_TTL", "300"))
+
+KEY_PREFIX = "user:"
+FENCE_PREFIX = "user-cache:fence:"
+# Other workers drop their local copy when a user_id is published here
+INVALIDATION_CHANNEL = "user-cache:invalidate"
+# After an invalidation, read-through fills for that user are skipped this
+# long, so a read that started before the write cannot re-cache the old item.
+# Must exceed the longest DynamoDB read (requests are cut off at REQUEST_DEADLINE).
+FENCE_TTL = int(os.getenv("USER_CACHE_FENCE_TTL", "15"))
+# How long the listener waits for a message before polling again
+LISTEN_POLL_SECONDS = float(os.getenv("USER_CACHE_LISTEN_POLL_SECONDS", "1"))
+
+# Credentials never enter either tier; code that checks them reads DynamoDB
+SECRET_FIELDS = frozenset({"password", "reset_token", "two_factor_secret", "email_verification_code"})
+
+# KEYS: entry, fence. ARGV: raw item, ttl. Fills the entry unless it is fenced.
+_FILL_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+"""
+
+
+def without_secrets(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: value for field, value in item.items() if field not in SECRET_FIELDS}
+
+
+class UserCache:
+    """Two-tier read-through cache for Users items keyed by ``user_id``.
+
+    Tier 1 is a per-process LRU with a short TTL; tier 2 is the shared Redis
+    used by the rate limiter. Entries are stored as JSON and decoded on every
+    read, so callers always get their own copy and may mutate it freely.
+    Writers call ``invalidate`` after updating DynamoDB; the invalidation is
+    broadcast so every worker drops its local entry too.
+
+    ``invalidate`` also fences the user for FENCE_TTL seconds, in Redis and
+    locally. ``set``/``set_many`` are read-through fills and skip fenced
+    users, since their item may have been read before the write landed.
+    Fields in SECRET_FIELDS are dropped before an item is stored.
+    """
+
+    def __init__(self):
+        self._local = TTLCache(LOCAL_MAXSIZE, LOCAL_TTL)
+        self._fences = TTLCache(LOCAL_MAXSIZE, FENCE_TTL)
+        self._listener: Optional[asyncio.Task] = None
+        self._fill = None
+        self.stats: Dict[str, int] = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+            "fenced_fills": 0,
+        }
+
+    def _script(self, redis):
+        if self._fill is None:
+            self._fill = redis.register_script(_FILL_LUA)
+        return self._fill
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._local.get(user_id)
+        if raw is not MISSING:
+            self.stats["local_hits"] += 1
+            return loads_item(raw)
+
+        redis = get_redis()
+        if redis is not None:
+            try:
+                raw = await redis.get(KEY_PREFIX + user_id)
+            except RedisError as e:
+                logger.warning(f"[UserCache.get] Redis unavailable: {e}")
+                raw = None
+            if raw is not None:
+                self.stats["redis_hits"] += 1
+                self._local.set(user_id, raw)
+                return loads_item(raw)
+
+        self.stats["misses"] += 1
+        return None
+
+    async def get_many(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Return the cached subset of ``user_ids`` (one MGET for the Redis tier)."""
+        found: Dict[str, Dict[str, Any]] = {}
+        remote: List[str] = []
+        for user_id in user_ids:
+            raw = self._local.get(user_id)
+            if raw is MISSING:
+                remote.append(user_id)
+            else:
+                self.stats["local_hits"] += 1
+                found[user_id] = loads_item(raw)
+
+        redis = get_redis()
+        if remote and redis is not None:
+            try:
+                raws = await redis.mget([KEY_PREFIX + uid for uid in remote])
+            except RedisError as e:
+                logger.warning(f"[UserCache.get_many] Redis unavailable: {e}")
+                raws = [None] * len(remote)
+            for user_id, raw in zip(remote, raws):
+                if raw is not None:
+                    self.stats["redis_hits"] += 1
+                    self._local.set(user_id, raw)
+                    found[user_id] = loads_item(raw)
+
+        self.stats["misses"] += len(user_ids) - len(found)
+        return found
+
+    async def set_many(self, items: Dict[str, Dict[str, Any]]) -> None:
+        raws = {}
+        for user_id, item in items.items():
+            if self._fences.get(user_id) is MISSING:
+                raws[user_id] = dumps_item(without_secrets(item))
+            else:
+                self.stats["fenced_fills"] += 1
+        if not raws:
+            return
+        for user_id, raw in raws.items():
+            self._local.set(user_id, raw)
+        redis = get_redis()
+        if redis is not None:
+            fill = self._script(redis)
+            try:
+                async with redis.pipeline(transaction=False) as pipe:
+                    for user_id, raw in raws.items():
+                        await fill(keys=[KEY_PREFIX + user_id, FENCE_PREFIX + user_id],
+                                   args=[raw, REDIS_TTL], client=pipe)
+                    await pipe.execute()
+            except RedisError as e:
+                logger.warning(f"[UserCache.set_many] Redis unavailable: {e}")
+
+    async def set(self, user_id: str, item: Dict[str, Any]) -> None:
+        await self.set_many({user_id: item})
+
+    def _drop(self, user_id: str) -> None:
+        self._local.pop(user_id)
+        self._fences.set(user_id, True)
+
+    async def invalidate(self, user_id: str) -> None:
+        self.stats["invalidations"] += 1
+        self._drop(user_id)
+        redis = get_redis()
+        if redis is not None:
+            try:
+                async with redis.pipeline(transaction=True) as pipe:
+                    pipe.set(FENCE_PREFIX + user_id, "1", ex=FENCE_TTL)
+                    pipe.delete(KEY_PREFIX + user_id)
+                    await pipe.execute()
+                await redis.publish(INVALIDATION_CHANNEL, user_id)
+            except RedisError as e:
+                logger.warning(f"[UserCache.invalidate] Redis unavailable: {e}")
+        await etag_cache.bump(user_dep(user_id))
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["local_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "lookups": lookups,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "local_entries": len(self._local),
+        }
+
+    # ------------------------------------------------------------------
+    # Cross-worker invalidation
+    # ------------------------------------------------------------------
+    def start_listener(self) -> None:
+        if get_redis() is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop_listener(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                while True:
+                    # Polling with a timeout below the client's socket_timeout,
+                    # so a quiet channel is not mistaken for a dropped connection
+                    message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                                       timeout=LISTEN_POLL_SECONDS)
+                    if message is not None and message.get("type") == "message":
+                        self._drop(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                # Local entries may now outlive a write; flush them and resubscribe
+                logger.warning(f"[UserCache] Invalidation listener dropped: {e}")
+                self._local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+user_cache = UserCache()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from botocore.exceptions import ClientError
+
+from backend.dynamo import batch_get
+from backend.services.user_cache import user_cache, without_secrets
+
+logger = logging.getLogger(__name__)
+
+
+async def batch_get_users(user_ids: Iterable[str]) -> Dict[str, dict]:
+    """Fetch many users at once: cache tiers first, then BatchGetItem for the rest.
+
+    Returns a ``user_id -> item`` mapping; unknown IDs are omitted.
+    """
+    wanted = list(dict.fromkeys(uid for uid in user_ids if uid))
+    if not wanted:
+        return {}
+    found = await user_cache.get_many(wanted)
+    missing = [uid for uid in wanted if uid not in found]
+    if missing:
+        fetched = {
+            item["user_id"]: item
+            for item in await batch_get("Users", [{"user_id": uid} for uid in missing])
+        }
+        await user_cache.set_many(fetched)
+        found.update((user_id, without_secrets(item)) for user_id, item in fetched.items())
+    return found
+
+
+class UserLoader:
+    """Request-scoped data loader for users.
+
+    ``load`` calls issued in the same event-loop tick (typically via
+    ``asyncio.gather`` or ``load_many``) are coalesced into one
+    ``batch_get_users`` call, and every ID is fetched at most once per loader.
+    Obtain one per request with ``Depends(get_user_loader)``.
+    """
+
+    def __init__(self):
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._dispatch_task: Optional[asyncio.Task] = None
+
+    async def load(self, user_id: str) -> Optional[dict]:
+        if not user_id:
+            return None
+        future = self._futures.get(user_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[user_id] = future
+            self._pending.append(user_id)
+            if self._dispatch_task is None:
+                # The task's first step runs after loads already queued in this tick
+                self._dispatch_task = asyncio.get_running_loop().create_task(self._dispatch())
+        return await future
+
+    async def load_many(self, user_ids: Iterable[str]) -> List[Optional[dict]]:
+        """Load users in input order; unknown IDs yield None."""
+        return list(await asyncio.gather(*(self.load(uid) for uid in user_ids)))
+
+    async def _dispatch(self) -> None:
+        batch, self._pending = self._pending, []
+        self._dispatch_task = None
+        try:
+            users = await batch_get_users(batch)
+        except ClientError as e:
+            logger.error(f"[UserLoader] Batch load of {len(batch)} users failed: {e}")
+            users = {}
+        except Exception as e:
+            for user_id in batch:
+                self._futures[user_id].set_exception(e)
+            return
+        for user_id in batch:
+            self._futures[user_id].set_result(users.get(user_id))
+
+
+def get_user_loader() -> UserLoader:
+    """FastAPI dependency: a fresh loader for each request."""
+    return UserLoader()
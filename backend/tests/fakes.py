@@ -0,0 +1,259 @@
+"""In-memory stand-ins for the Sanity and DynamoDB calls made by ``backend.registrations``.
+
+They implement just enough of each API to exercise the registration engine
+under real interleavings: every call awaits a short random delay, Sanity
+transactions apply atomically with ``ifRevisionID`` guards and fail on an
+existing ``_id``, and DynamoDB transactions evaluate the condition
+expressions the engine uses and cancel with ``TransactionConflict`` when
+another transaction holds one of their items.
+"""
+import asyncio
+import copy
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from backend.sanity_client import SanityConflictError
+
+
+async def _latency() -> None:
+    await asyncio.sleep(random.uniform(0.001, 0.004))
+
+
+def _value(condition) -> Any:
+    """Right-hand side of a ``Key(...).eq(v)`` / ``Attr(...).eq(v)`` condition."""
+    return condition.get_expression()["values"][1]
+
+
+# ---------------------------------------------------------------------
+# Sanity
+# ---------------------------------------------------------------------
+
+class FakeSanityTransaction:
+    def __init__(self, client: "FakeSanity"):
+        self._client = client
+        self._mutations: List[Tuple[str, Any]] = []
+
+    def create(self, doc_type: str, data: dict) -> "FakeSanityTransaction":
+        self._mutations.append(("create", {"_type": doc_type, **data}))
+        return self
+
+    def patch(self, doc_id: str, set: Optional[dict] = None, unset: Optional[List[str]] = None,
+              inc: Optional[dict] = None, set_if_missing: Optional[dict] = None,
+              if_revision_id: Optional[str] = None) -> "FakeSanityTransaction":
+        self._mutations.append(("patch", (doc_id, set, inc, set_if_missing, if_revision_id)))
+        return self
+
+    def delete(self, doc_id: str) -> "FakeSanityTransaction":
+        self._mutations.append(("delete", doc_id))
+        return self
+
+    async def __aenter__(self) -> "FakeSanityTransaction":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            await _latency()
+            self._client.apply(self._mutations)
+
+
+class FakeSanity:
+    def __init__(self):
+        self.docs: Dict[str, dict] = {}
+        self._rev = 0
+
+    def _next_rev(self) -> str:
+        self._rev += 1
+        return str(self._rev)
+
+    def add_post(self, post_id: str, **fields: Any) -> None:
+        self.docs[post_id] = {"_id": post_id, "_type": "post", "_rev": self._next_rev(), **fields}
+
+    def apply(self, mutations: List[Tuple[str, Any]]) -> None:
+        staged = copy.deepcopy(self.docs)
+        for kind, arg in mutations:
+            if kind == "create":
+                if arg["_id"] in staged:
+                    raise SanityConflictError(f"Document {arg['_id']} already exists")
+                staged[arg["_id"]] = {**arg, "_rev": self._next_rev()}
+            elif kind == "delete":
+                staged.pop(arg, None)
+            else:
+                doc_id, set_, inc, set_if_missing, if_revision_id = arg
+                doc = staged[doc_id]
+                if if_revision_id and doc["_rev"] != if_revision_id:
+                    raise SanityConflictError(f"Document {doc_id} has revision {doc['_rev']}")
+                for field, value in (set_if_missing or {}).items():
+                    doc.setdefault(field, value)
+                doc.update(set_ or {})
+                for field, value in (inc or {}).items():
+                    doc[field] = doc.get(field, 0) + value
+                doc["_rev"] = self._next_rev()
+        self.docs = staged
+
+    def transaction(self) -> FakeSanityTransaction:
+        return FakeSanityTransaction(self)
+
+    async def get_document(self, doc_id: str, projection: Optional[str] = None, use_cdn: bool = False) -> Any:
+        await _latency()
+        doc = self.docs.get(doc_id)
+        if doc is None:
+            return None
+        # The projections used here coalesce the counters and the status
+        return {"registrant_count": 0, "status": "confirmed", **doc}
+
+    async def fetch(self, query, use_cdn: bool = False) -> Any:
+        await _latency()
+        _, params = query.build()
+        if "ids" in params:
+            return [doc_id for doc_id in params["ids"] if doc_id in self.docs]
+        registrations = [doc for doc in self.docs.values()
+                         if doc["_type"] == "registration" and doc["postId"] == params["postId"]]
+        if "status" in params:
+            waiting = sorted((doc for doc in registrations if doc["status"] == params["status"]),
+                             key=lambda doc: doc["registeredAt"])
+            return dict(waiting[0]) if waiting else None
+        registrations.sort(key=lambda doc: doc["userId"])
+        return [{"postId": doc["postId"], "userId": doc["userId"], "name": doc.get("name"),
+                 "email": doc.get("email"), "registeredAt": doc["registeredAt"],
+                 "status": doc.get("status", "confirmed")} for doc in registrations]
+
+
+# ---------------------------------------------------------------------
+# DynamoDB
+# ---------------------------------------------------------------------
+
+def _cancelled(reasons: List[dict]) -> ClientError:
+    return ClientError({"Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"},
+                        "CancellationReasons": reasons}, "TransactWriteItems")
+
+
+class FakeDynamo:
+    """Posts and Registrations tables plus ``client()`` / ``call()`` as used by the engine."""
+
+    def __init__(self):
+        self.items: Dict[str, Dict[tuple, dict]] = {"Posts": {}, "Registrations": {}}
+        self._in_flight: set = set()
+        self.stats = {"transactions": 0, "conflicts": 0}
+
+    @staticmethod
+    def _key(item: Dict[str, Any]) -> tuple:
+        return tuple(sorted((k, item[k]) for k in ("post_id", "user_id") if k in item))
+
+    def add_post(self, post_id: str, **fields: Any) -> None:
+        self.items["Posts"][(("post_id", post_id),)] = {"post_id": post_id, **fields}
+
+    def post(self, post_id: str) -> dict:
+        return self.items["Posts"][(("post_id", post_id),)]
+
+    def table(self, name: str) -> "FakeTable":
+        return FakeTable(self, name)
+
+    async def client(self) -> "FakeDynamo":
+        return self
+
+    async def call(self, op, **kwargs):
+        return await op()
+
+    @staticmethod
+    def _passes(condition: Optional[str], item: Optional[dict], values: Dict[str, Any]) -> bool:
+        from backend.registrations import _HAS_SEAT
+
+        if condition is None:
+            return True
+        if condition == "attribute_not_exists(user_id)":
+            return item is None
+        if item is None:
+            return False
+        if condition == _HAS_SEAT:
+            return ("capacity" not in item or "registrant_count" not in item
+                    or item["registrant_count"] < item["capacity"])
+        checks = {
+            "attribute_exists(post_id)": lambda: True,
+            "capacity = :capacity": lambda: item.get("capacity") == values[":capacity"],
+            "registrant_count = :taken": lambda: item.get("registrant_count") == values[":taken"],
+            "attribute_not_exists(registrant_count)": lambda: "registrant_count" not in item,
+            "#s = :status": lambda: item.get("status") == values[":status"],
+            "attribute_not_exists(#s)": lambda: "status" not in item,
+            "#s = :waitlisted": lambda: item.get("status") == values[":waitlisted"],
+        }
+        return all(checks[part]() for part in condition.split(" AND "))
+
+    @staticmethod
+    def _update(item: dict, expression: str, values: Dict[str, Any]) -> None:
+        action, _, assignments = expression.partition(" ")
+        for assignment in assignments.split(", "):
+            if action == "ADD":
+                field, placeholder = assignment.split(" ")
+                item[field] = item.get(field, 0) + values[placeholder]
+            else:
+                field, placeholder = assignment.split(" = ")
+                item["status" if field == "#s" else field] = values[placeholder]
+
+    async def transact_write_items(self, ClientRequestToken: str, TransactItems: List[dict]) -> dict:
+        ops = []
+        for entry in TransactItems:
+            (kind, body), = entry.items()
+            key = (body["TableName"], self._key(body.get("Key") or body["Item"]))
+            ops.append((kind, body, key))
+        await _latency()
+        if any(key in self._in_flight for _, _, key in ops):
+            self.stats["conflicts"] += 1
+            raise _cancelled([{"Code": "TransactionConflict" if key in self._in_flight else "None"}
+                              for _, _, key in ops])
+        self._in_flight.update(key for _, _, key in ops)
+        try:
+            await _latency()
+            reasons = []
+            for kind, body, (table, key) in ops:
+                item = self.items[table].get(key)
+                if self._passes(body.get("ConditionExpression"), item, body.get("ExpressionAttributeValues", {})):
+                    reasons.append({"Code": "None"})
+                    continue
+                reason = {"Code": "ConditionalCheckFailed"}
+                if item is not None and body.get("ReturnValuesOnConditionCheckFailure") == "ALL_OLD":
+                    reason["Item"] = dict(item)
+                reasons.append(reason)
+            if any(r["Code"] != "None" for r in reasons):
+                raise _cancelled(reasons)
+            for kind, body, (table, key) in ops:
+                if kind == "Put":
+                    self.items[table][key] = dict(body["Item"])
+                elif kind == "Delete":
+                    del self.items[table][key]
+                else:
+                    item = self.items[table].setdefault(key, dict(body["Key"]))
+                    self._update(item, body["UpdateExpression"], body["ExpressionAttributeValues"])
+            self.stats["transactions"] += 1
+            return {}
+        finally:
+            self._in_flight.difference_update(key for _, _, key in ops)
+
+
+class FakeTable:
+    def __init__(self, db: FakeDynamo, name: str):
+        self._db = db
+        self.name = name
+
+    async def get_item(self, Key: Dict[str, Any], **kwargs) -> dict:
+        await _latency()
+        item = self._db.items[self.name].get(self._db._key(Key))
+        return {"Item": dict(item)} if item else {}
+
+    async def query(self, KeyConditionExpression, FilterExpression=None, ExclusiveStartKey=None,
+                    Limit: Optional[int] = None, **kwargs) -> dict:
+        await _latency()
+        post_id = _value(KeyConditionExpression)
+        items = sorted((dict(item) for item in self._db.items[self.name].values() if item["post_id"] == post_id),
+                       key=lambda item: item["user_id"])
+        if ExclusiveStartKey:
+            items = [item for item in items if item["user_id"] > ExclusiveStartKey["user_id"]]
+        response: Dict[str, Any] = {}
+        if Limit and len(items) > Limit:
+            items = items[:Limit]
+            response["LastEvaluatedKey"] = {"post_id": post_id, "user_id": items[-1]["user_id"]}
+        if FilterExpression is not None:
+            items = [item for item in items if item.get("status") == _value(FilterExpression)]
+        response["Items"] = items
+        return response
@@ -0,0 +1,150 @@
+"""Hundreds of concurrent sign-ups for one post, against both registration backends.
+
+Several copies of ``backend.registrations`` are loaded to stand in for
+separate workers: each has its own per-post locks and group-commit queues, so
+their transactions genuinely race and only the optimistic checks keep the
+seat count right.
+"""
+import asyncio
+import importlib.util
+import random
+from collections import Counter
+
+import pytest
+
+import backend.registrations
+from backend.tests.fakes import FakeDynamo, FakeSanity
+
+WORKERS = 4
+USERS = 300
+DUPLICATES = 20
+CANCEL_CONFIRMED = 30
+CANCEL_WAITLISTED = 10
+POST_ID = "post-1"
+
+
+def _workers(store):
+    workers = []
+    for i in range(WORKERS):
+        spec = importlib.util.spec_from_file_location(f"registrations_worker_{i}", backend.registrations.__file__)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        if isinstance(store, FakeSanity):
+            module._sanity_client = store
+        else:
+            module._sanity_client = None
+            module.posts_table = store.table("Posts")
+            module.registrations_table = store.table("Registrations")
+            module.dynamo = store
+            module.dynamo_dependency = store
+        # Small batches mean many rounds of racing commits; four workers on one
+        # event loop also conflict far more often than real ones
+        module.BATCH_MAX = 10
+        module.MAX_ATTEMPTS = 50
+        workers.append(module)
+    return workers
+
+
+def _store(backend_name, capacity):
+    store = FakeSanity() if backend_name == "sanity" else FakeDynamo()
+    fields = {"registrant_count": 0}
+    if capacity is not None:
+        fields["capacity"] = capacity
+    store.add_post(POST_ID, **fields)
+    return store
+
+
+def _counters(store):
+    post = store.docs[POST_ID] if isinstance(store, FakeSanity) else store.post(POST_ID)
+    return post.get("registrant_count", 0), post.get("waitlist_count", 0)
+
+
+async def _check(worker, store, capacity, total):
+    registrations = (await worker.list_registrants(POST_ID)).items
+    user_ids = [r["user_id"] for r in registrations]
+    assert len(user_ids) == len(set(user_ids)), "a user is registered twice"
+    statuses = Counter(r["status"] for r in registrations)
+    assert statuses["confirmed"] + statuses["waitlisted"] == total
+    assert statuses["confirmed"] == (total if capacity is None else min(capacity, total))
+    assert _counters(store) == (statuses["confirmed"], statuses["waitlisted"]), "counters disagree with records"
+    return registrations
+
+
+async def _sign_up(workers, user_ids):
+    jobs = [(user_id, i % WORKERS) for i, user_id in enumerate(user_ids)]
+    random.shuffle(jobs)
+    outcomes = Counter()
+
+    async def sign_up(user_id, worker):
+        try:
+            outcomes[await workers[worker].register(POST_ID, user_id, name=user_id)] += 1
+        except Exception as e:
+            outcomes[type(e).__name__] += 1
+
+    await asyncio.gather(*(sign_up(user_id, worker) for user_id, worker in jobs))
+    return outcomes
+
+
+@pytest.mark.parametrize("capacity", [95, None])
+@pytest.mark.parametrize("backend_name", ["sanity", "dynamo"])
+def test_concurrent_sign_ups(backend_name, capacity):
+    store = _store(backend_name, capacity)
+    workers = _workers(store)
+
+    async def scenario():
+        user_ids = [f"user-{i:04d}" for i in range(USERS)]
+        outcomes = await _sign_up(workers, user_ids + user_ids[:DUPLICATES])
+        seats = USERS if capacity is None else min(capacity, USERS)
+        assert outcomes == Counter(confirmed=seats, waitlisted=USERS - seats, AlreadyRegistered=DUPLICATES)
+        registrations = await _check(workers[0], store, capacity, USERS)
+
+        # A second sign-up after the burst is still rejected
+        with pytest.raises(workers[1].AlreadyRegistered):
+            await workers[1].register(POST_ID, user_ids[0])
+
+        confirmed = [r["user_id"] for r in registrations if r["status"] == "confirmed"][:CANCEL_CONFIRMED]
+        waitlisted = sorted((r for r in registrations if r["status"] == "waitlisted"),
+                            key=lambda r: r["registered_at"])
+        cancelled = confirmed + [r["user_id"] for r in waitlisted[-CANCEL_WAITLISTED:]]
+        results = await asyncio.gather(*(workers[i % WORKERS].unregister(POST_ID, user_id)
+                                         for i, user_id in enumerate(cancelled)))
+        assert all(results)
+        registrations = await _check(workers[0], store, capacity, USERS - len(cancelled))
+
+        if waitlisted:
+            # Freed seats went to the head of the waitlist, oldest first
+            promoted = {r["user_id"] for r in waitlisted[:CANCEL_CONFIRMED]}
+            now_confirmed = {r["user_id"] for r in registrations if r["status"] == "confirmed"}
+            assert promoted <= now_confirmed
+
+        assert not await workers[2].unregister(POST_ID, confirmed[0])
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("backend_name", ["sanity", "dynamo"])
+def test_cancelled_waiters_do_not_fail_their_batch(backend_name):
+    store = _store(backend_name, 20)
+    worker = _workers(store)[0]
+
+    async def scenario():
+        user_ids = [f"user-{i:04d}" for i in range(40)]
+        tasks = {user_id: asyncio.create_task(worker.register(POST_ID, user_id)) for user_id in user_ids}
+        # Let the first batch reach the backend, then drop every third client
+        await asyncio.sleep(0.002)
+        gone = set(user_ids[::3])
+        for user_id in gone:
+            tasks[user_id].cancel()
+        results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        outcomes = dict(zip(tasks, results))
+        assert all(outcomes[user_id] in ("confirmed", "waitlisted") for user_id in user_ids if user_id not in gone)
+        registrations = (await worker.list_registrants(POST_ID)).items
+        registered = {r["user_id"] for r in registrations}
+        # Cancelled requests may or may not have committed; everyone else did
+        assert registered >= set(user_ids) - gone
+        statuses = Counter(r["status"] for r in registrations)
+        assert statuses["confirmed"] == min(20, len(registrations))
+        assert _counters(store) == (statuses["confirmed"], statuses["waitlisted"])
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+import json
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Hashable, Optional
+
+MISSING = object()
+
+
+def json_default(value: Any) -> Any:
+    """``json.dumps`` fallback for DynamoDB item values."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_item(item: Any) -> str:
+    return json.dumps(item, default=json_default, separators=(",", ":"))
+
+
+def loads_item(raw: str) -> Any:
+    """Inverse of ``dumps_item``. Floats come back as Decimal so the item can be
+    written back to DynamoDB unchanged."""
+    return json.loads(raw, parse_float=Decimal)
+
+
+class TTLCache:
+    """Small in-process LRU with a per-entry time-to-live.
+
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,334 @@
+"""Retries, circuit breakers, hedged reads and request deadlines for outbound calls.
+
+Each external dependency (Sanity, DynamoDB) owns one ``Dependency``, and
+every network call to it goes through ``Dependency.call``::
+
+    resp = await sanity_dependency.call(lambda: http.get(url), hedge=True)
+
+``call`` fails fast with ``DependencyUnavailable`` (HTTP 503) when the
+circuit is open, the retry budget is spent or the request deadline has
+passed, instead of letting callers queue behind timeouts.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_ATTEMPTS = int(os.getenv("RESILIENCE_MAX_ATTEMPTS", "3"))
+BACKOFF_BASE = float(os.getenv("RESILIENCE_BACKOFF_BASE", "0.05"))
+BACKOFF_CAP = float(os.getenv("RESILIENCE_BACKOFF_CAP", "1.0"))
+# Each success earns RATIO of a retry token, up to MAX tokens; each retry or hedge spends one
+RETRY_BUDGET_RATIO = float(os.getenv("RESILIENCE_RETRY_BUDGET_RATIO", "0.1"))
+RETRY_BUDGET_MAX = float(os.getenv("RESILIENCE_RETRY_BUDGET_MAX", "10"))
+# Consecutive failures that open a breaker, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("RESILIENCE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("RESILIENCE_BREAKER_RESET_TIMEOUT", "10"))
+# Hedged reads fire a duplicate once the first attempt is slower than this quantile
+HEDGE_ENABLED = os.getenv("RESILIENCE_HEDGE", "true").lower() in ("1", "true", "yes")
+HEDGE_QUANTILE = float(os.getenv("RESILIENCE_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("RESILIENCE_HEDGE_MIN_SAMPLES", "50"))
+LATENCY_WINDOW = int(os.getenv("RESILIENCE_LATENCY_WINDOW", "200"))
+
+
+class DependencyUnavailable(RuntimeError):
+    """A dependency could not answer in time; surfaced to clients as 503."""
+
+    def __init__(self, dependency: str, reason: str, retry_after: Optional[float] = None):
+        super().__init__(f"{dependency} unavailable: {reason}")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ---------------------------------------------------------------------
+# Deadlines
+# ---------------------------------------------------------------------
+
+class _Deadline:
+    __slots__ = ("at",)
+
+    def __init__(self, at: Optional[float]):
+        self.at = at
+
+
+_deadline: ContextVar[Optional[_Deadline]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[None]:
+    """Bound every dependency call in this context to ``seconds`` from now.
+
+    Nested scopes can only shorten the outer deadline. When the scope exits
+    the deadline is cleared, so work that outlives it (background tasks
+    started by the request) is not cut short.
+    """
+    at = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None and outer.at is not None:
+        at = min(at, outer.at)
+    scope = _Deadline(at)
+    token = _deadline.set(scope)
+    try:
+        yield
+    finally:
+        scope.at = None
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None without one."""
+    scope = _deadline.get()
+    if scope is None or scope.at is None:
+        return None
+    return max(0.0, scope.at - time.monotonic())
+
+
+def clamp_timeout(seconds: float) -> float:
+    left = remaining()
+    return seconds if left is None else max(0.001, min(seconds, left))
+
+
+# ---------------------------------------------------------------------
+# Building blocks
+# ---------------------------------------------------------------------
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open (one probe) -> closed."""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"[CircuitBreaker] Opening after {self._failures} failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Forget an abandoned (cancelled) probe."""
+        self._probing = False
+
+
+class RetryBudget:
+    """Token bucket that limits retries and hedges to a fraction of successful calls."""
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, maximum: float = RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.maximum = maximum
+        self.tokens = maximum
+
+    def deposit(self) -> None:
+        self.tokens = min(self.maximum, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies (seconds)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        if len(self._samples) < max(1, min_samples):
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ---------------------------------------------------------------------
+# Dependency
+# ---------------------------------------------------------------------
+
+_registry: Dict[str, "Dependency"] = {}
+
+
+class Dependency:
+    """Resilience policy for one downstream service.
+
+    ``is_failure(exc)`` tells which exceptions mean the dependency is
+    unhealthy (timeouts, connection errors, throttling, 5xx). Anything else,
+    e.g. a failed conditional write, is passed through unchanged.
+    ``is_unsent(exc)`` marks failures where the request never reached the
+    service, so even non-idempotent calls may be retried.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_failure: Callable[[BaseException], bool],
+        is_unsent: Callable[[BaseException], bool] = lambda exc: False,
+        max_attempts: int = MAX_ATTEMPTS,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.is_unsent = is_unsent
+        self.max_attempts = max_attempts
+        self.breaker = CircuitBreaker()
+        self.budget = RetryBudget()
+        self.latency = LatencyTracker()
+        self.stats: Dict[str, int] = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "short_circuited": 0,
+            "deadline_exceeded": 0,
+        }
+        _registry[name] = self
+
+    async def call(self, op: Callable[[], Awaitable[T]], *, idempotent: bool = True,
+                   hedge: bool = False) -> T:
+        """Run ``op()`` with retries, the breaker and the current deadline.
+
+        ``op`` must create a fresh awaitable per call, since it may run more
+        than once. ``hedge`` (idempotent reads only) starts a duplicate when
+        the first attempt is slower than this dependency's recent p95.
+        """
+        self.stats["calls"] += 1
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.max_attempts):
+            if not self.breaker.allow():
+                self.stats["short_circuited"] += 1
+                raise DependencyUnavailable(self.name, "circuit open", retry_after=self.breaker.retry_after())
+            left = remaining()
+            if left is not None and left <= 0:
+                self.breaker.release()
+                self.stats["deadline_exceeded"] += 1
+                raise DependencyUnavailable(self.name, "request deadline exceeded") from last_error
+
+            start = time.monotonic()
+            try:
+                if hedge and idempotent and HEDGE_ENABLED:
+                    result = await self._hedged(op, left)
+                else:
+                    result = await self._bounded(op(), left)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not self.is_failure(e) and not isinstance(e, asyncio.TimeoutError):
+                    # The service answered; the error belongs to the caller
+                    self.breaker.record_success()
+                    raise
+                last_error = e
+                self.stats["failures"] += 1
+                self.breaker.record_failure()
+                if attempt + 1 >= self.max_attempts or not (idempotent or self.is_unsent(e)):
+                    break
+                delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                left = remaining()
+                if left is not None and delay >= left:
+                    break
+                if not self.budget.withdraw():
+                    logger.warning(f"[Dependency] {self.name} retry budget exhausted")
+                    break
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+                continue
+
+            self.latency.record(time.monotonic() - start)
+            self.breaker.record_success()
+            self.budget.deposit()
+            return result
+
+        if remaining() == 0:
+            self.stats["deadline_exceeded"] += 1
+            raise DependencyUnavailable(self.name, "request deadline exceeded") from last_error
+        raise DependencyUnavailable(self.name, f"{type(last_error).__name__}: {last_error}") from last_error
+
+    @staticmethod
+    async def _bounded(awaitable: Awaitable[T], left: Optional[float]) -> T:
+        if left is None:
+            return await awaitable
+        return await asyncio.wait_for(awaitable, left)
+
+    async def _hedged(self, op: Callable[[], Awaitable[T]], left: Optional[float]) -> T:
+        delay = self.latency.quantile(HEDGE_QUANTILE, HEDGE_MIN_SAMPLES)
+        if delay is None or (left is not None and delay >= left):
+            return await self._bounded(op(), left)
+        return await self._bounded(self._race(op, delay), left)
+
+    async def _race(self, op: Callable[[], Awaitable[T]], delay: float) -> T:
+        first = asyncio.ensure_future(op())
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if done or not self.budget.withdraw():
+                return await first
+            self.stats["hedges"] += 1
+            second = asyncio.ensure_future(op())
+            tasks.append(second)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+            return first.result()  # both failed: raise the original error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50 = self.latency.quantile(0.5)
+        p95 = self.latency.quantile(0.95)
+        return {
+            **self.stats,
+            "breaker": self.breaker.state,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        }
+
+
+def dependency_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: dep.snapshot() for name, dep in _registry.items()}
@@ -0,0 +1,78 @@
+import os
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import orjson
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from backend.pagination import Page
+from backend.utils.cache import json_default
+
+logger = logging.getLogger(__name__)
+
+# Items fetched from the data source per round trip while streaming
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "100"))
+
+# Non-string dict keys (e.g. ints in counters) are stringified instead of raising
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class RawJSON:
+    """Already-encoded JSON bytes, emitted as-is (e.g. a payload served from a cache)."""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON bytes. DynamoDB Decimals become int/float, sets become lists."""
+    return orjson.dumps(content, default=json_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """Default response class: one orjson pass straight to bytes.
+
+    Route handlers on hot paths return ``FastJSONResponse(payload)`` directly,
+    which also skips FastAPI's ``jsonable_encoder`` walk over the payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, RawJSON):
+            return content.payload
+        return dumps(content)
+
+
+class NDJSONResponse(StreamingResponse):
+    media_type = "application/x-ndjson"
+
+
+async def _ndjson_lines(first: Page, next_page: Callable[[str], Awaitable[Page]]) -> AsyncIterator[bytes]:
+    page, sent = first, 0
+    try:
+        while True:
+            if page.items:
+                yield b"".join(dumps(item) + b"\n" for item in page.items)
+                sent += len(page.items)
+            if not page.next_cursor:
+                return
+            page = await next_page(page.next_cursor)
+    except Exception as e:
+        # Headers are already sent, so the failure is reported in-band with a
+        # cursor the client can resume from
+        logger.error(f"[stream_pages] Stream aborted after {sent} items: {e}")
+        yield dumps({"error": "stream aborted", "next_cursor": page.next_cursor}) + b"\n"
+
+
+async def stream_pages(fetch: Callable[[str], Awaitable[Page]]) -> NDJSONResponse:
+    """Stream every item of a paginated listing as newline-delimited JSON.
+
+    ``fetch(cursor)`` returns one page (``cursor`` is None for the first).
+    The first page is loaded before the response starts, so errors such as
+    ``InvalidCursor`` still produce a proper status code. Later pages are
+    only fetched once the previous one has been written to the socket, so a
+    slow client holds back the data source and memory stays at one page.
+    """
+    first = await fetch(None)
+    return NDJSONResponse(_ndjson_lines(first, fetch))
@@ -20,6 +20,8 @@ export default function Admin() {
   const [page, setPage] = useState(1);
   const pageSize = 10;
   const [totalUsers, setTotalUsers] = useState(0);
+  // cursors[i] is the opaque cursor that starts page i + 1
+  const [cursors, setCursors] = useState([null]);
   const [selectedIds, setSelectedIds] = useState(new Set());
 
   // Open Sanity Studio in a new tab
@@ -67,12 +69,20 @@ export default function Admin() {
   const fetchUsers = async () => {
     try {
       setLoading(true);
-      const res = await axios.get(`/admin/users?skip=${(page - 1) * pageSize}&limit=${pageSize}`, {
+      const cursor = cursors[page - 1];
+      const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : "";
+      const res = await axios.get(`/admin/users?limit=${pageSize}${cursorParam}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
       const arr = res.data?.users || [];
       setUsers(arr);
       setTotalUsers(res.data?.total || arr.length);
+      const nextCursor = res.data?.next_cursor || null;
+      setCursors((prev) => {
+        const copy = prev.slice(0, page);
+        copy[page] = nextCursor;
+        return copy;
+      });
     } catch (err) {
       console.error("Failed to load users", err);
     } finally {
@@ -328,8 +338,8 @@ export default function Admin() {
               </span>
               <button
                 style={styles.emailButton}
-                disabled={page >= Math.ceil(totalUsers / pageSize)}
-                onClick={() => setPage((p) => Math.min(Math.ceil(totalUsers / pageSize), p + 1))}
+                disabled={!cursors[page]}
+                onClick={() => setPage((p) => p + 1)}
               >
                 Next
               </button>
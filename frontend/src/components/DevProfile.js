@@ -157,7 +157,7 @@ const DevProfile = () => {
           </div>
           <div style={styles.statItem}>
             <span style={styles.statNumber}>
-              {posts.reduce((total, post) => total + (post.registrants?.length || 0), 0)}
+              {posts.reduce((total, post) => total + (post.registrant_count || 0), 0)}
             </span>
             <span style={styles.statLabel}>Total Registrants</span>
           </div>
@@ -202,9 +202,9 @@ const DevProfile = () => {
                       <span style={styles.postDate}>
                         {new Date(post.created_at || post.date || post._createdAt).toLocaleDateString()}
                       </span>
-                      {post.registrants && (
+                      {post.registrant_count > 0 && (
                         <span style={styles.registrantsCount}>
-                          {post.registrants.length} Registrants
+                          {post.registrant_count} Registrants
                         </span>
                       )}
                     </div>
@@ -1,10 +1,12 @@
 // src/components/Feed.js
-import React, { useState, useEffect } from "react";
+import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
 import PostCard from "./PostCard";
 import { getProfileData } from "../api";
 
 const TABS = ["Trending", "Newest", "For You"];
+// Feed tab -> /posts/filter "tab" value
+const TAB_PARAMS = { Trending: "Trending", Newest: "Newest", "For You": "ForYou" };
 const GENRES = {
   Gaming: [
     "MMO",
@@ -30,6 +32,9 @@ export default function Feed() {
   const [posts, setPosts] = useState([]);
   const [showSuggestionPrompt, setShowSuggestionPrompt] = useState(false);
   const [loading, setLoading] = useState(false);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const latestRequest = useRef(0);
   const [showCreateModal, setShowCreateModal] = useState(false);
   const [formFields, setFormFields] = useState({
     title: "",
@@ -95,79 +100,72 @@ export default function Feed() {
     if (activeTab === "For You" && favoriteGames.length === 0) {
       setShowSuggestionPrompt(true);
       setPosts([]);
+      setNextCursor(null);
       return;
     }
     setShowSuggestionPrompt(false);
     fetchPosts();
   }, [selectedMain, selectedSub, activeTab, favoriteGames]);
 
-  async function fetchPosts() {
-    setLoading(true);
+  async function fetchPosts(cursor = null) {
     const token = localStorage.getItem("token");
     if (!token) {
       navigate("/login");
       return;
     }
+    const requestId = ++latestRequest.current;
+    if (cursor) {
+      setLoadingMore(true);
+    } else {
+      setLoading(true);
+    }
 
     try {
       const queryParams = new URLSearchParams();
+      queryParams.append("tab", TAB_PARAMS[activeTab]);
       if (activeTab === "For You") {
-        // personalised feed based on favourite games
+        // personalised feed, narrowed to the favourite genres
         console.log("Filtering by favorite genres:", favoriteGames);
-        favoriteGames.forEach((g) => queryParams.append("tags", g));
+        queryParams.append("subs", favoriteGames.join(","));
       } else {
         if (selectedMain) {
-          queryParams.append("genre", selectedMain.toLowerCase());
+          queryParams.append("main", selectedMain.toLowerCase());
+        }
+        if (selectedSub.length > 0) {
+          queryParams.append("subs", selectedSub.join(","));
         }
-        selectedSub.forEach((tag) => {
-          console.log("Adding tag filter:", tag);
-          queryParams.append("tags", tag);
-        });
+      }
+      if (cursor) {
+        queryParams.append("cursor", cursor);
       }
 
-      const res = await fetch(`/posts/?${queryParams.toString()}`, {
+      // Posts arrive already ordered for the tab (Trending is ranked
+      // server-side), so later pages are appended as-is
+      const res = await fetch(`/posts/filter?${queryParams.toString()}`, {
         headers: { Authorization: `Bearer ${token}` },
       });
       const body = await res.json();
-      if (!Array.isArray(body.posts)) {
-        throw new Error("Invalid response");
+      if (!res.ok || !Array.isArray(body.posts)) {
+        throw new Error(body.detail || "Invalid response");
       }
-
-      // Create a copy of the posts array for sorting
-      let sorted = body.posts.slice();
-      
-      // Apply different sorting based on active tab
-      if (activeTab === "Trending") {
-        // Sort by number of registrants (highest first)
-        console.log("Sorting by registrants count for Trending tab");
-        sorted = sorted.sort((a, b) => {
-          const aRegistrants = Array.isArray(a.registrants) ? a.registrants.length : 0;
-          const bRegistrants = Array.isArray(b.registrants) ? b.registrants.length : 0;
-          return bRegistrants - aRegistrants; // Highest first
-        });
-      } else if (activeTab === "Newest") {
-        // Sort by creation date (newest first)
-        console.log("Sorting by creation date for Newest tab");
-        sorted = sorted.sort((a, b) => {
-          const getDate = (p) => new Date(p.created_at || p.date || p._createdAt || 0).getTime();
-          return getDate(b) - getDate(a); // Newest first
-        });
-      } else {
-        // For "For You" tab, just use date sorting as fallback
-        sorted = sorted.sort((a, b) => {
-          const getDate = (p) => new Date(p.created_at || p.date || p._createdAt || 0).getTime();
-          return getDate(b) - getDate(a);
-        });
+      // A newer request (tab or filter change) supersedes this one
+      if (requestId !== latestRequest.current) {
+        return;
       }
-      
-      console.log(`Sorted posts for ${activeTab} tab:`, sorted);
       console.log("Query parameters used:", queryParams.toString());
-      setPosts(sorted);
+      setPosts((prev) => (cursor ? prev.concat(body.posts) : body.posts));
+      setNextCursor(body.next_cursor || null);
     } catch (err) {
       console.error("Error loading posts:", err);
-      setPosts([]);
+      if (!cursor && requestId === latestRequest.current) {
+        setPosts([]);
+        setNextCursor(null);
+      }
     } finally {
-      setLoading(false);
+      if (requestId === latestRequest.current) {
+        setLoading(false);
+        setLoadingMore(false);
+      }
     }
   }
 
@@ -353,9 +351,20 @@ export default function Feed() {
           ) : posts.length === 0 ? (
             <p style={{ color: "#B388EB" }}>No posts to show.</p>
           ) : (
-            posts.map((post) => (
-              <PostCard key={post.post_id || post._id} post={post} userType={userType} />
-            ))
+            <>
+              {posts.map((post) => (
+                <PostCard key={post.post_id || post._id} post={post} userType={userType} />
+              ))}
+              {nextCursor && (
+                <button
+                  style={styles.loadMoreButton}
+                  disabled={loadingMore}
+                  onClick={() => fetchPosts(nextCursor)}
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              )}
+            </>
           )}
         </div>
 
@@ -536,6 +545,16 @@ const styles = {
   activeTab: {
     background: "#5C6BC0",
   },
+  loadMoreButton: {
+    display: "block",
+    margin: "16px auto",
+    padding: "8px 16px",
+    background: "#333",
+    color: "#fff",
+    border: "none",
+    borderRadius: 8,
+    cursor: "pointer",
+  },
   filterBar: {
     display: "flex",
     gap: 12,
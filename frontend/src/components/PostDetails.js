@@ -133,7 +133,8 @@ export default function PostDetails() {
         body: JSON.stringify({ name, email }),
       });
       if (!res.ok) throw new Error("Registration failed");
-      alert("Successfully registered!");
+      const data = await res.json();
+      alert(data.status === "waitlisted" ? "This event is full. You have been added to the waitlist." : "Successfully registered!");
     } catch (e) {
       alert(e.message);
     }
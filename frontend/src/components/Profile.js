@@ -129,11 +129,11 @@ export default function Profile() {
       return;
     }
     try {
-      setPostMsgs((prev) => ({ ...prev, [postId]: "Sending..." }));
+      setPostMsgs((prev) => ({ ...prev, [postId]: "Starting export..." }));
       await axios.post(`/posts/${postId}/email-registrants`, {}, {
         headers: { Authorization: `Bearer ${token}` },
       });
-      setPostMsgs((prev) => ({ ...prev, [postId]: "Email sent ✔" }));
+      setPostMsgs((prev) => ({ ...prev, [postId]: "Export started ✔ You will receive an email shortly" }));
     } catch (err) {
       setPostMsgs((prev) => ({
         ...prev,
@@ -303,9 +303,9 @@ export default function Profile() {
                     <h4>{post.title}</h4>
                     <p>{post.description}</p>
                     <p style={{ fontSize: "0.9rem", color: "#B388EB" }}>
-                      Registrants: {post.registrants ? post.registrants.length : 0}
+                      Registrants: {post.registrant_count || 0}
                     </p>
-                    {post.registrants && post.registrants.length > 0 && (
+                    {post.registrant_count > 0 && (
                       <button
                         style={styles.emailRegistrantsBtn}
                         onClick={() => collectRegistrations(post.post_id || post._id)}